@@ -0,0 +1,58 @@
+import argparse
+import json
+import sys
+
+
+def load_results(path: str) -> dict:
+    # Mean time (in seconds) and peak memory (in MB) of each benchmark in a pytest-benchmark JSON report
+    with open(path) as report_file:
+        report = json.load(report_file)
+    return {
+        benchmark["fullname"]: (benchmark["stats"]["mean"], benchmark.get("extra_info", {}).get("peak_memory_mb"))
+        for benchmark in report["benchmarks"]
+    }
+
+
+def compare(baseline: dict, current: dict, time_tolerance: float, memory_tolerance: float) -> list:
+    """
+    Compare the results of the benchmarks in [current] with the ones in [baseline].
+
+    :param baseline:            results of the baseline, as returned by load_results.
+    :param current:             results to compare, as returned by load_results.
+    :param time_tolerance:      maximum allowed relative increase of the mean time (e.g. 0.1 for 10%).
+    :param memory_tolerance:    maximum allowed relative increase of the peak memory.
+
+    :return: a list with the description of each regression.
+    """
+    regressions = []
+    for name, (mean_time, peak_memory) in sorted(current.items()):
+        if name not in baseline:
+            print("{}: new benchmark".format(name))
+            continue
+        baseline_time, baseline_memory = baseline[name]
+        line = "{}: time {:.4f}s -> {:.4f}s ({:+.1%})".format(name, baseline_time, mean_time, mean_time / baseline_time - 1)
+        if mean_time > baseline_time * (1 + time_tolerance):
+            regressions += ["{} time".format(name)]
+        if peak_memory is not None and baseline_memory:
+            line += ", peak memory {:.1f}MB -> {:.1f}MB ({:+.1%})".format(baseline_memory, peak_memory, peak_memory / baseline_memory - 1)
+            if peak_memory > baseline_memory * (1 + memory_tolerance):
+                regressions += ["{} peak memory".format(name)]
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a pytest-benchmark JSON report against a baseline one.")
+    parser.add_argument("baseline", help="JSON report of the baseline (pytest --benchmark-json).")
+    parser.add_argument("current", help="JSON report to compare with the baseline.")
+    parser.add_argument("--time-tolerance", type=float, default=0.1, help="Allowed relative increase of the mean time.")
+    parser.add_argument("--memory-tolerance", type=float, default=0.1, help="Allowed relative increase of the peak memory.")
+    args = parser.parse_args()
+    regressions = compare(load_results(args.baseline), load_results(args.current), args.time_tolerance, args.memory_tolerance)
+    if len(regressions) > 0:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
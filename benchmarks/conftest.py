@@ -0,0 +1,47 @@
+import tracemalloc
+
+import pytest
+
+from benchmarks.synthetic_log import generate_event_log, generate_working_schedules
+
+
+def pytest_addoption(parser):
+    parser.addoption("--log-cases", action="store", type=int, default=1000, help="Number of cases of the synthetic event logs.")
+    parser.addoption("--log-activities", action="store", type=int, default=20, help="Number of activities of the synthetic event logs.")
+    parser.addoption("--log-resources", action="store", type=int, default=10, help="Number of resources of the synthetic event logs.")
+
+
+@pytest.fixture(scope="session")
+def event_log(request):
+    return generate_event_log(
+        n_cases=request.config.getoption("--log-cases"),
+        n_activities=request.config.getoption("--log-activities"),
+        n_resources=request.config.getoption("--log-resources"),
+        concurrency_degree=0.3,
+        loop_frequency=0.1,
+        calendar_density=0.5
+    )
+
+
+@pytest.fixture(scope="session")
+def working_schedules(event_log):
+    return generate_working_schedules(event_log["Resource"].unique(), calendar_density=0.5)
+
+
+@pytest.fixture
+def track_peak_memory(benchmark):
+    """
+    Run a function once under tracemalloc and store its peak memory (in MB) in the extra info of the benchmark, so it is saved (and can be
+    compared) together with the timings.
+    """
+
+    def track(function, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            function(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info["peak_memory_mb"] = peak / 1024 / 1024
+
+    return track
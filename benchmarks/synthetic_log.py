@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+from pix_framework.calendar.resource_calendar import RCalendar
+from pix_framework.log_ids import DEFAULT_CSV_IDS, EventLogIDs
+
+
+def generate_event_log(
+        n_cases: int = 1000,
+        n_activities: int = 20,
+        n_resources: int = 10,
+        concurrency_degree: float = 0.3,
+        loop_frequency: float = 0.1,
+        calendar_density: float = 1.0,
+        log_ids: EventLogIDs = DEFAULT_CSV_IDS,
+        seed: int = 0
+) -> pd.DataFrame:
+    """
+    Generate a synthetic event log (always the same for the same parameters) of a process executing a sequence of activities, where some
+    consecutive activities are executed in parallel, and some activities are repeated.
+
+    :param n_cases:             number of cases (traces) of the event log.
+    :param n_activities:        number of activities of the process.
+    :param n_resources:         number of resources executing the activities (each activity is assigned to a pool of resources).
+    :param concurrency_degree:  probability of each pair of consecutive activities of being executed in parallel.
+    :param loop_frequency:      probability of repeating each activity after executing it.
+    :param calendar_density:    fraction of each day (centered at midday) in which the activity instances are executed.
+    :param log_ids:             IDs of the columns of the event log.
+    :param seed:                seed of the random number generator.
+
+    :return: the event log, sorted by start and end time, with the case, activity, resource, start time and end time of each event.
+    """
+    rng = np.random.default_rng(seed)
+    # Process model: sequence of blocks with one activity, or two activities in parallel
+    blocks, activity = [], 0
+    while activity < n_activities:
+        if activity + 1 < n_activities and rng.random() < concurrency_degree:
+            blocks += [[activity, activity + 1]]
+            activity += 2
+        else:
+            blocks += [[activity]]
+            activity += 1
+    # Each activity is performed by a pool of resources, and has a typical duration (in minutes)
+    pools = [rng.choice(n_resources, size=min(n_resources, rng.integers(1, 4)), replace=False) for _ in range(n_activities)]
+    mean_durations = rng.uniform(5, 120, size=n_activities)
+    # Working time of each day: from [day_start] to [day_end] (in minutes)
+    working_minutes = max(calendar_density, 0.01) * 24 * 60
+    day_start = (24 * 60 - working_minutes) / 2
+    day_end = day_start + working_minutes
+    cases, activities, resources, starts, ends = [], [], [], [], []
+    base_time = pd.Timestamp("2023-01-02 00:00:00", tz="UTC").value // 60_000_000_000
+    arrival_times = base_time + np.cumsum(rng.exponential(60 * 24 * 7 * n_activities / max(n_cases, 1) / 4, size=n_cases))
+    for case, arrival_time in enumerate(arrival_times):
+        enabled_time = arrival_time
+        for block in blocks:
+            repetitions = 1
+            while rng.random() < loop_frequency and repetitions < 5:
+                repetitions += 1
+            for _ in range(repetitions):
+                block_end = enabled_time
+                for block_activity in block:
+                    start = _move_to_working_time(enabled_time + rng.exponential(30), day_start, day_end)
+                    end = start + rng.exponential(mean_durations[block_activity])
+                    cases += [case]
+                    activities += [block_activity]
+                    resources += [rng.choice(pools[block_activity])]
+                    starts += [start]
+                    ends += [end]
+                    block_end = max(block_end, end)
+                enabled_time = block_end
+    event_log = pd.DataFrame({
+        log_ids.case: ["case-{}".format(case) for case in cases],
+        log_ids.activity: ["Activity {}".format(activity) for activity in activities],
+        log_ids.resource: ["Resource {}".format(resource) for resource in resources],
+        log_ids.start_time: pd.to_datetime(np.array(starts) * 60_000_000_000, utc=True).floor("s"),
+        log_ids.end_time: pd.to_datetime(np.array(ends) * 60_000_000_000, utc=True).floor("s"),
+    })
+    return event_log.sort_values([log_ids.start_time, log_ids.end_time]).reset_index(drop=True)
+
+
+def _move_to_working_time(instant: float, day_start: float, day_end: float) -> float:
+    # Move an instant (in minutes) to the next working time of the day
+    day, minute = divmod(instant, 24 * 60)
+    if minute < day_start:
+        return day * 24 * 60 + day_start
+    elif minute > day_end:
+        return (day + 1) * 24 * 60 + day_start
+    return instant
+
+
+def generate_working_schedules(resources: list, calendar_density: float = 0.5, seed: int = 0) -> dict:
+    """
+    Generate a working calendar for each resource, working every week day in one or two shifts covering around [calendar_density] of the
+    day (centered at midday).
+
+    :param resources:           IDs of the resources.
+    :param calendar_density:    fraction of each day with working time.
+    :param seed:                seed of the random number generator.
+
+    :return: a dictionary with the resources as key and their working calendar (RCalendar) as value.
+    """
+    rng = np.random.default_rng(seed)
+    working_schedules = {}
+    for resource in resources:
+        working_minutes = int(min(max(calendar_density, 0.01), 1.0) * 24 * 60) - 1
+        start = (24 * 60 - working_minutes) // 2
+        calendar = RCalendar("{} calendar".format(resource))
+        if rng.random() < 0.5 and working_minutes > 120:
+            # Two shifts with a break of one hour in the middle
+            middle = start + working_minutes // 2
+            shifts = [(start, middle - 30), (middle + 30, start + working_minutes)]
+        else:
+            shifts = [(start, start + working_minutes)]
+        for shift_start, shift_end in shifts:
+            calendar.add_calendar_item("MONDAY", "FRIDAY", _to_time(shift_start), _to_time(shift_end))
+        working_schedules[resource] = calendar
+    return working_schedules
+
+
+def _to_time(minutes: int) -> str:
+    return "{:02d}:{:02d}:00".format(minutes // 60, minutes % 60)
@@ -0,0 +1,79 @@
+import pytest
+
+from start_time_estimator.concurrency_oracle import DeactivatedConcurrencyOracle, DirectlyFollowsConcurrencyOracle, \
+    AlphaConcurrencyOracle, HeuristicsConcurrencyOracle, OverlappingConcurrencyOracle
+from start_time_estimator.config import ConcurrencyOracleType, Configuration, ResourceAvailabilityType
+from start_time_estimator.estimator import StartTimeEstimator
+from start_time_estimator.resource_availability import SimpleResourceAvailability, CalendarResourceAvailability
+
+CONCURRENCY_ORACLES = {
+    ConcurrencyOracleType.DF: DirectlyFollowsConcurrencyOracle,
+    ConcurrencyOracleType.ALPHA: AlphaConcurrencyOracle,
+    ConcurrencyOracleType.HEURISTICS: HeuristicsConcurrencyOracle,
+    ConcurrencyOracleType.OVERLAPPING: OverlappingConcurrencyOracle,
+}
+
+RESOURCE_AVAILABILITIES = {
+    ResourceAvailabilityType.SIMPLE: SimpleResourceAvailability,
+    ResourceAvailabilityType.WITH_CALENDAR: CalendarResourceAvailability,
+}
+
+
+def _get_config(working_schedules: dict, **kwargs) -> Configuration:
+    # Configuration with the working schedules only when the resource availability uses them
+    if kwargs.get("resource_availability_type") == ResourceAvailabilityType.WITH_CALENDAR:
+        kwargs["working_schedules"] = working_schedules
+    return Configuration(**kwargs)
+
+
+@pytest.mark.parametrize("concurrency_oracle_type", list(CONCURRENCY_ORACLES), ids=lambda value: value.name)
+def test_concurrency_oracle_discovery(benchmark, track_peak_memory, event_log, concurrency_oracle_type):
+    oracle_class = CONCURRENCY_ORACLES[concurrency_oracle_type]
+    config = Configuration(concurrency_oracle_type=concurrency_oracle_type)
+    track_peak_memory(oracle_class, event_log, config)
+    benchmark(oracle_class, event_log, config)
+
+
+@pytest.mark.parametrize("concurrency_oracle_type", list(ConcurrencyOracleType), ids=lambda value: value.name)
+def test_add_enabled_times(benchmark, track_peak_memory, event_log, concurrency_oracle_type):
+    config = Configuration(concurrency_oracle_type=concurrency_oracle_type)
+    if concurrency_oracle_type == ConcurrencyOracleType.DEACTIVATED:
+        concurrency_oracle = DeactivatedConcurrencyOracle(config)
+    else:
+        concurrency_oracle = CONCURRENCY_ORACLES[concurrency_oracle_type](event_log, config)
+    events = event_log.copy()
+    track_peak_memory(concurrency_oracle.add_enabled_times, events)
+    benchmark(concurrency_oracle.add_enabled_times, events)
+
+
+@pytest.mark.parametrize("resource_availability_type", list(RESOURCE_AVAILABILITIES), ids=lambda value: value.name)
+def test_resource_availability_construction(benchmark, track_peak_memory, event_log, working_schedules, resource_availability_type):
+    availability_class = RESOURCE_AVAILABILITIES[resource_availability_type]
+    config = _get_config(working_schedules, resource_availability_type=resource_availability_type)
+    track_peak_memory(availability_class, event_log, config)
+    benchmark(availability_class, event_log, config)
+
+
+@pytest.mark.parametrize("resource_availability_type", list(RESOURCE_AVAILABILITIES), ids=lambda value: value.name)
+def test_add_resource_availability_times(benchmark, track_peak_memory, event_log, working_schedules, resource_availability_type):
+    config = _get_config(working_schedules, resource_availability_type=resource_availability_type)
+    resource_availability = RESOURCE_AVAILABILITIES[resource_availability_type](event_log, config)
+    events = event_log.copy()
+    track_peak_memory(resource_availability.add_resource_availability_times, events)
+    benchmark(resource_availability.add_resource_availability_times, events)
+
+
+@pytest.mark.parametrize("resource_availability_type", list(RESOURCE_AVAILABILITIES), ids=lambda value: value.name)
+@pytest.mark.parametrize("concurrency_oracle_type", list(ConcurrencyOracleType), ids=lambda value: value.name)
+def test_estimate(benchmark, track_peak_memory, event_log, working_schedules, concurrency_oracle_type, resource_availability_type):
+
+    def estimate():
+        config = _get_config(
+            working_schedules,
+            concurrency_oracle_type=concurrency_oracle_type,
+            resource_availability_type=resource_availability_type
+        )
+        return StartTimeEstimator(event_log, config).estimate()
+
+    track_peak_memory(estimate)
+    benchmark(estimate)
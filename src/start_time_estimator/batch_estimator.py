@@ -0,0 +1,219 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from start_time_estimator.compiled_log import CompiledLog
+from start_time_estimator.concurrency_oracle import DirectlyFollowsConcurrencyOracle, AlphaConcurrencyOracle, \
+    HeuristicsConcurrencyOracle, DeactivatedConcurrencyOracle, OverlappingConcurrencyOracle, RelationCounts, _get_df_counts
+from start_time_estimator.config import ConcurrencyOracleType, ResourceAvailabilityType, Configuration
+from start_time_estimator.estimator import StartTimeEstimator, _get_availability_key
+from start_time_estimator.oracle_cache import _get_thresholds_key
+from start_time_estimator.resource_availability import SimpleResourceAvailability, CalendarResourceAvailability, ResourceAvailability
+from start_time_estimator.utils import get_n_workers, to_nanoseconds, from_nanoseconds
+
+_COUNT_BASED_ORACLES = {
+    ConcurrencyOracleType.DF: DirectlyFollowsConcurrencyOracle,
+    ConcurrencyOracleType.ALPHA: AlphaConcurrencyOracle,
+    ConcurrencyOracleType.HEURISTICS: HeuristicsConcurrencyOracle,
+    ConcurrencyOracleType.OVERLAPPING: OverlappingConcurrencyOracle,
+}
+
+
+class BatchStartTimeEstimator:
+    def __init__(self, event_log: pd.DataFrame, configs: list, n_jobs: int = 1):
+        """
+        Estimate the start times of an event log with many configurations (e.g. a sweep over the concurrency oracles, thresholds, and
+        re-estimation settings), sharing the work that does not depend on each configuration. The event log is compiled once, the
+        directly-follows and length-2 loop counts are computed once and reused by the DF, Alpha, and Heuristics oracles (and the
+        overlapping counts once for the Overlapping ones), and the concurrency relations are derived once per oracle type and thresholds.
+        The resource availability and enabled times are computed once per distinct availability settings and concurrency relations.
+
+        :param event_log:   event log to estimate the start times of.
+        :param configs:     configurations of the estimations (all of them with the same log IDs).
+        :param n_jobs:      number of worker processes to compute the times and estimations in parallel (-1 for all the CPUs).
+        """
+        if len(configs) == 0:
+            raise ValueError("No configuration to estimate the start times with!")
+        elif len({repr(config.log_ids) for config in configs}) > 1:
+            raise ValueError("All the configurations must have the same log IDs!")
+        # Set event log and configurations
+        self.event_log = event_log
+        self.configs = list(configs)
+        self.n_jobs = n_jobs
+        # Set log IDs to ease access within class
+        self.log_ids = self.configs[0].log_ids
+        # Compiled columns of the event log (shared by all the oracles and resource availabilities)
+        self._compiled_log = CompiledLog(event_log, self.log_ids)
+        # Relation counts of each type of oracle, and concurrency relations of each type and thresholds (shared among configurations)
+        self._counts = {}
+        self._concurrency = {}
+        # Concurrency oracle and resource availability of each configuration
+        self.concurrency_oracles = [self._get_concurrency_oracle(config) for config in self.configs]
+        self.resource_availabilities = []
+        resource_availabilities = {}
+        for config in self.configs:
+            availability_key = _get_availability_key(config)
+            if availability_key not in resource_availabilities:
+                resource_availabilities[availability_key] = _build_resource_availability(self._compiled_log, config)
+            self.resource_availabilities += [resource_availabilities[availability_key]]
+
+    def _get_concurrency_oracle(self, config: Configuration):
+        if config.concurrency_oracle_type == ConcurrencyOracleType.DEACTIVATED:
+            return DeactivatedConcurrencyOracle(config)
+        elif config.concurrency_oracle_type not in _COUNT_BASED_ORACLES:
+            raise ValueError("No concurrency oracle defined!")
+        oracle_class = _COUNT_BASED_ORACLES[config.concurrency_oracle_type]
+        counts = self._get_counts(config)
+        concurrency_key = _get_concurrency_key(config)
+        concurrency_oracle = oracle_class.from_counts(counts, config, concurrency_matrix=self._concurrency.get(concurrency_key))
+        self._concurrency[concurrency_key] = concurrency_oracle.concurrency_matrix
+        return concurrency_oracle
+
+    def _get_counts(self, config: Configuration) -> RelationCounts:
+        if config.concurrency_oracle_type == ConcurrencyOracleType.OVERLAPPING:
+            if "overlapping" not in self._counts:
+                self._counts["overlapping"] = OverlappingConcurrencyOracle._count_relations(self._compiled_log, config)
+            return self._counts["overlapping"]
+        # The DF, Alpha, and Heuristics counts are subsets of the directly-follows and length-2 loop counts
+        if "df" not in self._counts:
+            self._counts["df"] = _get_df_counts(self._compiled_log)
+        activities, df_count, l2l_count = self._counts["df"]
+        if config.concurrency_oracle_type == ConcurrencyOracleType.DF:
+            return RelationCounts(activities)
+        elif config.concurrency_oracle_type == ConcurrencyOracleType.ALPHA:
+            return RelationCounts(activities, df=df_count)
+        return RelationCounts(activities, df=df_count, l2l=l2l_count)
+
+    def estimate(self, replace_recorded_start_times: bool = False) -> list:
+        """
+        Estimate the start times of each activity instance in the event log with each configuration.
+
+        :param replace_recorded_start_times:    If 'true', replace the start time column with the estimated start
+                                                times, if 'false', the estimation is placed in its own column.
+
+        :return: a list with, for each configuration (in the same order), a copy of the event log with the estimated start time, the
+        resource availability time, and the enablement time for each activity instance.
+        """
+        columns = [
+            column for column in [self.log_ids.case, self.log_ids.activity, self.log_ids.resource, self.log_ids.start_time,
+                                  self.log_ids.end_time, self.log_ids.available_time, self.log_ids.enabled_time]
+            if column in self.event_log.columns
+        ]
+        times = self.event_log[columns].reset_index(drop=True)
+        # Distinct resource availabilities and concurrency oracles (with the same start times consideration) to compute the times of
+        availability_keys = [_get_availability_key(config) for config in self.configs]
+        enablement_keys = [(_get_concurrency_key(config), config.consider_start_times) for config in self.configs]
+        components = {}
+        if self.log_ids.available_time not in times.columns:
+            components.update({key: availability for key, availability in zip(availability_keys, self.resource_availabilities)})
+        if self.log_ids.enabled_time not in times.columns:
+            components.update({key: oracle for key, oracle in zip(enablement_keys, self.concurrency_oracles)})
+        n_workers = min(get_n_workers(self.n_jobs), max(len(components), len(self.configs)))
+        if n_workers > 1:
+            # Compute the distinct times, and then the estimations, in worker processes (sending the shared data once to each one)
+            with ProcessPoolExecutor(
+                    max_workers=n_workers,
+                    initializer=_init_batch_worker,
+                    initargs=(self._compiled_log, times)
+            ) as executor:
+                component_times = dict(zip(components, executor.map(_compute_times_in_worker, components.values())))
+                estimations = list(executor.map(
+                    _estimate_start_times_in_worker,
+                    self.configs,
+                    *zip(*self._get_times(times, availability_keys, enablement_keys, component_times))
+                ))
+        else:
+            component_times = {key: _compute_times(component, self._compiled_log) for key, component in components.items()}
+            estimations = [
+                _estimate_start_times(config, times, available_times, enabled_times)
+                for config, (available_times, enabled_times) in zip(
+                    self.configs, self._get_times(times, availability_keys, enablement_keys, component_times)
+                )
+            ]
+        # Attach the times of each configuration to a copy of the event log
+        estimated_event_logs = []
+        for config, (available_times, enabled_times, estimated_start_times) in zip(self.configs, estimations):
+            event_log = self.event_log.copy()
+            if self.log_ids.available_time not in event_log.columns:
+                event_log[self.log_ids.available_time] = from_nanoseconds(available_times, event_log.index)
+            if self.log_ids.enabled_time not in event_log.columns:
+                event_log[self.log_ids.enabled_time] = from_nanoseconds(enabled_times, event_log.index)
+            if replace_recorded_start_times:
+                event_log[self.log_ids.start_time] = from_nanoseconds(estimated_start_times, event_log.index)
+            else:
+                event_log[self.log_ids.estimated_start_time] = from_nanoseconds(estimated_start_times, event_log.index)
+            estimated_event_logs += [event_log]
+        return estimated_event_logs
+
+    def _get_times(self, times: pd.DataFrame, availability_keys: list, enablement_keys: list, component_times: dict) -> list:
+        # Resource availability and enabled times of each configuration (the recorded ones if already in the log)
+        recorded_available_times = to_nanoseconds(times[self.log_ids.available_time]) if self.log_ids.available_time in times else None
+        recorded_enabled_times = to_nanoseconds(times[self.log_ids.enabled_time]) if self.log_ids.enabled_time in times else None
+        return [
+            (
+                recorded_available_times if recorded_available_times is not None else component_times[availability_key],
+                recorded_enabled_times if recorded_enabled_times is not None else component_times[enablement_key]
+            )
+            for availability_key, enablement_key in zip(availability_keys, enablement_keys)
+        ]
+
+
+def _get_concurrency_key(config: Configuration) -> tuple:
+    # The concurrency relations depend on the oracle type, and on the thresholds only for the Heuristics and Overlapping ones
+    if config.concurrency_oracle_type in [ConcurrencyOracleType.HEURISTICS, ConcurrencyOracleType.OVERLAPPING]:
+        return config.concurrency_oracle_type, _get_thresholds_key(config)
+    return config.concurrency_oracle_type, None
+
+
+def _build_resource_availability(compiled_log: CompiledLog, config: Configuration) -> ResourceAvailability:
+    if config.resource_availability_type == ResourceAvailabilityType.SIMPLE:
+        return SimpleResourceAvailability(compiled_log, config)
+    elif config.resource_availability_type == ResourceAvailabilityType.WITH_CALENDAR:
+        return CalendarResourceAvailability(compiled_log, config)
+    else:
+        raise ValueError("No resource availability defined!")
+
+
+def _compute_times(component, compiled_log: CompiledLog) -> np.ndarray:
+    # Resource availability times (if [component] is a ResourceAvailability) or enabled times (if a ConcurrencyOracle) of the events
+    times = pd.DataFrame(index=pd.RangeIndex(compiled_log.n_events))
+    if isinstance(component, ResourceAvailability):
+        component.add_resource_availability_times(times, compiled_log)
+        return to_nanoseconds(times[component.log_ids.available_time])
+    component.add_enabled_times(times, compiled_log=compiled_log)
+    return to_nanoseconds(times[component.log_ids.enabled_time])
+
+
+def _estimate_start_times(
+        config: Configuration,
+        times: pd.DataFrame,
+        available_times: np.ndarray,
+        enabled_times: np.ndarray
+) -> (np.ndarray, np.ndarray, np.ndarray):
+    # Estimate the start times from the resource availability and enabled times (the oracle and availability of the estimator are not used)
+    times = times.copy()
+    times[config.log_ids.available_time] = from_nanoseconds(available_times, times.index)
+    times[config.log_ids.enabled_time] = from_nanoseconds(enabled_times, times.index)
+    estimator = StartTimeEstimator(times, config, DeactivatedConcurrencyOracle(config), ResourceAvailability({}, {}, config))
+    estimator._add_estimated_start_times(times)
+    return available_times, enabled_times, to_nanoseconds(times[config.log_ids.estimated_start_time])
+
+
+# Compiled event log and columns needed to estimate the start times of the batch worker processes (set once per process)
+_worker_compiled_log = None
+_worker_times = None
+
+
+def _init_batch_worker(compiled_log: CompiledLog, times: pd.DataFrame):
+    global _worker_compiled_log, _worker_times
+    _worker_compiled_log = compiled_log
+    _worker_times = times
+
+
+def _compute_times_in_worker(component) -> np.ndarray:
+    return _compute_times(component, _worker_compiled_log)
+
+
+def _estimate_start_times_in_worker(config: Configuration, available_times: np.ndarray, enabled_times: np.ndarray):
+    return _estimate_start_times(config, _worker_times, available_times, enabled_times)
@@ -0,0 +1,291 @@
+import math
+import os
+import pickle
+import tempfile
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from start_time_estimator.concurrency_oracle import DirectlyFollowsConcurrencyOracle, AlphaConcurrencyOracle, \
+    HeuristicsConcurrencyOracle, DeactivatedConcurrencyOracle, OverlappingConcurrencyOracle
+from start_time_estimator.config import ConcurrencyOracleType, ReEstimationMethod, ResourceAvailabilityType, Configuration
+from start_time_estimator.estimator import StartTimeEstimator
+from start_time_estimator.parquet_io import _import_pyarrow_parquet, _is_parquet
+from start_time_estimator.resource_availability import ResourceAvailability, _get_performed_events
+from start_time_estimator.utils import to_nanoseconds, get_durations, NAT
+
+_COUNT_BASED_ORACLES = {
+    ConcurrencyOracleType.DF: DirectlyFollowsConcurrencyOracle,
+    ConcurrencyOracleType.ALPHA: AlphaConcurrencyOracle,
+    ConcurrencyOracleType.HEURISTICS: HeuristicsConcurrencyOracle,
+    ConcurrencyOracleType.OVERLAPPING: OverlappingConcurrencyOracle,
+}
+
+# Name of the auxiliary column with the position of each event in the input file
+_ROW = "__row__"
+
+
+class ChunkedStartTimeEstimator:
+    def __init__(self, log_path: str, config: Configuration, chunk_size: int = 1_000_000, temp_dir: Optional[str] = None):
+        """
+        Estimate the start times of an event log (CSV or Parquet) too large to be loaded in memory. In a first streaming pass, the log is
+        read in chunks of [chunk_size] events, its cases are distributed into partitions of around [chunk_size] events (all the events of a
+        case in the same partition) stored in a temporary directory, and the index of end times of each resource is built. Then, the
+        relation counts of the concurrency oracle are computed over each partition (so the relations between events of a case read in
+        different chunks are counted) and summed. The peak memory is bounded by the chunk size and the size of this index.
+
+        :param log_path:    path to the event log, read as Parquet if its extension is '.parquet', and as CSV otherwise.
+        :param config:      configuration of the estimation.
+        :param chunk_size:  number of events to read and estimate at once.
+        :param temp_dir:    directory where to create the temporary files (default temporary directory of the system if None).
+        """
+        # Set configuration
+        self.config = config
+        # Set log IDs to ease access within class
+        self.log_ids = config.log_ids
+        self.log_path = log_path
+        self.chunk_size = chunk_size
+        # Temporary directory to store the partitions of the event log (deleted with this instance)
+        self._temp_dir = tempfile.TemporaryDirectory(dir=temp_dir)
+        self._n_partitions = max(math.ceil(self._count_events() / chunk_size), 1)
+        # Distribute the events into partitions while building the resource availability
+        performed_events = {}
+        for chunk in self._read_chunks():
+            for resource, end_times in _get_performed_events(chunk, self.config).items():
+                performed_events.setdefault(resource, []).append(end_times)
+            self._route(chunk)
+        # Identifiers of the partitions with events
+        self._partition_ids = [
+            partition_id for partition_id in range(self._n_partitions) if os.path.exists(self._get_path(partition_id, "events"))
+        ]
+        # Set concurrency oracle (counting the relations over the partitions, which contain all the events of their cases)
+        if self.config.concurrency_oracle_type == ConcurrencyOracleType.DEACTIVATED:
+            self.concurrency_oracle = DeactivatedConcurrencyOracle(self.config)
+        elif self.config.concurrency_oracle_type in _COUNT_BASED_ORACLES:
+            oracle_class = _COUNT_BASED_ORACLES[self.config.concurrency_oracle_type]
+            counts = None
+            for partition_id in self._partition_ids:
+                partition_counts = oracle_class._count_relations(self._load(partition_id, "events"), self.config)
+                counts = partition_counts if counts is None else counts + partition_counts
+            self.concurrency_oracle = oracle_class.from_counts(counts, self.config)
+        else:
+            raise ValueError("No concurrency oracle defined!")
+        # Set resource availability
+        performed_events = {resource: np.sort(np.concatenate(end_times)) for resource, end_times in performed_events.items()}
+        if self.config.resource_availability_type == ResourceAvailabilityType.SIMPLE:
+            self.resource_availability = ResourceAvailability(performed_events, {}, self.config)
+        elif self.config.resource_availability_type == ResourceAvailabilityType.WITH_CALENDAR:
+            self.resource_availability = ResourceAvailability(performed_events, self.config.working_schedules, self.config)
+        else:
+            raise ValueError("No resource availability defined!")
+
+    def estimate(self, output_path: str, replace_recorded_start_times: bool = False):
+        """
+        Estimate the start times of each activity instance of the event log, processing one partition of cases at a time, and write the
+        estimated event log to [output_path] (as Parquet if its extension is '.parquet', and as CSV otherwise). The events are written
+        grouped by partition, keeping their relative order within each partition. The statistics of the durations of each activity are
+        computed from a histogram of the distinct durations (so the memory is bounded by their number, not by the number of events). The
+        result is the same as the one of StartTimeEstimator with the event log in the order of the file (see _get_statistic_durations for
+        the only exception, with the mean as outlier statistic).
+
+        :param output_path:                     path to write the estimated event log to.
+        :param replace_recorded_start_times:    If 'true', replace the start time column with the estimated start
+                                                times, if 'false', the estimation is placed in its own column.
+        """
+        # Compute the times and initial estimation of each partition, keeping the histogram of durations of each activity
+        histogram = None
+        for partition_id in self._partition_ids:
+            event_log = self._load(partition_id, "events")
+            estimator = self._get_partition_estimator(event_log)
+            estimator._add_resource_availability_and_enabled_times(event_log)
+            estimator._add_initial_estimated_start_times(event_log)
+            histogram = self._add_to_histogram(histogram, event_log)
+            self._store(event_log, partition_id, "estimated")
+        # Re-estimate the durations over the threshold w.r.t. the statistic of their activity in the whole event log
+        if not math.isnan(self.config.outlier_threshold):
+            outlier_statistic_durations = self._get_statistic_durations(histogram, self.config.outlier_statistic)
+            histogram = None
+            for partition_id in self._partition_ids:
+                event_log = self._load(partition_id, "estimated")
+                estimator = self._get_partition_estimator(event_log)
+                estimator._re_estimate_durations_over_threshold(event_log, outlier_statistic_durations)
+                histogram = self._add_to_histogram(histogram, event_log)
+                self._store(event_log, partition_id, "estimated")
+        # Compute the statistic to re-estimate the events with no estimation
+        re_estimation_durations = None
+        if self.config.re_estimation_method != ReEstimationMethod.SET_INSTANT:
+            re_estimation_durations = self._get_statistic_durations(histogram, self.config.re_estimation_method)
+        # Fix the non-estimated start times and write each partition to the output file
+        writer = None
+        try:
+            for partition_id in self._partition_ids:
+                event_log = self._load(partition_id, "estimated")
+                estimator = self._get_partition_estimator(event_log)
+                if self.config.re_estimation_method == ReEstimationMethod.SET_INSTANT:
+                    estimator._set_instant_non_estimated_start_times(event_log)
+                else:
+                    estimator._re_estimate_non_estimated_start_times(event_log, re_estimation_durations)
+                if replace_recorded_start_times:
+                    event_log[self.log_ids.start_time] = event_log[self.log_ids.estimated_start_time]
+                    event_log.drop([self.log_ids.estimated_start_time], axis=1, inplace=True)
+                event_log.drop([_ROW], axis=1, inplace=True)
+                writer = self._write(event_log, output_path, writer, first=partition_id == self._partition_ids[0])
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _count_events(self) -> int:
+        if _is_parquet(self.log_path):
+            return _import_pyarrow_parquet().ParquetFile(self.log_path).metadata.num_rows
+        return sum(len(chunk) for chunk in pd.read_csv(self.log_path, usecols=[self.log_ids.case], chunksize=self.chunk_size))
+
+    def _read_chunks(self):
+        # Read the event log in chunks of [chunk_size] events, parsed as in read_csv_log (without sorting them)
+        if _is_parquet(self.log_path):
+            parquet_file = _import_pyarrow_parquet().ParquetFile(self.log_path)
+            chunks = (batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=self.chunk_size))
+        else:
+            chunks = pd.read_csv(self.log_path, chunksize=self.chunk_size)
+        first_row = 0
+        for chunk in chunks:
+            chunk = chunk.astype({self.log_ids.case: object})
+            if self.config.missing_resource:
+                if self.log_ids.resource not in chunk.columns:
+                    chunk[self.log_ids.resource] = self.config.missing_resource
+                else:
+                    chunk[self.log_ids.resource] = chunk[self.log_ids.resource].fillna(self.config.missing_resource)
+            if self.log_ids.resource in chunk.columns:
+                chunk[self.log_ids.resource] = chunk[self.log_ids.resource].apply(str)
+            for column in [self.log_ids.end_time, self.log_ids.start_time, self.log_ids.enabled_time]:
+                if column in chunk.columns:
+                    chunk[column] = pd.to_datetime(chunk[column], utc=True)
+            chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+            chunk[_ROW] = chunk.index
+            first_row += len(chunk)
+            yield chunk
+
+    def _route(self, chunk: pd.DataFrame):
+        # Append the events of the chunk to the partition of their case
+        partition_ids = pd.util.hash_array(chunk[self.log_ids.case].astype(str).to_numpy()) % self._n_partitions
+        for partition_id, positions in pd.Series(partition_ids).groupby(partition_ids).indices.items():
+            with open(self._get_path(partition_id, "events"), "ab") as output_file:
+                pickle.dump(chunk.iloc[positions], output_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _get_path(self, partition_id: int, stage: str) -> str:
+        return os.path.join(self._temp_dir.name, "{}_{}.pkl".format(stage, partition_id))
+
+    def _load(self, partition_id: int, stage: str) -> pd.DataFrame:
+        # Read all the pieces of the partition (in order of the input file)
+        pieces = []
+        with open(self._get_path(partition_id, stage), "rb") as input_file:
+            while True:
+                try:
+                    pieces += [pickle.load(input_file)]
+                except EOFError:
+                    break
+        return pd.concat(pieces)
+
+    def _store(self, event_log: pd.DataFrame, partition_id: int, stage: str):
+        with open(self._get_path(partition_id, stage), "wb") as output_file:
+            pickle.dump(event_log, output_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _get_partition_estimator(self, event_log: pd.DataFrame) -> StartTimeEstimator:
+        return StartTimeEstimator(event_log, self.config, self.concurrency_oracle, self.resource_availability)
+
+    def _add_to_histogram(self, histogram: Optional[pd.DataFrame], event_log: pd.DataFrame) -> pd.DataFrame:
+        # Add the events of [event_log] with estimated start time to the histogram with the number of events (and the first row in the
+        # input file) of each activity and duration, so its size is bounded by the number of distinct durations, not of events (the
+        # events with missing end time are counted with a missing (NaT) duration)
+        estimated_start_times = to_nanoseconds(event_log[self.log_ids.estimated_start_time])
+        estimated = estimated_start_times != NAT
+        durations = pd.DataFrame({
+            self.log_ids.activity: event_log[self.log_ids.activity].to_numpy()[estimated],
+            "duration": get_durations(to_nanoseconds(event_log[self.log_ids.end_time]), estimated_start_times)[estimated],
+            "count": 1,
+            _ROW: event_log[_ROW].to_numpy()[estimated],
+        })
+        if histogram is not None:
+            durations = pd.concat([histogram, durations])
+        return durations.groupby([self.log_ids.activity, "duration"], sort=False).agg(
+            **{"count": ("count", "sum"), _ROW: (_ROW, "min")}
+        ).reset_index()
+
+    def _get_statistic_durations(self, histogram: Optional[pd.DataFrame], statistic) -> dict:
+        """
+        Compute the statistic (mode, median, or mean) of the durations of each activity from their histogram, with the same result as
+        StartTimeEstimator over the whole event log in the order of the input file (ties in the mode broken by the first row). The only
+        exception is the mean of the outlier statistic, computed in memory with a floating point sum of the durations in log order, and
+        here with the (floating point) sum of each duration times its number of events: both are the same unless the sum of the
+        durations of an activity exceeds 2^53 nanoseconds (around 104 days), where they can differ in the last nanoseconds. The missing
+        durations (NaT) are handled as StartTimeEstimator does: the median and the mean of the re-estimation are missing if any duration
+        is, the mean of the outlier statistic skips them, and the mode counts them as one value (the outlier statistic) or as a different
+        value each (the re-estimation).
+
+        :param histogram:   histogram of durations of each activity (see _add_to_histogram).
+        :param statistic:   statistic to compute (OutlierStatistic or ReEstimationMethod).
+
+        :return: a dict with the statistic of each activity (with estimated durations) as pd.Timedelta.
+        """
+        if histogram is None or len(histogram) == 0:
+            return {}
+        activity_codes, activities = pd.factorize(histogram[self.log_ids.activity])
+        in_activity = activity_codes >= 0
+        values = histogram["duration"].to_numpy(dtype=np.int64)[in_activity]
+        counts = histogram["count"].to_numpy(dtype=np.int64)[in_activity]
+        rows = histogram[_ROW].to_numpy(dtype=np.int64)[in_activity]
+        codes = activity_codes[in_activity]
+        # Sort by activity and duration, and get the first entry and the number of events of each activity
+        order = np.lexsort((values, codes))
+        codes, values, counts, rows = codes[order], values[order], counts[order], rows[order]
+        group_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        group_sizes = np.add.reduceat(counts, group_starts)
+        # Activities with missing durations (NaT, the lowest value, so first in their group)
+        group_missing = values[group_starts] == NAT
+        statistic_name = getattr(statistic, "name", None)
+        if statistic_name == "MODE":
+            # Most frequent duration, the first one in the input file if tie (with each missing duration as a different value in the
+            # re-estimation, as its statistic is computed over an array of durations, where NaT is not equal to NaT)
+            if isinstance(statistic, ReEstimationMethod):
+                counts = np.where(values == NAT, 1, counts)
+            best = np.lexsort((rows, -counts, codes))
+            best = best[np.r_[True, codes[best][1:] != codes[best][:-1]]]
+            group_statistics = values[best]
+        elif statistic_name == "MEDIAN":
+            # Middle duration, or mean of the two middle ones (truncated as numpy does with timedelta64)
+            cumulative_counts = np.cumsum(counts)
+            group_bases = cumulative_counts[group_starts] - counts[group_starts]
+            lower = values[np.searchsorted(cumulative_counts, group_bases + (group_sizes - 1) // 2, side="right")]
+            upper = values[np.searchsorted(cumulative_counts, group_bases + group_sizes // 2, side="right")]
+            middle_means = ((lower + upper).view("timedelta64[ns]") / 2).view(np.int64)
+            group_statistics = np.where(group_missing, NAT, np.where(group_sizes % 2 == 1, lower, middle_means))
+        elif statistic_name == "MEAN" and isinstance(statistic, ReEstimationMethod):
+            # Sum of durations divided by their number (truncated as numpy does with timedelta64)
+            group_means = (np.add.reduceat(values * counts, group_starts).view("timedelta64[ns]") / group_sizes).view(np.int64)
+            group_statistics = np.where(group_missing, NAT, group_means)
+        elif statistic_name == "MEAN":
+            # Floating point mean of the non-missing durations, as pandas computes it (NaN, i.e., NaT, if all of them are missing)
+            counts = np.where(values == NAT, 0, counts)
+            with np.errstate(invalid="ignore"):
+                group_means = np.add.reduceat(values.astype(np.float64) * counts, group_starts) / np.add.reduceat(counts, group_starts)
+            group_statistics = np.array([pd.Timedelta(group_mean).value for group_mean in group_means], dtype=np.int64)
+        else:
+            raise ValueError("Unselected statistic to compute the durations of the activities!")
+        return {
+            activities[code]: pd.Timedelta(group_statistic)
+            for code, group_statistic in zip(codes[group_starts], group_statistics) if group_statistic != NAT
+        }
+
+    def _write(self, event_log: pd.DataFrame, output_path: str, writer, first: bool):
+        if _is_parquet(output_path):
+            import pyarrow as pa
+            if writer is None:
+                table = pa.Table.from_pandas(event_log, preserve_index=False)
+                writer = _import_pyarrow_parquet().ParquetWriter(output_path, table.schema)
+            else:
+                table = pa.Table.from_pandas(event_log, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+        else:
+            event_log.to_csv(output_path, mode="w" if first else "a", header=first, index=False)
+        return writer
+
@@ -0,0 +1,96 @@
+from typing import Union
+
+import numpy as np
+import pandas as pd
+from pix_framework.log_ids import EventLogIDs
+
+from start_time_estimator.utils import to_nanoseconds, sort_by_case_and_end_time
+
+
+class CompiledLog:
+    def __init__(self, event_log: pd.DataFrame, log_ids: EventLogIDs):
+        """
+        Compact integer-coded representation of the columns of an event log needed by the concurrency oracles and the resource
+        availability engines. It is built once, and the kernels work over its arrays instead of the columns of the event log.
+
+        :param event_log:   event log to compile.
+        :param log_ids:     IDs of the columns of the event log.
+        """
+        self.n_events = len(event_log)
+        # Factorized cases (-1 if missing), activities, and resources (-1 if missing), in order of appearance
+        case_codes, cases = pd.factorize(event_log[log_ids.case])
+        activity_codes, activities = pd.factorize(event_log[log_ids.activity], use_na_sentinel=False)
+        self.case_codes, self.cases = case_codes.astype(np.int32), np.asarray(cases)
+        self.activity_codes, self.activities = activity_codes.astype(np.int32), np.asarray(activities)
+        if log_ids.resource in event_log.columns:
+            resource_codes, resources = pd.factorize(event_log[log_ids.resource])
+            self.resource_codes, self.resources = resource_codes.astype(np.int32), np.asarray(resources)
+        else:
+            self.resource_codes, self.resources = np.full(self.n_events, -1, dtype=np.int32), np.array([], dtype=object)
+        # Timestamps as int64 nanoseconds (start times None if not recorded)
+        self.end_times = to_nanoseconds(event_log[log_ids.end_time])
+        self.start_times = to_nanoseconds(event_log[log_ids.start_time]) if log_ids.start_time in event_log.columns else None
+        # CSR-style grouping: the events of case c are case_order[case_offsets[c]:case_offsets[c + 1]] (in log order)
+        self.case_order, self.case_offsets = _group_by_code(self.case_codes, len(self.cases))
+        # Same for the events of each resource
+        self.resource_order, self.resource_offsets = _group_by_code(self.resource_codes, len(self.resources))
+        # Same for the events of each activity
+        self.activity_order, self.activity_offsets = _group_by_code(self.activity_codes, len(self.activities))
+        # Events sorted by case and end time (computed the first time it is needed, and shared by all the stages)
+        self._case_end_order = None
+
+    @property
+    def case_end_order(self) -> np.ndarray:
+        # Positions of the events with case and end time sorted by case and end time (keeping the log order between ties)
+        if self._case_end_order is None:
+            self._case_end_order = sort_by_case_and_end_time(self.case_codes, self.end_times)
+        return self._case_end_order
+
+    def case_events(self, case_code: int) -> np.ndarray:
+        # Positions of the events of a case (in log order)
+        return self.case_order[self.case_offsets[case_code]:self.case_offsets[case_code + 1]]
+
+    def resource_events(self, resource_code: int) -> np.ndarray:
+        # Positions of the events of a resource (in log order)
+        return self.resource_order[self.resource_offsets[resource_code]:self.resource_offsets[resource_code + 1]]
+
+    def activity_events(self, activity_code: int) -> np.ndarray:
+        # Positions of the events of an activity (in log order)
+        return self.activity_order[self.activity_offsets[activity_code]:self.activity_offsets[activity_code + 1]]
+
+    def take(self, positions: np.ndarray) -> 'CompiledLog':
+        """
+        Compiled log with only the events in [positions] (kept in log order), sharing the labels of the cases, activities, and resources
+        (so the codes, and the matrices indexed by them, are the same as in this one).
+
+        :param positions: positions of the events to keep.
+
+        :return: the compiled log with the selected events.
+        """
+        positions = np.sort(positions)
+        compiled_log = CompiledLog.__new__(CompiledLog)
+        compiled_log.n_events = len(positions)
+        compiled_log.case_codes, compiled_log.cases = self.case_codes[positions], self.cases
+        compiled_log.activity_codes, compiled_log.activities = self.activity_codes[positions], self.activities
+        compiled_log.resource_codes, compiled_log.resources = self.resource_codes[positions], self.resources
+        compiled_log.end_times = self.end_times[positions]
+        compiled_log.start_times = self.start_times[positions] if self.start_times is not None else None
+        compiled_log.case_order, compiled_log.case_offsets = _group_by_code(compiled_log.case_codes, len(self.cases))
+        compiled_log.resource_order, compiled_log.resource_offsets = _group_by_code(compiled_log.resource_codes, len(self.resources))
+        compiled_log.activity_order, compiled_log.activity_offsets = _group_by_code(compiled_log.activity_codes, len(self.activities))
+        compiled_log._case_end_order = None
+        return compiled_log
+
+
+def compile_log(event_log: Union[pd.DataFrame, CompiledLog], log_ids: EventLogIDs) -> CompiledLog:
+    # Compile the event log (if not already compiled)
+    return event_log if isinstance(event_log, CompiledLog) else CompiledLog(event_log, log_ids)
+
+
+def _group_by_code(codes: np.ndarray, n_codes: int) -> (np.ndarray, np.ndarray):
+    # Positions sorted by code (keeping their order within each code, and discarding the missing ones) and the offsets of each code
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    offsets = np.zeros(n_codes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes[order], minlength=n_codes), out=offsets[1:])
+    return order, offsets
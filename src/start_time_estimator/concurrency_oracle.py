@@ -1,21 +1,105 @@
-from collections import Counter
-from typing import Optional
+import abc
+import functools
+import operator
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Union
 
+import numpy as np
 import pandas as pd
+from scipy import sparse
 
+from start_time_estimator.compiled_log import CompiledLog, compile_log
 from start_time_estimator.config import Configuration
-from start_time_estimator.utils import zip_with_next
-from pix_framework.log_ids import EventLogIDs
+from start_time_estimator.kernels import use_numba, compute_enabling_positions_numba
+from start_time_estimator.utils import split_by_cases, sort_by_case_and_end_time, to_nanoseconds, from_nanoseconds, NAT, NAT_MAX
 
 
 class ConcurrencyOracle:
-    def __init__(self, concurrency: dict, config: Configuration):
-        # Dict with the concurrency: self.concurrency[A] = set of activities concurrent with A
-        self.concurrency = concurrency
+    # Maximum number of trace variants to keep the enabling structure of
+    variant_cache_size = 1024
+    # Trace length above which the JIT-compiled search of the enabling activity instances keeps a last-completion table (instead of
+    # searching backwards over the previous events of the trace)
+    long_trace_threshold = 5000
+
+    def __init__(self, concurrency: Union[dict, np.ndarray], config: Configuration, activities: Optional[list] = None):
+        """
+        Oracle of the concurrency relations between the activities of an event log, stored as a boolean matrix indexed by activity code
+        (self.concurrency_matrix[A, B] = True if B is concurrent with A, with the codes of the activities in self.activities).
+
+        :param concurrency: concurrency relations, either as a dict concurrency[A] = set of activities concurrent with A, or as a boolean
+                            matrix indexed as [activities].
+        :param config:      configuration parameters.
+        :param activities:  activity labels indexing the rows and columns of [concurrency] (if it is a matrix).
+        """
+        # Concurrency relations as boolean matrix (and dict view, see concurrency)
+        if isinstance(concurrency, dict):
+            self.concurrency = concurrency
+        else:
+            self._set_concurrency_matrix(activities, concurrency)
         # Configuration parameters
         self.config = config
         # Set log IDs to ease access within class
         self.log_ids = config.log_ids
+        # LRU cache with the enabling structure of each trace variant (see _get_trace_enabling_positions)
+        self._variant_cache = OrderedDict()
+
+    @property
+    def concurrency(self) -> dict:
+        # View of the concurrency as a dict: self.concurrency[A] = set of activities concurrent with A (built once after each change)
+        if self._concurrency_view is None:
+            self._concurrency_view = _concurrency_matrix_to_dict(self.activities, self.concurrency_matrix)
+        return self._concurrency_view
+
+    @concurrency.setter
+    def concurrency(self, concurrency: dict):
+        # Set the concurrency from a dict concurrency[A] = set of activities concurrent with A
+        activities = list(concurrency)
+        known_activities = set(activities)
+        for concurrent_activities in concurrency.values():
+            for concurrent_activity in concurrent_activities:
+                if concurrent_activity not in known_activities:
+                    activities += [concurrent_activity]
+                    known_activities.add(concurrent_activity)
+        activity_index = pd.Index(activities)
+        concurrency_matrix = np.zeros((len(activities), len(activities)), dtype=bool)
+        for code, concurrent_activities in enumerate(concurrency.values()):
+            concurrency_matrix[code, activity_index.get_indexer(list(concurrent_activities))] = True
+        self._set_concurrency_matrix(activities, concurrency_matrix)
+
+    def _set_concurrency_matrix(self, activities: list, concurrency_matrix: np.ndarray):
+        # Activity labels indexing the rows and columns of the concurrency matrix
+        self.activities = list(activities)
+        self._activity_index = pd.Index(self.activities)
+        self.concurrency_matrix = np.asarray(concurrency_matrix, dtype=bool)
+        self._concurrency_view = None
+
+    def get_activity_codes(self, activities) -> np.ndarray:
+        # Code of each activity label in the concurrency matrix (-1 if not in it)
+        return self._activity_index.get_indexer(pd.Index(activities, dtype=object))
+
+    def is_concurrent(self, activity, other_activities) -> np.ndarray:
+        """
+        Check, at once, which of [other_activities] (e.g. the activities of a trace) are concurrent with [activity].
+
+        :param activity:            activity label.
+        :param other_activities:    array-like with the activity labels to check.
+
+        :return: a boolean array with True for each label in [other_activities] concurrent with [activity].
+        """
+        other_codes = self.get_activity_codes(other_activities)
+        code = self.get_activity_codes([activity])[0]
+        if code < 0:
+            return np.zeros(len(other_codes), dtype=bool)
+        return (other_codes >= 0) & self.concurrency_matrix[code, other_codes]
+
+    def _get_concurrency_submatrix(self, activities) -> np.ndarray:
+        # Concurrency matrix indexed by [activities] (with no concurrency for the activities not in the oracle)
+        codes = self.get_activity_codes(activities)
+        if len(self.activities) == 0:
+            return np.zeros((len(codes), len(codes)), dtype=bool)
+        known = codes >= 0
+        return self.concurrency_matrix[np.ix_(codes, codes)] & np.outer(known, known)
 
     def enabled_since(self, trace, event) -> pd.Timestamp:
         # Get enabling activity instance or NA if none
@@ -24,19 +108,75 @@ class ConcurrencyOracle:
         return enabling_activity_instance[self.log_ids.end_time] if isinstance(enabling_activity_instance, pd.Series) else pd.NaT
 
     def enabling_activity_instance(self, trace, event) -> Optional[pd.Series]:
+        if trace.index.is_unique and event.name in trace.index:
+            # Event of the trace, resolve it with the enabling structure of the trace variant
+            enabling_position = self._get_trace_enabling_positions(trace)[trace.index.get_loc(event.name)]
+            return trace.iloc[enabling_position] if enabling_position >= 0 else None
         # Get the list of previous end times
         previous_end_times = trace[
             (trace[self.log_ids.end_time] < event[self.log_ids.end_time]) &  # i) previous to the current one;
             ((not self.config.consider_start_times) or  # ii) if parallel check is activated,
              (trace[self.log_ids.end_time] <= event[self.log_ids.start_time])) &  # not overlapping;
-            (~trace[self.log_ids.activity].isin(self.concurrency[event[self.log_ids.activity]]))  # iii) with no concurrency;
+            (~self.is_concurrent(event[self.log_ids.activity], trace[self.log_ids.activity]))  # iii) with no concurrency;
             ][self.log_ids.end_time]
         # Get enabling activity instance or NA if none
         enabling_activity_instance = trace.loc[previous_end_times.idxmax()] if len(previous_end_times) > 0 else None
         # Return enabling activity instance
         return enabling_activity_instance
 
-    def add_enabled_times(self, event_log: pd.DataFrame, set_nat_to_first_event: bool = False, include_enabling_activity: bool = False):
+    def _get_trace_enabling_positions(self, trace: pd.DataFrame) -> np.ndarray:
+        """
+        Get the position (in [trace]) of the activity instance enabling each event of the trace (-1 if none). The enabling relations only
+        depend on the sequence of activities ordered by end time, the ties between end times, and (if considering start times) the number of
+        events ending before the start of each event. This structure identifies the variant of the trace, and the enabling positions of each
+        variant are computed once and kept in an LRU cache, so traces of a cached variant are resolved by array indexing.
+
+        :param trace: events of the trace.
+
+        :return: an array with the position of the enabling event of each event of the trace, -1 if none.
+        """
+        end_times = to_nanoseconds(trace[self.log_ids.end_time])
+        start_times = to_nanoseconds(trace[self.log_ids.start_time]) if self.config.consider_start_times else None
+        # Sort the events with end time by end time, keeping the trace order between ties
+        candidates = np.flatnonzero(end_times != NAT)
+        order = candidates[np.argsort(end_times[candidates], kind="stable")]
+        sorted_end_times = end_times[order]
+        activities = trace[self.log_ids.activity].to_numpy(dtype=object)[order]
+        # Structure of the variant: first event of each tie in the end time, and number of events ending before each one can start
+        tie_starts = np.searchsorted(sorted_end_times, sorted_end_times, side="left")
+        limits = tie_starts
+        if start_times is not None:
+            limits = np.minimum(limits, np.searchsorted(sorted_end_times, start_times[order], side="right"))
+        variant = (tuple(activities), tie_starts.tobytes(), limits.tobytes())
+        if variant in self._variant_cache:
+            self._variant_cache.move_to_end(variant)
+            variant_positions = self._variant_cache[variant]
+        else:
+            # Compute the enabling positions of the variant
+            activity_codes, labels = pd.factorize(activities, use_na_sentinel=False)
+            variant_positions = self._compute_enabling_positions(
+                case_codes=np.zeros(len(order), dtype=np.int64),
+                activity_codes=activity_codes,
+                end_times=sorted_end_times,
+                start_times=start_times[order] if start_times is not None else None,
+                concurrency_matrix=self._get_concurrency_submatrix(labels)
+            )
+            self._variant_cache[variant] = variant_positions
+            while len(self._variant_cache) > self.variant_cache_size:
+                self._variant_cache.popitem(last=False)
+        # Map the positions of the variant to the trace
+        enabling_positions = np.full(len(trace), -1, dtype=np.int64)
+        has_enabling = variant_positions >= 0
+        enabling_positions[order[has_enabling]] = order[variant_positions[has_enabling]]
+        return enabling_positions
+
+    def add_enabled_times(
+            self,
+            event_log: pd.DataFrame,
+            set_nat_to_first_event: bool = False,
+            include_enabling_activity: bool = False,
+            compiled_log: Optional[CompiledLog] = None
+    ):
         """
         Add the enabled time of each activity instance to the received event log based on the concurrency relations established in the
         class instance (extracted from the event log passed to the instantiation). For the first event on each trace, set the start of the
@@ -46,36 +186,129 @@ class ConcurrencyOracle:
         :param set_nat_to_first_event:      if False, use the start of the trace as enabled time for the activity instances with no previous
                                             activity enabling them, otherwise use pd.NaT.
         :param include_enabling_activity:   if True, add a column with the label of the activity enabling the current one.
+        :param compiled_log:                compiled version of [event_log] (compiled from it if None).
         """
-        # For each trace in the log, estimate the enabled time of its events
-        indexes, enabled_times, enabling_activities = [], [], []
-        for (case_id, trace) in event_log.groupby(self.log_ids.case):
-            # Compute trace start time
-            if self.log_ids.start_time in trace:
-                trace_start_time = min(trace[self.log_ids.start_time].min(), trace[self.log_ids.end_time].min())
-            else:
-                trace_start_time = trace[self.log_ids.end_time].min()
-            # Get the enabling activity of each event
-            for index, event in trace.iterrows():
-                indexes += [index]
-                enabling_activity_instance = self.enabling_activity_instance(trace, event)
-                # Store enabled time
-                if isinstance(enabling_activity_instance, pd.Series):
-                    # Use computed value
-                    enabling_activity_label = enabling_activity_instance[self.log_ids.activity]
-                    enabled_times += [enabling_activity_instance[self.log_ids.end_time]]
-                else:
-                    # No enabling activity, use trace start or NA
-                    enabling_activity_label = pd.NA
-                    enabled_times += [pd.NaT] if set_nat_to_first_event else [trace_start_time]
-                # Store enabled activity label if necessary
-                if include_enabling_activity:
-                    enabling_activities += [enabling_activity_label]
-        # Set all trace enabled times (and enabling activities if necessary) at once
+        compiled_log = compile_log(event_log if compiled_log is None else compiled_log, self.log_ids)
+        # Get the position (in the event log) of the activity instance enabling each event (-1 if none)
+        enabling_positions = self._get_enabling_positions(compiled_log)
+        has_enabling = enabling_positions >= 0
+        # Set the end of the enabling activity instance as enabled time
+        end_times = compiled_log.end_times
+        enabled_times = np.where(has_enabling, end_times[enabling_positions], NAT)
+        if not set_nat_to_first_event:
+            # No enabling activity, use the trace start
+            trace_start_times = _get_trace_start_times(compiled_log.case_codes, end_times, compiled_log.start_times)
+            enabled_times = np.where(has_enabling, enabled_times, trace_start_times)
+        # Set all enabled times (and enabling activities if necessary) at once
         if include_enabling_activity:
-            event_log.loc[indexes, self.log_ids.enabling_activity] = enabling_activities
-        event_log.loc[indexes, self.log_ids.enabled_time] = enabled_times
-        event_log[self.log_ids.enabled_time] = pd.to_datetime(event_log[self.log_ids.enabled_time], utc=True)
+            activity_labels = compiled_log.activities.astype(object)[compiled_log.activity_codes]
+            event_log[self.log_ids.enabling_activity] = np.where(has_enabling, activity_labels[enabling_positions], pd.NA)
+        event_log[self.log_ids.enabled_time] = from_nanoseconds(enabled_times, event_log.index)
+
+    def _get_enabling_positions(self, compiled_log: CompiledLog) -> np.ndarray:
+        # Compute the enabling activity instance of each event (with the concurrency indexed by the activity codes of the compiled log)
+        return self._compute_enabling_positions(
+            case_codes=compiled_log.case_codes,
+            activity_codes=compiled_log.activity_codes,
+            end_times=compiled_log.end_times,
+            start_times=compiled_log.start_times if self.config.consider_start_times else None,
+            concurrency_matrix=self._get_concurrency_submatrix(compiled_log.activities),
+            order=compiled_log.case_end_order
+        )
+
+    def _compute_enabling_positions(
+            self,
+            case_codes: np.ndarray,
+            activity_codes: np.ndarray,
+            end_times: np.ndarray,
+            start_times: Optional[np.ndarray],
+            concurrency_matrix: np.ndarray,
+            order: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        # Search the enabling activity instances with the kernel backend of the configuration
+        if use_numba(self.config):
+            return compute_enabling_positions_numba(
+                case_codes, activity_codes, end_times, start_times, concurrency_matrix, self.long_trace_threshold, order
+            )
+        return _compute_enabling_positions_numpy(case_codes, activity_codes, end_times, start_times, concurrency_matrix, order)
+
+
+def _compute_enabling_positions_numpy(
+        case_codes: np.ndarray,
+        activity_codes: np.ndarray,
+        end_times: np.ndarray,
+        start_times: Optional[np.ndarray],
+        concurrency_matrix: np.ndarray,
+        order: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Compute, for each event, the position of its enabling activity instance, i.e., the event of the same trace with the latest end time
+    that i) ends before the current one, ii) ends before (or at) the start of the current one (if [start_times] are given), and iii) its
+    activity is not concurrent with the current one. Ties in the end time are broken with the position in the log (first one).
+
+    :param case_codes:          integer code of the case of each event (-1 if missing).
+    :param activity_codes:      integer code of the activity of each event.
+    :param end_times:           end times of each event as int64 nanoseconds (NaT as minimum int64).
+    :param start_times:         start times of each event as int64 nanoseconds, or None to not consider them.
+    :param concurrency_matrix:  boolean matrix where [A, B] is True if B is concurrent with A.
+    :param order:               positions of the events with case and end time sorted by case and end time (e.g. the case_end_order of
+                                a CompiledLog), computed if None.
+
+    :return: an array with the position of the enabling event of each event, -1 if none.
+    """
+    enabling_positions = np.full(len(case_codes), -1, dtype=np.int64)
+    # Sort the events (with case and end time) by case and end time, keeping the log order between ties (if not already sorted)
+    if order is None:
+        order = sort_by_case_and_end_time(case_codes, end_times)
+    if len(order) == 0:
+        return enabling_positions
+    sorted_activities = activity_codes[order]
+    # Build a sorted key (case, end time) to search the events of the same trace ending before a timestamp
+    unique_end_times, end_ranks = np.unique(end_times[order], return_inverse=True)
+    width = len(unique_end_times) + 1
+    case_keys = case_codes[order].astype(np.int64) * width
+    keys = case_keys + end_ranks
+    # Bounds of the events preceding each event in its trace: [trace_starts, limits)
+    trace_starts = np.searchsorted(keys, case_keys, side="left")
+    tie_starts = np.searchsorted(keys, keys, side="left")
+    limits = tie_starts.copy()
+    if start_times is not None:
+        # Discard the events ending after the start of the current one (overlapping)
+        start_ranks = np.searchsorted(unique_end_times, start_times[order], side="right")
+        limits = np.minimum(limits, np.searchsorted(keys, case_keys + start_ranks, side="left"))
+    # Group activities by their concurrency relations to process each distinct one in a single pass
+    patterns, activity_patterns = np.unique(concurrency_matrix, axis=0, return_inverse=True)
+    event_patterns = np.asarray(activity_patterns).reshape(-1)[sorted_activities]
+    positions = np.arange(len(order))
+    for pattern_index, pattern in enumerate(patterns):
+        queries = np.flatnonzero((event_patterns == pattern_index) & (limits > trace_starts))
+        if len(queries) == 0:
+            continue
+        # Latest non-concurrent event at or before each position
+        allowed = ~pattern[sorted_activities]
+        last_allowed = np.maximum.accumulate(np.where(allowed, positions, -1))
+        latest = last_allowed[limits[queries] - 1]
+        found = latest >= trace_starts[queries]
+        queries, latest = queries[found], latest[found]
+        # First non-concurrent event at or after each position (to break ties in the end time by log order)
+        next_allowed = np.minimum.accumulate(np.where(allowed, positions, len(order))[::-1])[::-1]
+        enabling_positions[order[queries]] = order[next_allowed[tie_starts[latest]]]
+    return enabling_positions
+
+
+def _get_trace_start_times(case_codes: np.ndarray, end_times: np.ndarray, start_times: Optional[np.ndarray]) -> np.ndarray:
+    # Earliest end (and start, if available) time of the trace of each event (NaT if no recorded start in the trace)
+    n_cases = case_codes.max() + 1 if len(case_codes) > 0 else 0
+    in_case = case_codes >= 0
+    first_end = np.full(n_cases, NAT_MAX, dtype=np.int64)
+    np.minimum.at(first_end, case_codes[in_case], np.where(end_times == NAT, NAT_MAX, end_times)[in_case])
+    trace_start_times = first_end
+    if start_times is not None:
+        first_start = np.full(n_cases, NAT_MAX, dtype=np.int64)
+        np.minimum.at(first_start, case_codes[in_case], np.where(start_times == NAT, NAT_MAX, start_times)[in_case])
+        trace_start_times = np.where(first_start == NAT_MAX, NAT, np.minimum(first_start, first_end))
+    trace_start_times = np.where(trace_start_times == NAT_MAX, NAT, trace_start_times)
+    return np.where(in_case, trace_start_times[case_codes], NAT)
 
 
 class DeactivatedConcurrencyOracle(ConcurrencyOracle):
@@ -89,181 +322,369 @@ class DeactivatedConcurrencyOracle(ConcurrencyOracle):
     def enabling_activity_instance(self, trace, event) -> Optional[pd.Series]:
         return None
 
+    def _get_enabling_positions(self, compiled_log: CompiledLog) -> np.ndarray:
+        return np.full(compiled_log.n_events, -1, dtype=np.int64)
 
-class DirectlyFollowsConcurrencyOracle(ConcurrencyOracle):
-    def __init__(self, event_log: pd.DataFrame, config):
-        # Default with no concurrency (all directly-follows relations)
-        activities = event_log[config.log_ids.activity].unique()
-        concurrency = {activity: set() for activity in activities}
+
+class RelationCounts:
+    def __init__(self, activities, **matrices):
+        # Activity labels indexing the rows and columns of the matrices
+        self.activities = list(activities)
+        # Count matrices (e.g. directly-follows) as numpy arrays: matrices[name][A, B] = number of times of the relation between A and B
+        self.matrices = matrices
+
+    def reindex(self, activities: list) -> 'RelationCounts':
+        # Counts indexed by [activities] (a superset of the current ones), with zero counts for the new activities
+        positions = pd.Index(activities).get_indexer(self.activities)
+        matrices = {}
+        for name, matrix in self.matrices.items():
+            matrices[name] = np.zeros((len(activities), len(activities)), dtype=matrix.dtype)
+            matrices[name][np.ix_(positions, positions)] = matrix
+        return RelationCounts(activities, **matrices)
+
+    def _combine(self, other: 'RelationCounts', sign: int) -> 'RelationCounts':
+        # Align both counts by activity (keeping the order of appearance) and add/subtract their matrices
+        activities = self.activities + [activity for activity in other.activities if activity not in set(self.activities)]
+        this, other = self.reindex(activities), other.reindex(activities)
+        return RelationCounts(activities, **{name: this.matrices[name] + sign * other.matrices[name] for name in this.matrices})
+
+    def __add__(self, other: 'RelationCounts') -> 'RelationCounts':
+        return self._combine(other, 1)
+
+    def __sub__(self, other: 'RelationCounts') -> 'RelationCounts':
+        return self._combine(other, -1)
+
+
+class CountBasedConcurrencyOracle(ConcurrencyOracle, abc.ABC):
+    def __init__(self, event_log: Union[pd.DataFrame, CompiledLog], config: Configuration):
+        # Count the relations between the activities of the event log
+        self.counts = self._count_relations(event_log, config)
         # Super
-        super(DirectlyFollowsConcurrencyOracle, self).__init__(concurrency, config)
+        super(CountBasedConcurrencyOracle, self).__init__(self._get_concurrency_matrix(self.counts, config), config, self.counts.activities)
+
+    @classmethod
+    def from_counts(
+            cls,
+            counts: RelationCounts,
+            config: Configuration,
+            concurrency_matrix: Optional[np.ndarray] = None
+    ) -> 'CountBasedConcurrencyOracle':
+        """
+        Create the concurrency oracle from relation counts already computed (e.g. summing the counts of different partitions of the event
+        log), instead of counting them from an event log.
+
+        :param counts:              counts of the relations between the activities (as returned by _count_relations).
+        :param config:              configuration of the concurrency oracle.
+        :param concurrency_matrix:  concurrency relations already derived from [counts] with the thresholds in [config] (e.g. loaded from
+                                    a cache), as a boolean matrix indexed as the activities of [counts]; derived from the counts if None.
 
+        :return: the concurrency oracle with the concurrency relations derived from the counts.
+        """
+        concurrency_oracle = cls.__new__(cls)
+        concurrency_oracle.counts = counts
+        if concurrency_matrix is None:
+            concurrency_matrix = cls._get_concurrency_matrix(counts, config)
+        ConcurrencyOracle.__init__(concurrency_oracle, concurrency_matrix, config, counts.activities)
+        return concurrency_oracle
 
-class AlphaConcurrencyOracle(ConcurrencyOracle):
-    def __init__(self, event_log: pd.DataFrame, config: Configuration):
+    def update_traces(self, previous_traces: pd.DataFrame, updated_traces: pd.DataFrame):
+        """
+        Update the concurrency relations with the changes in a set of traces, without counting again the relations in the rest of the log.
+
+        :param previous_traces: events of the modified traces before the changes (already counted), empty if they are new traces.
+        :param updated_traces:  events of the modified traces after the changes.
+        """
+        self.counts = (
+                self.counts -
+                self._count_relations(previous_traces, self.config) +
+                self._count_relations(updated_traces, self.config)
+        )
+        self._set_concurrency_matrix(self.counts.activities, self._get_concurrency_matrix(self.counts, self.config))
+        # The enabling structures of the cached variants depend on the concurrency relations
+        self._variant_cache.clear()
+
+    @classmethod
+    def count_relations_in_parallel(cls, compiled_log: CompiledLog, config: Configuration, n_workers: int) -> RelationCounts:
+        """
+        Count the relations between the activities splitting the cases into [n_workers] partitions counted in worker processes. The counts
+        of each partition are indexed by the activities of the whole log, and summed (their sum is the same as counting the whole log).
+
+        :param compiled_log:    compiled event log to count the relations from.
+        :param config:          configuration of the concurrency oracle.
+        :param n_workers:       number of worker processes.
+
+        :return: the counts of the relations between the activities (as returned by _count_relations).
+        """
+        partitions = split_by_cases(compiled_log.case_codes, n_workers)
+        if len(partitions) <= 1:
+            return cls._count_relations(compiled_log, config)
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(partitions))) as executor:
+            partial_counts = executor.map(
+                _count_partition_relations,
+                [cls] * len(partitions),
+                (compiled_log.take(partition) for partition in partitions),
+                [config] * len(partitions)
+            )
+            return functools.reduce(operator.add, partial_counts)
+
+    @staticmethod
+    @abc.abstractmethod
+    def _count_relations(event_log: Union[pd.DataFrame, CompiledLog], config: Configuration) -> RelationCounts:
+        # Count the relations between the activities of the event log (the counts needed by _get_concurrency_matrix)
+        pass
+
+    @staticmethod
+    @abc.abstractmethod
+    def _get_concurrency_matrix(counts: RelationCounts, config: Configuration) -> np.ndarray:
+        # Boolean matrix concurrency_matrix[A, B] = True if B is concurrent with A (indexed as the activities of [counts])
+        pass
+
+
+def _count_partition_relations(oracle_class, compiled_log: CompiledLog, config: Configuration) -> RelationCounts:
+    # Count the relations of a partition of the cases (in a worker process)
+    return oracle_class._count_relations(compiled_log, config)
+
+
+class DirectlyFollowsConcurrencyOracle(CountBasedConcurrencyOracle):
+    @staticmethod
+    def _count_relations(event_log: Union[pd.DataFrame, CompiledLog], config: Configuration) -> RelationCounts:
+        # Only keep track of the activities
+        activities, _, _ = _get_trace_sequences(compile_log(event_log, config.log_ids))
+        return RelationCounts(activities)
+
+    @staticmethod
+    def _get_concurrency_matrix(counts: RelationCounts, config: Configuration) -> np.ndarray:
+        # Default with no concurrency (all directly-follows relations)
+        return np.zeros((len(counts.activities), len(counts.activities)), dtype=bool)
+
+
+class AlphaConcurrencyOracle(CountBasedConcurrencyOracle):
+    @staticmethod
+    def _count_relations(event_log: Union[pd.DataFrame, CompiledLog], config: Configuration) -> RelationCounts:
+        # Get matrix for directly-follows relations df_count[A, B] = number of times B following A
+        activities, df_count, _ = _get_df_counts(compile_log(event_log, config.log_ids))
+        return RelationCounts(activities, df=df_count)
+
+    @staticmethod
+    def _get_concurrency_matrix(counts: RelationCounts, config: Configuration) -> np.ndarray:
         # Alpha concurrency
-        # Initialize dictionary for directly-follows relations df_relations[A][B] = number of times B following A
-        df_relations = _get_df_relations(event_log, config.log_ids)
+        df_count = counts.matrices["df"]
         # Create concurrency if there is a directly-follows relation in both directions
-        concurrency = {}
-        activities = event_log[config.log_ids.activity].unique()
-        for act_a in activities:
-            concurrency[act_a] = set()
-            for act_b in activities:
-                if act_a != act_b and act_a in df_relations.get(act_b, []) and act_b in df_relations.get(act_a, []):
-                    # Concurrency relation AB, add it to A
-                    concurrency[act_a].add(act_b)
-        # Super
-        super(AlphaConcurrencyOracle, self).__init__(concurrency, config)
+        concurrency_matrix = (df_count > 0) & (df_count.T > 0)
+        np.fill_diagonal(concurrency_matrix, False)
+        return concurrency_matrix
+
+
+def _get_trace_sequences(compiled_log: CompiledLog) -> (np.ndarray, np.ndarray, np.ndarray):
+    # Activity labels, and case and activity codes of the events sorted by case (keeping the order of the events within each trace)
+    order = compiled_log.case_order
+    return compiled_log.activities, compiled_log.case_codes[order], compiled_log.activity_codes[order].astype(np.int64)
+
+
+def _get_df_counts(compiled_log: CompiledLog) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+    Count, in a single pass over the event log, the directly-follows relations and length-2 loops between its activities.
+
+    :param compiled_log:    compiled event log to count the relations from.
+
+    :return: a tuple with the array of activity labels, the matrix df_count[A, B] = number of times B directly follows A, and the matrix
+             l2l_count[A, B] = number of times the sequence A-B-A happens; rows and columns indexed as the activity labels.
+    """
+    activities, case_codes, activity_codes = _get_trace_sequences(compiled_log)
+    n_activities = len(activities)
+    # Directly-follows pairs: consecutive events within the same trace
+    same_case = case_codes[:-1] == case_codes[1:]
+    df_pairs = activity_codes[:-1][same_case] * n_activities + activity_codes[1:][same_case]
+    df_count = np.bincount(df_pairs, minlength=n_activities * n_activities).reshape(n_activities, n_activities)
+    # Length-2 loops: sequences A-B-A within the same trace
+    same_case = (case_codes[:-2] == case_codes[2:]) & (activity_codes[:-2] == activity_codes[2:])
+    l2l_pairs = activity_codes[:-2][same_case] * n_activities + activity_codes[1:-1][same_case]
+    l2l_count = np.bincount(l2l_pairs, minlength=n_activities * n_activities).reshape(n_activities, n_activities)
+    return activities, df_count, l2l_count
+
 
+def _concurrency_matrix_to_dict(activities: list, concurrency_matrix: np.ndarray) -> dict:
+    # Transform the boolean matrix concurrency_matrix[A, B] into a dict concurrency[A] = set of activities concurrent with A
+    concurrency = {activity: set() for activity in activities}
+    for code_a, code_b in zip(*np.nonzero(concurrency_matrix)):
+        concurrency[activities[code_a]].add(activities[code_b])
+    return concurrency
 
-def _get_df_relations(event_log: pd.DataFrame, log_ids: EventLogIDs) -> dict:
-    # Initialize dictionary for directly-follows relations df_relations[A][B] = number of times B following A
-    df_relations = {activity: {} for activity in event_log[log_ids.activity].unique()}
-    # Fill dictionary with directly-follows relations
-    for (key, trace) in event_log.groupby(log_ids.case):
-        for (i, current_event), (j, future_event) in zip_with_next(trace.iterrows()):
-            current_activity = current_event[log_ids.activity]
-            future_activity = future_event[log_ids.activity]
-            # Store df relation
-            df_relations[current_activity][future_activity] = df_relations[current_activity].get(future_activity, 0) + 1
-    return df_relations
 
+class HeuristicsConcurrencyOracle(CountBasedConcurrencyOracle):
+    @staticmethod
+    def _count_relations(event_log: Union[pd.DataFrame, CompiledLog], config: Configuration) -> RelationCounts:
+        # Get matrices for directly-follows relations and length 2 loops
+        activities, df_count, l2l_count = _get_df_counts(compile_log(event_log, config.log_ids))
+        return RelationCounts(activities, df=df_count, l2l=l2l_count)
 
-class HeuristicsConcurrencyOracle(ConcurrencyOracle):
-    def __init__(self, event_log: pd.DataFrame, config: Configuration):
+    @staticmethod
+    def _get_concurrency_matrix(counts: RelationCounts, config: Configuration) -> np.ndarray:
         # Heuristics concurrency
-        activities = event_log[config.log_ids.activity].unique()
+        df_count, l2l_count = counts.matrices["df"], counts.matrices["l2l"]
         # Get matrices for:
-        # - Directly-follows relations: df_count[A][B] = number of times B following A
-        # - Directly-follows dependency values: df_dependency[A][B] = value of certainty that there is a df-relation between A and B
-        # - Length-2 loop values: l2l_dependency[A][B] = value of certainty that there is a l2l relation between A and B (A-B-A)
-        (df_count, df_dependency, l2l_dependency) = _get_heuristics_matrices(event_log, activities, config)
+        # - Directly-follows dependency values: df_dependency[A, B] = value of certainty that there is a df-relation between A and B
+        # - Length-2 loop values: l2l_dependency[A, B] = value of certainty that there is a l2l relation between A and B (A-B-A)
+        (df_dependency, l2l_dependency) = _get_heuristics_matrices(df_count, l2l_count, config)
         # Create concurrency if there is a directly-follows relation in both directions
-        concurrency = {}
-        for act_a in activities:
-            concurrency[act_a] = set()
-            for act_b in activities:
-                if (act_a != act_b and  # They are not the same activity
-                        df_count[act_a].get(act_b, 0) > 0 and  # 'B' follows 'A' at least once
-                        df_count[act_b].get(act_a, 0) > 0 and  # 'A' follows 'B' at least once
-                        l2l_dependency[act_a].get(act_b, 0) < config.concurrency_thresholds.l2l and  # 'A' and 'B' are not a length 2 loop
-                        abs(df_dependency[act_a].get(act_b, 0)) < config.concurrency_thresholds.df):  # The df relations are weak
-                    # Concurrency relation AB, add it to A
-                    concurrency[act_a].add(act_b)
-        # Super
-        super(HeuristicsConcurrencyOracle, self).__init__(concurrency, config)
-
-
-def _get_heuristics_matrices(event_log: pd.DataFrame, activities: list, config: Configuration) -> (dict, dict, dict):
-    # Initialize dictionary for directly-follows relations df_count[A][B] = number of times B following A
-    df_count = {activity: {} for activity in activities}
-    # Initialize dictionary for length 2 loops
-    l2l_count = {activity: {} for activity in activities}
-    # Count directly-follows and l2l relations
-    for (key, trace) in event_log.groupby(config.log_ids.case):
-        previous_activity = None
-        # Iterate the events of the trace in pairs: (e1, e2), (e2, e3), (e3, e4)...
-        for (i, current_event), (j, future_event) in zip_with_next(trace.iterrows()):
-            current_activity = current_event[config.log_ids.activity]
-            future_activity = future_event[config.log_ids.activity]
-            # Store df relation
-            df_count[current_activity][future_activity] = df_count[current_activity].get(future_activity, 0) + 1
-            # Process l2l
-            if previous_activity:
-                # Increase value if there is a length 2 loop (A-B-A)
-                if previous_activity == future_activity:
-                    l2l_count[previous_activity][current_activity] = l2l_count[previous_activity].get(current_activity, 0) + 1
-            # Save previous activity
-            previous_activity = current_activity
-    # Fill df and l1l dependency matrices
-    df_dependency = {activity: {} for activity in activities}
-    l1l_dependency = {activity: 0 for activity in activities}
-    for act_a in activities:
-        for act_b in activities:
-            if act_a != act_b:
-                # Process directly follows dependency value A -> B
-                ab = df_count[act_a].get(act_b, 0)
-                ba = df_count[act_b].get(act_a, 0)
-                df_dependency[act_a][act_b] = (ab - ba) / (ab + ba + 1)
-            else:
-                # Process length 1 loop value
-                aa = df_count[act_a].get(act_a, 0)
-                l1l_dependency[act_a] = aa / (aa + 1)
-    # Fill l2l dependency matrix
-    l2l_dependency = {activity: {} for activity in activities}
-    for act_a in activities:
-        for act_b in activities:
-            if act_a != act_b and \
-                    l1l_dependency[act_a] < config.concurrency_thresholds.l1l and \
-                    l1l_dependency[act_b] < config.concurrency_thresholds.l1l:
-                # Process directly follows dependency value A -> B
-                aba = l2l_count[act_a].get(act_b, 0)
-                bab = l2l_count[act_b].get(act_a, 0)
-                l2l_dependency[act_a][act_b] = (aba + bab) / (aba + bab + 1)
-            else:
-                l2l_dependency[act_a][act_b] = 0
+        concurrency_matrix = (
+                (df_count > 0) &  # 'B' follows 'A' at least once
+                (df_count.T > 0) &  # 'A' follows 'B' at least once
+                (l2l_dependency < config.concurrency_thresholds.l2l) &  # 'A' and 'B' are not a length 2 loop
+                (np.abs(df_dependency) < config.concurrency_thresholds.df)  # The df relations are weak
+        )
+        np.fill_diagonal(concurrency_matrix, False)  # They are not the same activity
+        return concurrency_matrix
+
+
+def _get_heuristics_matrices(df_count: np.ndarray, l2l_count: np.ndarray, config: Configuration) -> (np.ndarray, np.ndarray):
+    # Directly follows dependency values A -> B (0 in the diagonal)
+    df_dependency = (df_count - df_count.T) / (df_count + df_count.T + 1)
+    # Length 1 loop values
+    self_loops = np.diagonal(df_count)
+    l1l_dependency = self_loops / (self_loops + 1)
+    # Length 2 loop dependency values (0 for the same activity and for activities in length 1 loops)
+    l2l_dependency = (l2l_count + l2l_count.T) / (l2l_count + l2l_count.T + 1)
+    no_l1l = l1l_dependency < config.concurrency_thresholds.l1l
+    l2l_dependency[~np.outer(no_l1l, no_l1l)] = 0
+    np.fill_diagonal(l2l_dependency, 0)
     # Return matrices with dependency values
-    return df_count, df_dependency, l2l_dependency
+    return df_dependency, l2l_dependency
 
 
-class OverlappingConcurrencyOracle(ConcurrencyOracle):
-    def __init__(self, event_log: pd.DataFrame, config: Configuration):
-        # Get the activity labels
-        activities = set(event_log[config.log_ids.activity])
-        # Get matrix with the frequency of each activity happening overlapping with the rest and in directly-follows order
-        overlapping_relations = _get_overlapping_matrix(event_log, activities, config)
-        # Create concurrency if the overlapping relations is higher than the threshold specifies
-        concurrency = {activity: set() for activity in activities}
-        already_checked = set()
-        for act_a in activities:
-            # Store as already checked to avoid redundant checks
-            already_checked.add(act_a)
-            # Get the number of occurrences of A per case
-            occurrences_a = Counter(event_log[event_log[config.log_ids.activity] == act_a][config.log_ids.case])
-            for act_b in (activities - already_checked):
-                # Get the number of occurrences of B per case
-                occurrences_b = Counter(event_log[event_log[config.log_ids.activity] == act_b][config.log_ids.case])
-                # Compute number of times they co-occur
-                co_occurrences = sum([
-                    occurrences_a[case_id] * occurrences_b[case_id]
-                    for case_id
-                    in set(list(occurrences_a.keys()) + list(occurrences_b.keys()))
-                ])
-                # Check if the proportion of overlapping occurrences is higher than the established threshold
-                if co_occurrences > 0:
-                    overlapping_ratio = overlapping_relations[act_a].get(act_b, 0) / co_occurrences
-                    if overlapping_ratio >= config.concurrency_thresholds.df:
-                        # Concurrency relation AB, add it
-                        concurrency[act_a].add(act_b)
-                        concurrency[act_b].add(act_a)
+class OverlappingConcurrencyOracle(CountBasedConcurrencyOracle):
+    def __init__(self, event_log: Union[pd.DataFrame, CompiledLog], config: Configuration):
         # Set flag to consider start times also when individually checking enabled time
         config.consider_start_times = True
         # Super
-        super(OverlappingConcurrencyOracle, self).__init__(concurrency, config)
+        super(OverlappingConcurrencyOracle, self).__init__(event_log, config)
+
+    @classmethod
+    def from_counts(
+            cls,
+            counts: RelationCounts,
+            config: Configuration,
+            concurrency_matrix: Optional[np.ndarray] = None
+    ) -> 'OverlappingConcurrencyOracle':
+        # Set flag to consider start times also when individually checking enabled time
+        config.consider_start_times = True
+        # Super
+        return super(OverlappingConcurrencyOracle, cls).from_counts(counts, config, concurrency_matrix)
+
+    @staticmethod
+    def _count_relations(event_log: Union[pd.DataFrame, CompiledLog], config: Configuration) -> RelationCounts:
+        # Get matrix with the frequency of each activity happening overlapping with the rest and in directly-follows order
+        compiled_log = compile_log(event_log, config.log_ids)
+        activities, overlapping_count = _get_overlapping_counts(compiled_log, config)
+        # Get matrix with the number of times each pair of activities co-occur in the same case
+        co_occurrences = _get_co_occurrence_counts(compiled_log)
+        return RelationCounts(activities, overlapping=overlapping_count, co_occurrences=co_occurrences)
+
+    @staticmethod
+    def _get_concurrency_matrix(counts: RelationCounts, config: Configuration) -> np.ndarray:
+        overlapping_count, co_occurrences = counts.matrices["overlapping"], counts.matrices["co_occurrences"]
+        # Create concurrency if the overlapping relations is higher than the threshold specifies
+        with np.errstate(divide="ignore", invalid="ignore"):
+            overlapping_ratio = overlapping_count / co_occurrences
+        concurrency_matrix = np.triu((co_occurrences > 0) & (overlapping_ratio >= config.concurrency_thresholds.df), k=1)
+        concurrency_matrix |= concurrency_matrix.T
+        return concurrency_matrix
+
+
+def _get_co_occurrence_counts(compiled_log: CompiledLog) -> np.ndarray:
+    # Sparse matrix with the number of occurrences of each activity (column) in each case (row)
+    order = compiled_log.case_order
+    occurrences = sparse.csr_matrix(
+        (np.ones(len(order), dtype=np.int64), (compiled_log.case_codes[order], compiled_log.activity_codes[order])),
+        shape=(len(compiled_log.cases), len(compiled_log.activities))
+    )
+    # Number of times they co-occur: co_occurrences[A, B] = sum over the cases of (occurrences of A * occurrences of B)
+    return (occurrences.T @ occurrences).toarray()
+
+
+def _get_overlapping_counts(
+        event_log: Union[pd.DataFrame, CompiledLog],
+        config: Configuration,
+        max_pairs: int = 5_000_000
+) -> (np.ndarray, np.ndarray):
+    """
+    Count the number of times each activity overlaps with the others within the same trace. Instead of checking each event against the
+    full trace, the events are swept in start time order and only the pairs of events whose intervals intersect are checked.
+
+    :param event_log:   event log (or its compiled version) to count the overlapping relations from.
+    :param config:      configuration with the IDs of the columns of the event log.
+    :param max_pairs:   maximum number of candidate pairs of events to check at once (bounds the memory usage).
+
+    :return: a tuple with the array of activity labels, and the matrix overlapping_count[A, B] = number of times B overlaps with A.
+    """
+    compiled_log = compile_log(event_log, config.log_ids)
+    activities, case_codes = compiled_log.activities, compiled_log.case_codes
+    activity_codes = compiled_log.activity_codes.astype(np.int64)
+    n_activities = len(activities)
+    overlapping_count = np.zeros(n_activities * n_activities, dtype=np.int64)
+    starts, ends = compiled_log.start_times, compiled_log.end_times
+    # Candidate interval of each event (an event overlapping with another one intersects with it)
+    interval_starts = np.where(starts == NAT, ends, np.where(ends == NAT, starts, np.minimum(starts, ends)))
+    interval_ends = np.where(starts == NAT, ends, np.where(ends == NAT, starts, np.maximum(starts, ends)))
+    # Sort the events by case and start of their interval
+    candidates = np.flatnonzero((case_codes >= 0) & (interval_starts != NAT))
+    order = candidates[np.lexsort((interval_starts[candidates], case_codes[candidates]))]
+    if len(order) == 0:
+        return activities, overlapping_count.reshape(n_activities, n_activities)
+    unique_starts, start_ranks = np.unique(interval_starts[order], return_inverse=True)
+    width = len(unique_starts) + 1
+    case_keys = case_codes[order].astype(np.int64) * width
+    keys = case_keys + start_ranks
+    # For each event, the following events of its trace starting before (or at) its end intersect with it
+    end_ranks = np.searchsorted(unique_starts, interval_ends[order], side="right")
+    limits = np.searchsorted(keys, case_keys + end_ranks, side="left")
+    n_candidates = np.maximum(limits - np.arange(len(order)) - 1, 0)
+    # Check the pairs of intersecting events in batches
+    cumulative_pairs = np.cumsum(n_candidates)
+    batch_limits = np.searchsorted(cumulative_pairs, np.arange(max_pairs, cumulative_pairs[-1], max_pairs), side="right")
+    for batch in np.split(np.arange(len(order)), batch_limits):
+        if len(batch) == 0:
+            continue
+        batch_counts = n_candidates[batch]
+        first = np.repeat(batch, batch_counts)
+        second = first + 1 + np.arange(batch_counts.sum()) - np.repeat(np.cumsum(batch_counts) - batch_counts, batch_counts)
+        first, second = order[first], order[second]
+        # Count both directions of each pair of events
+        for current, other in ((first, second), (second, first)):
+            overlapping = _overlaps(current, other, starts, ends, activity_codes)
+            overlapping_count += np.bincount(
+                activity_codes[current[overlapping]] * n_activities + activity_codes[other[overlapping]],
+                minlength=n_activities * n_activities
+            )
+    return activities, overlapping_count.reshape(n_activities, n_activities)
+
+
+def _overlaps(current: np.ndarray, other: np.ndarray, starts: np.ndarray, ends: np.ndarray, activity_codes: np.ndarray) -> np.ndarray:
+    # Check if each [other] event overlaps with its [current] event (NaT is never before nor after a timestamp)
+    current_start, current_end, other_start, other_end = starts[current], ends[current], starts[other], ends[other]
+    current_start_valid, current_end_valid = current_start != NAT, current_end != NAT
+    other_start_valid, other_end_valid = other_start != NAT, other_end != NAT
+    return (
+            # The current event starts while the other is being executed; OR
+            (current_start_valid & other_start_valid & current_end_valid &
+             (current_start < other_start) & (other_start < current_end)) |
+            # the current event ends while the other is being executed; OR
+            (current_start_valid & other_end_valid & current_end_valid &
+             (current_start < other_end) & (other_end < current_end)) |
+            # the other event starts and ends within the current one, and it's not the current one.
+            (other_start_valid & current_start_valid & current_end_valid & other_end_valid &
+             (other_start <= current_start) & (current_end <= other_end) &
+             (activity_codes[current] != activity_codes[other]))
+    )
 
 
 def _get_overlapping_matrix(event_log: pd.DataFrame, activities: set, config: Configuration) -> dict:
     # Initialize dictionary for overlapping relations df_count[A][B] = number of times B overlaps with A
     overlapping_relations = {activity: {} for activity in activities}
     # Count overlapping relations
-    for (key, trace) in event_log.groupby(config.log_ids.case):
-        # Iterate the events of the trace
-        for (i, event) in trace.iterrows():
-            current_activity = event[config.log_ids.activity]
-            # Get labels of overlapping activity instances
-            overlapping_labels = trace[
-                ((event[config.log_ids.start_time] < trace[config.log_ids.start_time]) &  # The current event starts while the other
-                 (trace[config.log_ids.start_time] < event[config.log_ids.end_time])) |  # is being executed; OR
-                ((event[config.log_ids.start_time] < trace[config.log_ids.end_time]) &  # the current event ends while the other
-                 (trace[config.log_ids.end_time] < event[config.log_ids.end_time])) |  # is being executed; OR
-                ((trace[config.log_ids.start_time] <= event[config.log_ids.start_time]) &  # the other event starts and
-                 (event[config.log_ids.end_time] <= trace[config.log_ids.end_time]) &  # ends within the current one,
-                 (event[config.log_ids.activity] != trace[config.log_ids.activity]))  # and it's not the current one.
-                ][config.log_ids.activity]
-            for overlapping_activity in overlapping_labels:
-                overlapping_relations[current_activity][overlapping_activity] = (
-                        overlapping_relations[current_activity].get(overlapping_activity, 0) + 1
-                )
+    log_activities, overlapping_count = _get_overlapping_counts(event_log, config)
+    for code_a, code_b in zip(*np.nonzero(overlapping_count)):
+        if log_activities[code_a] in overlapping_relations:
+            overlapping_relations[log_activities[code_a]][log_activities[code_b]] = int(overlapping_count[code_a, code_b])
     # Return matrix with dependency values
     return overlapping_relations
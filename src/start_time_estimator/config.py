@@ -1,5 +1,6 @@
 import enum
 from dataclasses import dataclass, field
+from typing import Optional
 
 from pix_framework.log_ids import DEFAULT_CSV_IDS, EventLogIDs
 
@@ -30,6 +31,12 @@ class ResourceAvailabilityType(enum.Enum):
     WITH_CALENDAR = 2  # Future possibility considering also the resource calendars and non-working days
 
 
+class KernelBackend(enum.Enum):
+    AUTO = 1  # JIT-compiled kernels if Numba is installed, NumPy ones otherwise
+    NUMPY = 2  # Vectorized NumPy kernels
+    NUMBA = 3  # JIT-compiled kernels (requires Numba)
+
+
 @dataclass
 class ConcurrencyThresholds:
     df: float = 0.9
@@ -70,6 +77,17 @@ class Configuration:
         outlier_threshold           Threshold to control outliers, those events with estimated durations over
         working_schedules           Dictionary with the resources as key and the working calendars (RCalendar)
                                     as value.
+        n_jobs                      Number of worker processes to compute the resource availability and enabled
+                                    times of the events (split by cases). 1 to run everything in the current
+                                    process, -1 to use all the available CPUs.
+        oracle_cache_dir            Directory where to store the discovered concurrency oracles (their relation
+                                    counts and concurrency relations), to load them instead of discovering them
+                                    again when estimating over the same event log. None to not cache them.
+        kernel_backend              Implementation of the enabled time and resource availability searches: the
+                                    JIT-compiled (Numba) kernels, the vectorized NumPy ones, or AUTO to use the
+                                    JIT-compiled ones only if Numba is installed.
+        profile                     Record the wall time, peak memory, and number of events of each stage of the
+                                    estimation (see StartTimeEstimator.profiler).
     """
     log_ids: EventLogIDs = field(default_factory=lambda: DEFAULT_CSV_IDS)
     concurrency_oracle_type: ConcurrencyOracleType = ConcurrencyOracleType.HEURISTICS
@@ -84,3 +102,7 @@ class Configuration:
     outlier_statistic: OutlierStatistic = OutlierStatistic.MEDIAN
     outlier_threshold: float = float('nan')
     working_schedules: dict = field(default_factory=dict)
+    n_jobs: int = 1
+    oracle_cache_dir: Optional[str] = None
+    kernel_backend: KernelBackend = KernelBackend.AUTO
+    profile: bool = False
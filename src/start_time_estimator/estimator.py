@@ -1,63 +1,276 @@
 import math
+from concurrent.futures import ProcessPoolExecutor
 from statistics import mode
+from typing import Optional, Type
 
 import numpy as np
 import pandas as pd
 
+from start_time_estimator.compiled_log import CompiledLog
 from start_time_estimator.concurrency_oracle import DirectlyFollowsConcurrencyOracle, AlphaConcurrencyOracle, \
-    HeuristicsConcurrencyOracle, DeactivatedConcurrencyOracle, OverlappingConcurrencyOracle
+    HeuristicsConcurrencyOracle, DeactivatedConcurrencyOracle, OverlappingConcurrencyOracle, CountBasedConcurrencyOracle, \
+    ConcurrencyOracle, RelationCounts
 from start_time_estimator.config import ConcurrencyOracleType, ReEstimationMethod, ResourceAvailabilityType, OutlierStatistic, Configuration
-from start_time_estimator.resource_availability import SimpleResourceAvailability, CalendarResourceAvailability
+from start_time_estimator.incremental import IncrementalEstimation
+from start_time_estimator.oracle_cache import ConcurrencyOracleCache
+from start_time_estimator.profiling import Profiler
+from start_time_estimator.resource_availability import SimpleResourceAvailability, CalendarResourceAvailability, ResourceAvailability, \
+    get_working_schedules_key
+from start_time_estimator.utils import get_n_workers, split_by_cases, to_nanoseconds, from_nanoseconds, get_durations, NAT
 
 
 class StartTimeEstimator:
-    def __init__(self, event_log: pd.DataFrame, config: Configuration):
+    def __init__(
+            self,
+            event_log: pd.DataFrame,
+            config: Configuration,
+            concurrency_oracle: Optional[ConcurrencyOracle] = None,
+            resource_availability: Optional[ResourceAvailability] = None,
+            profiler: Optional[Profiler] = None
+    ):
         # Set event log
         self.event_log = event_log
         # Set configuration
         self.config = config
         # Set log IDs to ease access within class
         self.log_ids = config.log_ids
-        # Set concurrency oracle
-        if self.config.concurrency_oracle_type == ConcurrencyOracleType.DEACTIVATED:
+        # Set profiler of the estimation stages (enabled only if configured, when not given)
+        self.profiler = profiler if profiler is not None else Profiler(enabled=config.profile)
+        # Compiled columns of the event log used by the concurrency oracle and the resource availability (built once, on demand)
+        self._compiled_log = None
+        # Set concurrency oracle (discovering it from the event log if not given)
+        if concurrency_oracle is not None:
+            self.concurrency_oracle = concurrency_oracle
+        elif self.config.concurrency_oracle_type == ConcurrencyOracleType.DEACTIVATED:
             self.concurrency_oracle = DeactivatedConcurrencyOracle(self.config)
         elif self.config.concurrency_oracle_type == ConcurrencyOracleType.DF:
-            self.concurrency_oracle = DirectlyFollowsConcurrencyOracle(self.event_log, self.config)
+            self.concurrency_oracle = self._discover_concurrency_oracle(DirectlyFollowsConcurrencyOracle)
         elif self.config.concurrency_oracle_type == ConcurrencyOracleType.ALPHA:
-            self.concurrency_oracle = AlphaConcurrencyOracle(self.event_log, self.config)
+            self.concurrency_oracle = self._discover_concurrency_oracle(AlphaConcurrencyOracle)
         elif self.config.concurrency_oracle_type == ConcurrencyOracleType.HEURISTICS:
-            self.concurrency_oracle = HeuristicsConcurrencyOracle(self.event_log, self.config)
+            self.concurrency_oracle = self._discover_concurrency_oracle(HeuristicsConcurrencyOracle)
         elif self.config.concurrency_oracle_type == ConcurrencyOracleType.OVERLAPPING:
-            self.concurrency_oracle = OverlappingConcurrencyOracle(self.event_log, self.config)
+            self.concurrency_oracle = self._discover_concurrency_oracle(OverlappingConcurrencyOracle)
         else:
             raise ValueError("No concurrency oracle defined!")
-        # Set resource availability
-        if self.config.resource_availability_type == ResourceAvailabilityType.SIMPLE:
-            self.resource_availability = SimpleResourceAvailability(self.event_log, self.config)
+        # Set resource availability (building it from the event log if not given)
+        if resource_availability is not None:
+            self.resource_availability = resource_availability
+        elif self.config.resource_availability_type == ResourceAvailabilityType.SIMPLE:
+            compiled_log = self._get_compiled_log()
+            with self.profiler.stage("resource_index", rows=compiled_log.n_events):
+                self.resource_availability = SimpleResourceAvailability(compiled_log, self.config)
         elif self.config.resource_availability_type == ResourceAvailabilityType.WITH_CALENDAR:
-            self.resource_availability = CalendarResourceAvailability(self.event_log, self.config)
+            compiled_log = self._get_compiled_log()
+            with self.profiler.stage("resource_index", rows=compiled_log.n_events):
+                self.resource_availability = CalendarResourceAvailability(compiled_log, self.config)
         else:
             raise ValueError("No resource availability defined!")
+        # State of the incremental estimation (see update), and the key of the resource availability configuration it was computed with
+        self._incremental = None
+        self._incremental_availability_key = None
+        # Resource availability and enabled times of the event log computed by previous estimations, by the configuration they depend on
+        self._stage_cache = {}
 
-    def estimate(self, replace_recorded_start_times: bool = False) -> pd.DataFrame:
+    @classmethod
+    def fit(cls, event_log: pd.DataFrame, config: Configuration) -> 'FittedStartTimeEstimator':
+        """
+        Discover the concurrency oracle from a reference event log, to estimate the start times of other event logs of the same process
+        (e.g. daily extracts) without discovering it again. The resource availability is not built from [event_log], but from each
+        estimated event log, and the fitted estimator keeps no reference to [event_log].
+
+        :param event_log:   reference event log to discover the concurrency oracle from.
+        :param config:      configuration of the estimation.
+
+        :return: the fitted estimator, with the discovered concurrency oracle.
+        """
+        # Build only the concurrency oracle (with an empty resource availability, not used)
+        estimator = cls(event_log, config, resource_availability=ResourceAvailability({}, {}, config))
+        return FittedStartTimeEstimator(estimator.concurrency_oracle, config)
+
+    def _discover_concurrency_oracle(self, oracle_class: Type[CountBasedConcurrencyOracle]) -> CountBasedConcurrencyOracle:
+        # Discover the concurrency oracle from the event log, or load it from the cache (if configured)
+        with self.profiler.stage("oracle_discovery", rows=len(self.event_log)):
+            if self.config.oracle_cache_dir is not None:
+                # Count the relations only if not cached
+                cache = ConcurrencyOracleCache(self.config.oracle_cache_dir)
+                return cache.get_concurrency_oracle(self.event_log, oracle_class, self.config, lambda: self._count_relations(oracle_class))
+            counts = self._count_relations(oracle_class)
+            with self.profiler.stage("derive_concurrency"):
+                return oracle_class.from_counts(counts, self.config)
+
+    def _count_relations(self, oracle_class: Type[CountBasedConcurrencyOracle]) -> RelationCounts:
+        # Count the relations (e.g. directly-follows) between the activities of the compiled event log (splitting the cases among
+        # processes if configured)
+        compiled_log = self._get_compiled_log()
+        with self.profiler.stage("count_relations", rows=compiled_log.n_events):
+            n_workers = get_n_workers(self.config.n_jobs)
+            if n_workers > 1:
+                return oracle_class.count_relations_in_parallel(compiled_log, self.config, n_workers)
+            return oracle_class._count_relations(compiled_log, self.config)
+
+    def _get_compiled_log(self) -> CompiledLog:
+        # Compile the event log the first time it is needed
+        if self._compiled_log is None:
+            with self.profiler.stage("compile_log", rows=len(self.event_log)):
+                self._compiled_log = CompiledLog(self.event_log, self.log_ids)
+        return self._compiled_log
+
+    def estimate(self, replace_recorded_start_times: bool = False, inplace: bool = False) -> pd.DataFrame:
         """
         Estimate the start times of each activity instance in the event log based on the resource availability and enablement times with
         the configuration defined in the parameters.
 
         :param replace_recorded_start_times:    If 'true', replace the start time column with the estimated start
                                                 times, if 'false', the estimation is placed in its own column.
+        :param inplace:                         If 'true', add the estimated columns to the event log of this instance instead of to a
+                                                copy of it, so the rest of its columns are never copied.
+
+        :return: A copy of the event log (or the event log itself if [inplace]) with the estimated start time, the resource availability
+        time, and the enablement time for each activity instance.
 
-        :return: A copy of the event log with the estimated start time, the resource availability time, and the enablement time for each
-        activity instance.
+        The resource availability and enabled times are kept between calls, keyed by the concurrency oracle, the resource availability, and
+        the configuration fields they depend on, so calling it again after changing only the re-estimation settings (e.g. the
+        [re_estimation_method], the [outlier_threshold], or the [instant_activities]) only runs the final estimation stages. They are
+        computed again after an update(), or after editing the working calendars (also in place), but not if the columns of the event log
+        are modified in place.
         """
+        # Estimate the times working only with the columns needed (the rest are not copied)
+        with self.profiler.stage("estimate", rows=len(self.event_log)):
+            times = self._estimate_times(self.event_log, compiled_log=self._get_compiled_log())
         # Copy self event log to allow lunching this method many times
-        event_log = self.event_log.copy()
-        # Compute resource availability time if not already in the log
-        if self.log_ids.available_time not in event_log.columns:
-            self.resource_availability.add_resource_availability_times(event_log)
-        # Compute enablement time if not already in the log
-        if self.log_ids.enabled_time not in event_log.columns:
-            self.concurrency_oracle.add_enabled_times(event_log)
+        event_log = self.event_log if inplace else self.event_log.copy()
+        # Attach the computed times to the event log
+        for column in [self.log_ids.available_time, self.log_ids.enabled_time]:
+            if column not in event_log.columns:
+                event_log[column] = times[column].array
+        if replace_recorded_start_times:
+            # If replacement to true, set estimated as start times
+            event_log[self.log_ids.start_time] = times[self.log_ids.estimated_start_time].array
+        else:
+            event_log[self.log_ids.estimated_start_time] = times[self.log_ids.estimated_start_time].array
+        # Return estimated event log
+        return event_log
+
+    def update(self, new_events: pd.DataFrame) -> pd.DataFrame:
+        """
+        Append a batch of new events (of new or already existing cases) to the event log and update the estimation incrementally. The
+        concurrency relations are updated counting only the modified traces, the enabled times are only computed again for the modified
+        traces (and those with activities whose concurrency relations changed), the resource availability times only for the new events
+        and the previous events of their resources ending after them, and the start times only for these events and for those depending on
+        an activity statistic that changed (computed again only over the events of that activity). The event log is not concatenated nor
+        compiled again (until needed by estimate()). The first call computes the estimation of the whole event log, and so does the first
+        one after editing the working calendars (returning then all the rows).
+
+        :param new_events: events to append to the event log (with the same columns).
+
+        :return: the rows of the estimated event log (with the estimated start time, the resource availability time, and the enablement
+        time) that changed or were added with the update.
+        """
+        availability_key = _get_availability_key(self.config)
+        calendars_edited = self._incremental is not None and availability_key != self._incremental_availability_key
+        if self._incremental is None or calendars_edited:
+            # First call (or the working calendars were edited), estimate the whole event log
+            with self.profiler.stage("estimate", rows=len(self.event_log)):
+                self._incremental = IncrementalEstimation(self, self.event_log)
+            self._incremental_availability_key = availability_key
+        with self.profiler.stage("update", rows=len(new_events)):
+            changed = self._incremental.update(new_events)
+        if calendars_edited:
+            # The times of any event may have changed with the calendars
+            changed = np.arange(self._incremental.n_events)
+        self._event_log_batches += [new_events]
+        self._compiled_log = None
+        self._stage_cache = {}
+        # Return the estimated rows that changed
+        updated_events = self._take_event_log_rows(changed)
+        times = self._incremental.get_times(changed)
+        for column in times.columns:
+            updated_events[column] = times[column].array
+        return updated_events
+
+    @property
+    def event_log(self) -> pd.DataFrame:
+        # Concatenate the batches appended with update() the first time the whole event log is needed
+        if len(self._event_log_batches) > 1:
+            self._event_log_batches = [pd.concat(self._event_log_batches)]
+        return self._event_log_batches[0]
+
+    @event_log.setter
+    def event_log(self, event_log: pd.DataFrame):
+        self._event_log_batches = [event_log]
+
+    @property
+    def _incremental_times(self) -> Optional[pd.DataFrame]:
+        # Times of the incremental estimation (see update) of all the events
+        return self._incremental.get_times(np.arange(self._incremental.n_events)) if self._incremental is not None else None
+
+    def _take_event_log_rows(self, positions: np.ndarray) -> pd.DataFrame:
+        # Copy of the rows of the event log at [positions] (ascending), taken from each batch without concatenating them
+        offsets = np.cumsum([0] + [len(batch) for batch in self._event_log_batches])
+        return pd.concat([
+            batch.iloc[positions[(positions >= offsets[i]) & (positions < offsets[i + 1])] - offsets[i]]
+            for i, batch in enumerate(self._event_log_batches)
+        ])
+
+    def _estimate_times(
+            self,
+            event_log: pd.DataFrame,
+            compiled_log: Optional[CompiledLog] = None
+    ) -> pd.DataFrame:
+        # Estimate the start times with only the columns needed
+        columns = [
+            column for column in [self.log_ids.case, self.log_ids.activity, self.log_ids.resource, self.log_ids.start_time,
+                                  self.log_ids.end_time, self.log_ids.available_time, self.log_ids.enabled_time]
+            if column in event_log.columns
+        ]
+        times = event_log[columns].reset_index(drop=True)
+        # Times of the stages already computed with the same configuration (only when estimating the whole event log of this instance)
+        stage_keys = self._get_stage_keys() if event_log is self.event_log else {}
+        stage_keys = {column: key for column, key in stage_keys.items() if column not in times.columns}
+        for column, key in stage_keys.items():
+            if key in self._stage_cache:
+                times[column] = from_nanoseconds(self._stage_cache[key], times.index)
+        self._add_resource_availability_and_enabled_times(times, compiled_log)
+        for column, key in stage_keys.items():
+            if key not in self._stage_cache:
+                self._stage_cache[key] = to_nanoseconds(times[column])
+        self._add_estimated_start_times(times)
+        return times[[self.log_ids.available_time, self.log_ids.enabled_time, self.log_ids.estimated_start_time]]
+
+    def _get_stage_keys(self) -> dict:
+        # The resource availability times depend on the resource availability and the configuration it reads, and the enabled times on the
+        # concurrency oracle and the start times consideration (the rest of the configuration only affects the final estimation stages)
+        return {
+            self.log_ids.available_time: (self.log_ids.available_time, self.resource_availability, _get_availability_key(self.config)),
+            self.log_ids.enabled_time: (self.log_ids.enabled_time, self.concurrency_oracle, self.config.consider_start_times),
+        }
+
+    def _add_resource_availability_and_enabled_times(self, event_log: pd.DataFrame, compiled_log: Optional[CompiledLog] = None):
+        if get_n_workers(self.config.n_jobs) > 1:
+            # Compute resource availability and enablement times (if not already in the log) splitting the cases among processes
+            with self.profiler.stage("parallel_times", rows=len(event_log)):
+                self._add_times_in_parallel(event_log, compiled_log)
+        else:
+            # Compile the event log once for both computations (if not given)
+            if compiled_log is None:
+                with self.profiler.stage("compile_log", rows=len(event_log)):
+                    compiled_log = CompiledLog(event_log, self.log_ids)
+            # Compute resource availability time if not already in the log
+            if self.log_ids.available_time not in event_log.columns:
+                with self.profiler.stage("resource_availability", rows=len(event_log)):
+                    self.resource_availability.add_resource_availability_times(event_log, compiled_log)
+            # Compute enablement time if not already in the log
+            if self.log_ids.enabled_time not in event_log.columns:
+                with self.profiler.stage("enabled_times", rows=len(event_log)):
+                    self.concurrency_oracle.add_enabled_times(event_log, compiled_log=compiled_log)
+
+    def _add_estimated_start_times(self, event_log: pd.DataFrame):
+        with self.profiler.stage("initial_estimation", rows=len(event_log)):
+            self._add_initial_estimated_start_times(event_log)
+        self._fix_estimated_start_times(event_log)
+
+    def _add_initial_estimated_start_times(self, event_log: pd.DataFrame):
         # Assign estimated start timestamps
         event_log[self.log_ids.estimated_start_time] = event_log[
             [self.log_ids.available_time, self.log_ids.enabled_time]
@@ -73,34 +286,84 @@ class StartTimeEstimator:
             event_log[self.log_ids.activity].isin(self.config.instant_activities),
             self.log_ids.estimated_start_time
         ] = event_log[self.log_ids.end_time]
+
+    def _fix_estimated_start_times(
+            self,
+            event_log: pd.DataFrame,
+            outlier_statistic_durations: Optional[dict] = None,
+            re_estimation_durations: Optional[dict] = None
+    ):
         # Re-estimate start time of those events with an estimated duration over the threshold
         if not math.isnan(self.config.outlier_threshold):
-            self._re_estimate_durations_over_threshold(event_log)
+            with self.profiler.stage("outlier_re_estimation", rows=len(event_log)):
+                self._re_estimate_durations_over_threshold(event_log, outlier_statistic_durations)
         # Fix start time of those events for which it could not be estimated (with pd.NaT)
-        if self.config.re_estimation_method == ReEstimationMethod.SET_INSTANT:
-            self._set_instant_non_estimated_start_times(event_log)
-        else:
-            self._re_estimate_non_estimated_start_times(event_log)
-        # If replacement to true, set estimated as start times
-        if replace_recorded_start_times:
-            event_log[self.log_ids.start_time] = event_log[self.log_ids.estimated_start_time]
-            event_log.drop([self.log_ids.estimated_start_time], axis=1, inplace=True)
-        # Return estimated event log
-        return event_log
+        with self.profiler.stage("non_estimated_re_estimation", rows=len(event_log)):
+            if self.config.re_estimation_method == ReEstimationMethod.SET_INSTANT:
+                self._set_instant_non_estimated_start_times(event_log)
+            else:
+                self._re_estimate_non_estimated_start_times(event_log, re_estimation_durations)
 
-    def _re_estimate_durations_over_threshold(self, event_log: pd.DataFrame):
-        # Get only events with estimated start time
-        estimated_events = event_log[~pd.isna(event_log[self.log_ids.estimated_start_time])]
-        # For each event, if the duration is over the threshold, set the defined statistic
-        for activity, events in estimated_events.groupby(self.log_ids.activity):
-            statistic_duration = self._apply_statistic(events[self.log_ids.end_time] - events[self.log_ids.estimated_start_time])
-            duration_limit = self.config.outlier_threshold * statistic_duration
-            event_log.loc[
-                (event_log[self.log_ids.activity] == activity) &
-                (~pd.isna(event_log[self.log_ids.estimated_start_time])) &
-                ((event_log[self.log_ids.end_time] - event_log[self.log_ids.estimated_start_time]) > duration_limit),
-                self.log_ids.estimated_start_time
-            ] = event_log[self.log_ids.end_time] - duration_limit
+    def _add_times_in_parallel(self, event_log: pd.DataFrame, compiled_log: Optional[CompiledLog] = None):
+        compute_availability = self.log_ids.available_time not in event_log.columns
+        compute_enablement = self.log_ids.enabled_time not in event_log.columns
+        if not (compute_availability or compute_enablement):
+            return
+        # Split the cases in more partitions than workers to balance the load
+        n_workers = get_n_workers(self.config.n_jobs)
+        case_codes = compiled_log.case_codes if compiled_log is not None else pd.factorize(event_log[self.log_ids.case])[0]
+        partitions = split_by_cases(case_codes, n_workers * 4)
+        # Ship only the columns needed to compute the times
+        columns = [
+            column for column in [self.log_ids.case, self.log_ids.activity, self.log_ids.resource, self.log_ids.start_time,
+                                  self.log_ids.end_time]
+            if column in event_log.columns
+        ]
+        available_times = np.full(len(event_log), NAT, dtype=np.int64)
+        enabled_times = np.full(len(event_log), NAT, dtype=np.int64)
+        # Send the concurrency oracle and resource availability once to each worker, and the partitions as tasks
+        with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_estimation_worker,
+                initargs=(self.concurrency_oracle, self.resource_availability)
+        ) as executor:
+            results = executor.map(
+                _compute_partition_times,
+                (event_log[columns].iloc[partition] for partition in partitions),
+                [compute_availability] * len(partitions),
+                [compute_enablement] * len(partitions)
+            )
+            for partition, (partition_available_times, partition_enabled_times) in zip(partitions, results):
+                if compute_availability:
+                    available_times[partition] = partition_available_times
+                if compute_enablement:
+                    enabled_times[partition] = partition_enabled_times
+        # Set all times at once
+        if compute_availability:
+            event_log[self.log_ids.available_time] = from_nanoseconds(available_times, event_log.index)
+        if compute_enablement:
+            event_log[self.log_ids.enabled_time] = from_nanoseconds(enabled_times, event_log.index)
+
+    def _re_estimate_durations_over_threshold(self, event_log: pd.DataFrame, statistic_durations: Optional[dict] = None):
+        activity_codes, activities = pd.factorize(event_log[self.log_ids.activity])
+        end_times = to_nanoseconds(event_log[self.log_ids.end_time])
+        estimated_start_times = to_nanoseconds(event_log[self.log_ids.estimated_start_time])
+        durations = get_durations(end_times, estimated_start_times)
+        # Get the statistic of the durations of the events with estimated start time of each activity
+        if statistic_durations is None:
+            is_estimated = estimated_start_times != NAT
+            activity_statistics = self._get_activity_statistics(
+                activity_codes[is_estimated], durations[is_estimated], len(activities), self.config.outlier_statistic,
+                lambda activity_durations: self._apply_statistic(pd.Series(activity_durations))
+            )
+        else:
+            activity_statistics = _get_statistics_from_dict(statistic_durations, activities)
+        # For each event, if the duration is over the threshold, set the statistic of its activity times the threshold as duration
+        duration_limits = (activity_statistics.view("timedelta64[ns]") * self.config.outlier_threshold).view(np.int64)
+        event_limits = np.where(activity_codes >= 0, duration_limits[activity_codes], NAT)
+        over_threshold = (durations != NAT) & (event_limits != NAT) & (durations > event_limits)
+        estimated_start_times[over_threshold] = end_times[over_threshold] - event_limits[over_threshold]
+        event_log[self.log_ids.estimated_start_time] = from_nanoseconds(estimated_start_times, event_log.index)
 
     def _set_instant_non_estimated_start_times(self, event_log: pd.DataFrame):
         # Identify events with non_estimated as start time
@@ -110,20 +373,85 @@ class StartTimeEstimator:
             self.log_ids.estimated_start_time
         ] = event_log[self.log_ids.end_time]
 
-    def _re_estimate_non_estimated_start_times(self, event_log: pd.DataFrame):
-        # Get only events with estimated start time
-        estimated_events = event_log[~pd.isna(event_log[self.log_ids.estimated_start_time])]
-        # For each event, if the duration is over the threshold, set the defined statistic
-        for activity, events in estimated_events.groupby(self.log_ids.activity):
-            durations = (events[self.log_ids.end_time] - events[self.log_ids.estimated_start_time]).values
-            statistic_duration = self._get_activity_duration(durations)
-            event_log.loc[
-                (event_log[self.log_ids.activity] == activity) &
-                pd.isna(event_log[self.log_ids.estimated_start_time]),
-                self.log_ids.estimated_start_time
-            ] = event_log[self.log_ids.end_time] - statistic_duration
+    def _re_estimate_non_estimated_start_times(self, event_log: pd.DataFrame, statistic_durations: Optional[dict] = None):
+        activity_codes, activities = pd.factorize(event_log[self.log_ids.activity])
+        end_times = to_nanoseconds(event_log[self.log_ids.end_time])
+        estimated_start_times = to_nanoseconds(event_log[self.log_ids.estimated_start_time])
+        is_estimated = estimated_start_times != NAT
+        # Get the statistic of the durations of the events with estimated start time of each activity
+        if statistic_durations is None:
+            durations = get_durations(end_times, estimated_start_times)
+            activity_statistics = self._get_activity_statistics(
+                activity_codes[is_estimated], durations[is_estimated], len(activities), self.config.re_estimation_method,
+                self._get_activity_duration
+            )
+        else:
+            activity_statistics = _get_statistics_from_dict(statistic_durations, activities)
+        # For each non-estimated event, set the statistic of its activity as duration
+        event_statistics = np.where(activity_codes >= 0, activity_statistics[activity_codes], NAT)
+        re_estimate = ~is_estimated & (event_statistics != NAT) & (end_times != NAT)
+        estimated_start_times[re_estimate] = end_times[re_estimate] - event_statistics[re_estimate]
         # Set remaining non estimated activity instances to instant (those of activities with no estimated time)
-        event_log[self.log_ids.estimated_start_time].fillna(event_log[self.log_ids.end_time], inplace=True)
+        estimated_start_times = np.where(estimated_start_times == NAT, end_times, estimated_start_times)
+        event_log[self.log_ids.estimated_start_time] = from_nanoseconds(estimated_start_times, event_log.index)
+
+    def _get_activity_statistics(self, activity_codes: np.ndarray, durations: np.ndarray, n_activities: int, statistic, apply_statistic):
+        """
+        Compute, in a single grouped pass, the statistic (mode, median, or mean) of the durations of each activity. The result is the same
+        as applying [apply_statistic] to the durations of each activity (in log order), which is only done for the activities with missing
+        durations and, for the mean of a pd.Series, to keep the floating point summation of pandas.
+
+        :param activity_codes:  integer code of the activity of each duration (-1 if missing).
+        :param durations:       durations as int64 nanoseconds (NaT as minimum int64).
+        :param n_activities:    number of activity codes.
+        :param statistic:       statistic to compute (OutlierStatistic or ReEstimationMethod).
+        :param apply_statistic: function computing the statistic of the (timedelta64) durations of one activity.
+
+        :return: an array with the statistic of each activity as int64 nanoseconds (NaT if no durations).
+        """
+        activity_statistics = np.full(n_activities, NAT, dtype=np.int64)
+        in_activity = activity_codes >= 0
+        # Group the durations by activity keeping the log order within each group
+        order = np.argsort(activity_codes[in_activity], kind="stable")
+        codes, values = activity_codes[in_activity][order], durations[in_activity][order]
+        if len(codes) == 0:
+            return activity_statistics
+        group_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        group_sizes = np.diff(np.append(group_starts, len(codes)))
+        group_codes = codes[group_starts]
+        # Sort also by duration within each group (stable, so equal durations keep the log order)
+        by_duration = np.lexsort((values, codes))
+        sorted_codes, sorted_values = codes[by_duration], values[by_duration]
+        statistic_name = getattr(statistic, "name", None)
+        if statistic_name == "MODE":
+            # Most frequent duration, the first one in log order if tie
+            run_starts = np.flatnonzero(np.r_[True, (sorted_codes[1:] != sorted_codes[:-1]) | (sorted_values[1:] != sorted_values[:-1])])
+            run_counts = np.diff(np.append(run_starts, len(codes)))
+            run_codes = sorted_codes[run_starts]
+            best_runs = np.lexsort((by_duration[run_starts], -run_counts, run_codes))
+            best_runs = best_runs[np.r_[True, run_codes[best_runs][1:] != run_codes[best_runs][:-1]]]
+            group_statistics = sorted_values[run_starts[best_runs]]
+            vectorized = True
+        elif statistic_name == "MEDIAN":
+            # Middle duration, or mean of the two middle ones (truncated as numpy does with timedelta64)
+            lower, upper = sorted_values[group_starts + (group_sizes - 1) // 2], sorted_values[group_starts + group_sizes // 2]
+            middle_means = ((lower + upper).view("timedelta64[ns]") / 2).view(np.int64)
+            group_statistics = np.where(group_sizes % 2 == 1, lower, middle_means)
+            vectorized = True
+        elif statistic_name == "MEAN" and isinstance(statistic, ReEstimationMethod):
+            # Sum of durations divided by their number (truncated as numpy does with timedelta64)
+            group_statistics = (np.add.reduceat(values, group_starts).view("timedelta64[ns]") / group_sizes).view(np.int64)
+            vectorized = True
+        else:
+            group_statistics = np.full(len(group_codes), NAT, dtype=np.int64)
+            vectorized = False
+        # Apply the statistic function to the activities not computed in the grouped pass
+        has_missing = np.add.reduceat((values == NAT).astype(np.int64), group_starts) > 0
+        for group in np.flatnonzero(has_missing | (not vectorized)):
+            group_durations = values[group_starts[group]:group_starts[group] + group_sizes[group]]
+            group_statistics[group] = pd.Timedelta(apply_statistic(group_durations.view("timedelta64[ns]"))).value
+        activity_statistics[group_codes] = group_statistics
+        return activity_statistics
 
     def _get_activity_duration(self, durations):
         if self.config.re_estimation_method == ReEstimationMethod.MODE:
@@ -144,3 +472,71 @@ class StartTimeEstimator:
             return np.mean(durations)
         else:
             raise ValueError("Unselected outlier statistic for events with estimated duration over the established!")
+
+
+class FittedStartTimeEstimator:
+    def __init__(self, concurrency_oracle: ConcurrencyOracle, config: Configuration):
+        """
+        Start time estimator with a concurrency oracle already discovered (see StartTimeEstimator.fit), to estimate the start times of
+        many event logs of the same process. The resource availability is built from each estimated event log.
+
+        :param concurrency_oracle:  discovered concurrency oracle.
+        :param config:              configuration of the estimation.
+        """
+        self.concurrency_oracle = concurrency_oracle
+        self.config = config
+
+    def estimate(self, event_log: pd.DataFrame, replace_recorded_start_times: bool = False, inplace: bool = False) -> pd.DataFrame:
+        """
+        Estimate the start times of each activity instance in [event_log] with the fitted concurrency oracle, and the resource
+        availability of [event_log].
+
+        :param event_log:                       event log to estimate the start times of.
+        :param replace_recorded_start_times:    If 'true', replace the start time column with the estimated start
+                                                times, if 'false', the estimation is placed in its own column.
+        :param inplace:                         If 'true', add the estimated columns to [event_log] instead of to a copy of it.
+
+        :return: A copy of [event_log] (or [event_log] itself if [inplace]) with the estimated start time, the resource availability
+        time, and the enablement time for each activity instance.
+        """
+        estimator = StartTimeEstimator(event_log, self.config, concurrency_oracle=self.concurrency_oracle)
+        return estimator.estimate(replace_recorded_start_times, inplace)
+
+
+def _get_availability_key(config: Configuration) -> tuple:
+    # The resource availability times depend on the type, the start times consideration, the missing and bot resources, and the calendars
+    # (by their working intervals, so editing a calendar in place changes the key)
+    with_calendar = config.resource_availability_type == ResourceAvailabilityType.WITH_CALENDAR
+    return (
+        config.resource_availability_type, config.consider_start_times, config.missing_resource,
+        frozenset(config.bot_resources), get_working_schedules_key(config.working_schedules) if with_calendar else None
+    )
+
+
+def _get_statistics_from_dict(statistic_durations: dict, activities: pd.Index) -> np.ndarray:
+    # Statistic duration (as int64 nanoseconds) of each activity from a dict activity -> duration (NaT if not present)
+    return np.array([pd.Timedelta(statistic_durations.get(activity, pd.NaT)).value for activity in activities], dtype=np.int64)
+
+
+# Concurrency oracle and resource availability of the estimation worker processes (set once per process)
+_worker_concurrency_oracle = None
+_worker_resource_availability = None
+
+
+def _init_estimation_worker(concurrency_oracle, resource_availability):
+    global _worker_concurrency_oracle, _worker_resource_availability
+    _worker_concurrency_oracle = concurrency_oracle
+    _worker_resource_availability = resource_availability
+
+
+def _compute_partition_times(partition: pd.DataFrame, compute_availability: bool, compute_enablement: bool) -> (np.ndarray, np.ndarray):
+    # Compute the resource availability and enablement times of the events of a partition of cases
+    config = _worker_resource_availability.config
+    available_times, enabled_times = None, None
+    if compute_availability:
+        _worker_resource_availability.add_resource_availability_times(partition)
+        available_times = to_nanoseconds(partition[config.log_ids.available_time])
+    if compute_enablement:
+        _worker_concurrency_oracle.add_enabled_times(partition)
+        enabled_times = to_nanoseconds(partition[config.log_ids.enabled_time])
+    return available_times, enabled_times
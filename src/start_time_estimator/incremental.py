@@ -0,0 +1,331 @@
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from start_time_estimator.concurrency_oracle import CountBasedConcurrencyOracle
+from start_time_estimator.config import ReEstimationMethod
+from start_time_estimator.utils import to_nanoseconds, from_nanoseconds, get_durations, NAT
+
+
+class _GrowableColumns:
+    def __init__(self, columns: dict):
+        # Arrays with the values of each event, with spare capacity to append batches of events without copying the previous ones
+        self.n_events = len(next(iter(columns.values())))
+        self._arrays = {name: np.asarray(values) for name, values in columns.items()}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._arrays[name][:self.n_events]
+
+    def append(self, columns: dict):
+        n_new = len(next(iter(columns.values())))
+        capacity = len(next(iter(self._arrays.values())))
+        if self.n_events + n_new > capacity:
+            # Double the capacity (amortized constant cost per appended event)
+            new_capacity = max(2 * capacity, self.n_events + n_new)
+            for name, array in self._arrays.items():
+                grown = np.empty(new_capacity, dtype=array.dtype)
+                grown[:self.n_events] = array[:self.n_events]
+                self._arrays[name] = grown
+        for name, values in columns.items():
+            self._arrays[name][self.n_events:self.n_events + n_new] = values
+        self.n_events += n_new
+
+
+class _PositionIndex:
+    def __init__(self):
+        # Positions of the events of each label (e.g. case), as a list of ascending arrays (one per appended batch)
+        self._positions = {}
+
+    def add(self, labels: np.ndarray, positions: np.ndarray):
+        # Add the positions of a batch of events (missing labels are not indexed)
+        codes, uniques = pd.factorize(labels)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        for code, label in enumerate(uniques):
+            self._positions.setdefault(label, []).append(positions[order[bounds[code]:bounds[code + 1]]])
+
+    def get(self, label) -> np.ndarray:
+        # Positions of the events of [label] in log order (merging the arrays of each batch the first time)
+        positions = self._positions.get(label, [])
+        if len(positions) > 1:
+            positions[:] = [np.concatenate(positions)]
+        return positions[0] if len(positions) > 0 else np.array([], dtype=np.int64)
+
+    def get_many(self, labels) -> np.ndarray:
+        # Positions of the events of all the [labels] in log order
+        return np.sort(np.concatenate([self.get(label) for label in labels] + [np.array([], dtype=np.int64)]))
+
+
+class IncrementalEstimation:
+    def __init__(self, estimator, event_log: pd.DataFrame):
+        """
+        State of the incremental estimation of a StartTimeEstimator (see StartTimeEstimator.update): the columns and estimated times of
+        each event as arrays that grow with each batch, the positions of the events of each case, activity, and resource, and the
+        statistic durations of each activity. An update computes the times only of the events affected by the batch: the resource
+        availability of the events of its resources ending after it, the enabled times of the affected traces, and the estimation of the
+        events whose times changed (or whose activity statistics changed), giving the same result as estimating the whole event log.
+
+        :param estimator:   estimator with the configuration, concurrency oracle, and resource availability of the estimation.
+        :param event_log:   event log to estimate the start times of (estimating all its events).
+        """
+        self.estimator = estimator
+        self.config = estimator.config
+        self.log_ids = estimator.log_ids
+        # Columns of the event log needed to compute the times (and the recorded times, if any)
+        self.columns = [
+            column for column in [self.log_ids.case, self.log_ids.activity, self.log_ids.resource, self.log_ids.start_time,
+                                  self.log_ids.end_time, self.log_ids.available_time, self.log_ids.enabled_time]
+            if column in event_log.columns
+        ]
+        self._events = None
+        self._cases, self._activities, self._resources = _PositionIndex(), _PositionIndex(), _PositionIndex()
+        # Statistic durations of each activity (NaT if none), to detect outliers and to re-estimate the non-estimated events
+        self._outlier_limits, self._re_estimation_statistics = {}, {}
+        # Compute the resource availability and enabled times of all the events, and estimate them
+        times = event_log[self.columns].reset_index(drop=True)
+        estimator._add_resource_availability_and_enabled_times(times, estimator._get_compiled_log())
+        self._append(event_log, to_nanoseconds(times[self.log_ids.available_time]), to_nanoseconds(times[self.log_ids.enabled_time]))
+        self._estimate(np.arange(self._events.n_events), np.arange(self._events.n_events))
+
+    @property
+    def n_events(self) -> int:
+        return self._events.n_events
+
+    def get_times(self, positions: np.ndarray) -> pd.DataFrame:
+        # Resource availability, enabled, and estimated start times of the events at [positions]
+        index = pd.RangeIndex(len(positions))
+        return pd.DataFrame({
+            column: from_nanoseconds(self._events[column][positions], index)
+            for column in [self.log_ids.available_time, self.log_ids.enabled_time, self.log_ids.estimated_start_time]
+        })
+
+    def update(self, new_events: pd.DataFrame) -> np.ndarray:
+        """
+        Append a batch of new events and update the estimation of the affected events.
+
+        :param new_events: events to append to the event log.
+
+        :return: the (ascending) positions of the new events and of the previous ones whose times changed.
+        """
+        profiler = self.estimator.profiler
+        concurrency_oracle, resource_availability = self.estimator.concurrency_oracle, self.estimator.resource_availability
+        new_positions = np.arange(self.n_events, self.n_events + len(new_events))
+        modified_cases = [case for case in pd.unique(new_events[self.log_ids.case].to_numpy()) if not pd.isna(case)]
+        previous_traces = self._get_events(self._cases.get_many(modified_cases))
+        # Append the new events (with the recorded times if in the log)
+        recorded_times = [
+            to_nanoseconds(new_events[column]) if column in self.columns else np.full(len(new_events), NAT, dtype=np.int64)
+            for column in [self.log_ids.available_time, self.log_ids.enabled_time]
+        ]
+        self._append(new_events, *recorded_times)
+        # Update the concurrency relations with the changes in the modified traces
+        with profiler.stage("concurrency_update", rows=len(previous_traces)):
+            previous_concurrency = {activity: set(concurrent) for activity, concurrent in concurrency_oracle.concurrency.items()}
+            if isinstance(concurrency_oracle, CountBasedConcurrencyOracle):
+                concurrency_oracle.update_traces(previous_traces, self._get_events(self._cases.get_many(modified_cases)))
+            changed_activities = [
+                activity for activity in set(previous_concurrency) | set(concurrency_oracle.concurrency)
+                if previous_concurrency.get(activity, set()) != concurrency_oracle.concurrency.get(activity, set())
+            ]
+        # Traces to compute the enabled times again: the modified ones, and those with activities which concurrency changed
+        affected_cases = set(modified_cases)
+        if len(changed_activities) > 0:
+            cases = self._events[self.log_ids.case][self._activities.get_many(changed_activities)]
+            affected_cases |= {case for case in pd.unique(cases) if not pd.isna(case)}
+        affected_traces = self._cases.get_many(affected_cases)
+        # Events to compute the availability again: the new ones, and the previous ones of the same resources ending after them
+        resource_availability.add_performed_events(new_events)
+        affected_availability = [new_positions]
+        if self.log_ids.resource in self.columns:
+            new_end_times = pd.Series(self._events[self.log_ids.end_time][new_positions])
+            earliest_new_end_times = new_end_times[new_end_times != NAT].groupby(new_events[self.log_ids.resource].to_numpy()).min()
+            end_times = self._events[self.log_ids.end_time]
+            for resource, earliest_new_end_time in earliest_new_end_times.items():
+                resource_positions = self._resources.get(resource)
+                affected_availability += [resource_positions[end_times[resource_positions] > earliest_new_end_time]]
+        affected_availability = _union(*affected_availability)
+        # Compute the times of the affected events (if not recorded in the log), keeping the ones that changed
+        changed = [new_positions]
+        if self.log_ids.available_time not in self.columns:
+            with profiler.stage("resource_availability", rows=len(affected_availability)):
+                affected_events = self._get_events(affected_availability)
+                resource_availability.add_resource_availability_times(affected_events)
+                changed += [self._set_times(self.log_ids.available_time, affected_availability, affected_events)]
+        if self.log_ids.enabled_time not in self.columns:
+            with profiler.stage("enabled_times", rows=len(affected_traces)):
+                affected_events = self._get_events(affected_traces)
+                concurrency_oracle.add_enabled_times(affected_events)
+                changed += [self._set_times(self.log_ids.enabled_time, affected_traces, affected_events)]
+        # Estimate again the start times of the affected events
+        changed += [self._estimate(_union(new_positions, affected_availability, affected_traces), new_positions)]
+        return _union(*changed)
+
+    def _set_times(self, column: str, positions: np.ndarray, events: pd.DataFrame) -> np.ndarray:
+        # Set the times of [column] of the events at [positions] (computed in [events]), returning the positions of the ones that changed
+        times = to_nanoseconds(events[column])
+        changed = positions[self._events[column][positions] != times]
+        self._events[column][positions] = times
+        return changed
+
+    def _append(self, event_log: pd.DataFrame, available_times: np.ndarray, enabled_times: np.ndarray):
+        # Append the columns and times of the events of [event_log], and index their positions
+        n_events = len(event_log)
+        columns = {
+            self.log_ids.case: event_log[self.log_ids.case].to_numpy(dtype=object),
+            self.log_ids.activity: event_log[self.log_ids.activity].to_numpy(dtype=object),
+            self.log_ids.end_time: to_nanoseconds(event_log[self.log_ids.end_time]),
+            "instant": event_log[self.log_ids.activity].isin(self.config.instant_activities).to_numpy(),
+            self.log_ids.available_time: available_times,
+            self.log_ids.enabled_time: enabled_times,
+            "initial_estimation": np.full(n_events, NAT, dtype=np.int64),
+            "outlier_re_estimation": np.full(n_events, NAT, dtype=np.int64),
+            self.log_ids.estimated_start_time: np.full(n_events, NAT, dtype=np.int64),
+        }
+        if self.log_ids.resource in self.columns:
+            columns[self.log_ids.resource] = event_log[self.log_ids.resource].to_numpy(dtype=object)
+        if self.log_ids.start_time in self.columns:
+            columns[self.log_ids.start_time] = to_nanoseconds(event_log[self.log_ids.start_time])
+        first_position = 0
+        if self._events is None:
+            self._events = _GrowableColumns(columns)
+        else:
+            first_position = self._events.n_events
+            self._events.append(columns)
+        positions = np.arange(first_position, first_position + n_events)
+        self._cases.add(columns[self.log_ids.case], positions)
+        self._activities.add(columns[self.log_ids.activity], positions)
+        if self.log_ids.resource in columns:
+            self._resources.add(columns[self.log_ids.resource], positions)
+
+    def _get_events(self, positions: np.ndarray) -> pd.DataFrame:
+        # Columns (without the recorded times) of the events at [positions], to compute their times
+        index = pd.RangeIndex(len(positions))
+        events = pd.DataFrame(index=index)
+        for column in self.columns:
+            if column in [self.log_ids.start_time, self.log_ids.end_time]:
+                events[column] = from_nanoseconds(self._events[column][positions], index)
+            elif column not in [self.log_ids.available_time, self.log_ids.enabled_time]:
+                events[column] = self._events[column][positions]
+        return events
+
+    def _estimate(self, positions: np.ndarray, new_positions: np.ndarray) -> np.ndarray:
+        """
+        Estimate the start times of the events at [positions] (whose resource availability or enabled times may have changed), and of the
+        events whose estimation depends on an activity statistic that changed, as StartTimeEstimator._add_estimated_start_times does.
+
+        :param positions:       positions of the events to estimate again.
+        :param new_positions:   positions of the new events (included in [positions]).
+
+        :return: the positions of the new events and of the previous ones whose times changed.
+        """
+        events = self._events
+        end_times = events[self.log_ids.end_time]
+        with self.estimator.profiler.stage("final_estimation", rows=len(positions)) as profile:
+            # Initial estimation: the latest between the resource availability and the enabled time
+            initial_estimation = events["initial_estimation"]
+            estimations = np.maximum(events[self.log_ids.available_time][positions], events[self.log_ids.enabled_time][positions])
+            if self.config.reuse_current_start_times:
+                start_times = events[self.log_ids.start_time][positions]
+                estimations = np.where(start_times != NAT, start_times, estimations)
+            estimations = np.where(events["instant"][positions], end_times[positions], estimations)
+            changed = _union(positions[estimations != initial_estimation[positions]], new_positions)
+            initial_estimation[positions] = estimations
+            # Re-estimate the durations over the threshold of the statistic of their activity
+            outlier_re_estimation = events["outlier_re_estimation"]
+            to_fix = changed
+            if not math.isnan(self.config.outlier_threshold):
+                changed_limits = self._update_statistics(
+                    self._outlier_limits, changed, initial_estimation, self.config.outlier_statistic,
+                    lambda durations: self.estimator._apply_statistic(pd.Series(durations)), self.config.outlier_threshold
+                )
+                # Only the events over the lowest of the previous and the new limit of their activity can change
+                for activity, (previous_limit, limit) in changed_limits.items():
+                    activity_events = self._activities.get(activity)
+                    durations = get_durations(end_times[activity_events], initial_estimation[activity_events])
+                    lowest_limit = min(previous_limit, limit) if previous_limit != NAT and limit != NAT else max(previous_limit, limit)
+                    to_fix = _union(to_fix, activity_events[(durations != NAT) & (durations > lowest_limit)])
+                durations = get_durations(end_times[to_fix], initial_estimation[to_fix])
+                event_limits = self._get_event_statistics(self._outlier_limits, to_fix)
+                over_threshold = (durations != NAT) & (event_limits != NAT) & (durations > event_limits)
+                estimations = np.where(over_threshold, end_times[to_fix] - event_limits, initial_estimation[to_fix])
+            else:
+                estimations = initial_estimation[to_fix]
+            changed = _union(to_fix[estimations != outlier_re_estimation[to_fix]], new_positions)
+            outlier_re_estimation[to_fix] = estimations
+            # Re-estimate the events with no estimation with the statistic of their activity (or as instant)
+            to_fix = changed
+            if self.config.re_estimation_method != ReEstimationMethod.SET_INSTANT:
+                changed_statistics = self._update_statistics(
+                    self._re_estimation_statistics, changed, outlier_re_estimation, self.config.re_estimation_method,
+                    self.estimator._get_activity_duration
+                )
+                # Only the events with no estimation depend on the statistic of their activity
+                activity_events = self._activities.get_many(changed_statistics)
+                to_fix = _union(to_fix, activity_events[outlier_re_estimation[activity_events] == NAT])
+                event_statistics = self._get_event_statistics(self._re_estimation_statistics, to_fix)
+                re_estimate = (outlier_re_estimation[to_fix] == NAT) & (event_statistics != NAT) & (end_times[to_fix] != NAT)
+                estimations = np.where(re_estimate, end_times[to_fix] - event_statistics, outlier_re_estimation[to_fix])
+            else:
+                estimations = outlier_re_estimation[to_fix]
+            # Set remaining non estimated activity instances to instant
+            estimations = np.where(estimations == NAT, end_times[to_fix], estimations)
+            estimated_start_times = events[self.log_ids.estimated_start_time]
+            changed = _union(to_fix[estimations != estimated_start_times[to_fix]], new_positions)
+            estimated_start_times[to_fix] = estimations
+            if profile is not None:
+                profile.rows = len(_union(positions, to_fix))
+        return changed
+
+    def _update_statistics(
+            self,
+            activity_statistics: dict,
+            changed: np.ndarray,
+            estimations: np.ndarray,
+            statistic,
+            apply_statistic,
+            threshold: Optional[float] = None
+    ) -> dict:
+        """
+        Compute again the statistic durations of the activities of the [changed] events, only over the events of these activities (with the
+        same result as StartTimeEstimator._get_activity_statistics over the whole event log), and update them in [activity_statistics].
+
+        :param activity_statistics: statistic of each activity (times the threshold) as int64 nanoseconds, updated in place.
+        :param changed:             positions of the events whose estimation changed.
+        :param estimations:         estimated start time of each event (the events with estimation give the durations).
+        :param statistic:           statistic to compute (OutlierStatistic or ReEstimationMethod).
+        :param apply_statistic:     function computing the statistic of the (timedelta64) durations of one activity.
+        :param threshold:           factor to multiply the statistic by (not multiplied if None).
+
+        :return: a dict with the previous and the new statistic of each activity whose statistic changed.
+        """
+        touched = [activity for activity in pd.unique(self._events[self.log_ids.activity][changed]) if not pd.isna(activity)]
+        activity_positions = [self._activities.get(activity) for activity in touched]
+        positions = np.concatenate(activity_positions + [np.array([], dtype=np.int64)])
+        activity_codes = np.repeat(np.arange(len(touched)), [len(events) for events in activity_positions])
+        durations = get_durations(self._events[self.log_ids.end_time][positions], estimations[positions])
+        is_estimated = estimations[positions] != NAT
+        statistics = self.estimator._get_activity_statistics(
+            activity_codes[is_estimated], durations[is_estimated], len(touched), statistic, apply_statistic
+        )
+        if threshold is not None:
+            statistics = (statistics.view("timedelta64[ns]") * threshold).view(np.int64)
+        changed_statistics = {}
+        for activity, activity_statistic in zip(touched, statistics):
+            previous_statistic = activity_statistics.get(activity, NAT)
+            if previous_statistic != activity_statistic:
+                changed_statistics[activity] = (previous_statistic, activity_statistic)
+            activity_statistics[activity] = activity_statistic
+        return changed_statistics
+
+    def _get_event_statistics(self, activity_statistics: dict, positions: np.ndarray) -> np.ndarray:
+        # Statistic of the activity of each event at [positions] (NaT for the events with no activity or no statistic)
+        activities = pd.Series(self._events[self.log_ids.activity][positions], dtype=object)
+        return activities.map(activity_statistics).fillna(NAT).to_numpy(dtype=np.int64)
+
+
+def _union(*positions: np.ndarray) -> np.ndarray:
+    # Sorted union of arrays of positions
+    union = np.sort(np.concatenate(positions))
+    return union[np.r_[True, union[1:] != union[:-1]]] if len(union) > 0 else union
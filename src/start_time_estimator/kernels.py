@@ -0,0 +1,225 @@
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from start_time_estimator.config import Configuration, KernelBackend
+from start_time_estimator.utils import NAT, sort_by_case_and_end_time
+
+# JIT-compiled kernels (compiled the first time they are needed, see _get_numba_kernels)
+_numba_kernels = None
+
+
+@lru_cache(maxsize=None)
+def is_numba_available() -> bool:
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def use_numba(config: Configuration) -> bool:
+    """
+    Check if the JIT-compiled (Numba) kernels have to be used with the kernel backend selected in [config]: always with NUMBA (failing if
+    Numba is not installed), never with NUMPY, and if Numba is installed with AUTO.
+    """
+    if config.kernel_backend == KernelBackend.NUMPY:
+        return False
+    elif config.kernel_backend == KernelBackend.NUMBA and not is_numba_available():
+        raise ImportError("The NUMBA kernel backend requires 'numba', install it with 'pip install start-time-estimator[numba]'.")
+    return is_numba_available()
+
+
+def compute_enabling_positions_numba(
+        case_codes: np.ndarray,
+        activity_codes: np.ndarray,
+        end_times: np.ndarray,
+        start_times: Optional[np.ndarray],
+        concurrency_matrix: np.ndarray,
+        long_trace_threshold: Optional[int] = None,
+        order: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    JIT-compiled version of concurrency_oracle._compute_enabling_positions_numpy (same parameters and result): the events are sorted by
+    case and end time, and the enabling activity instance of each event is searched going backwards over the previous events of its trace.
+    If any trace is longer than [long_trace_threshold], the backward search (linear in the trace length for each event) is replaced by a
+    sweep keeping the latest completion of the activities not concurrent with each activity (see _last_completion_loop).
+    """
+    enabling_positions = np.full(len(case_codes), -1, dtype=np.int64)
+    # Sort the events (with case and end time) by case and end time, keeping the log order between ties (if not already sorted)
+    if order is None:
+        order = sort_by_case_and_end_time(case_codes, end_times)
+    if len(order) == 0:
+        return enabling_positions
+    sorted_cases = case_codes[order].astype(np.int64)
+    arguments = (
+        sorted_cases,
+        activity_codes[order].astype(np.int64),
+        end_times[order],
+        start_times[order] if start_times is not None else np.full(len(order), NAT, dtype=np.int64),
+        start_times is not None
+    )
+    trace_lengths = np.diff(np.flatnonzero(np.r_[True, sorted_cases[1:] != sorted_cases[:-1], True]))
+    if long_trace_threshold is not None and trace_lengths.max() > long_trace_threshold:
+        # Activities grouped by their concurrency relations, and the patterns in which each activity is not concurrent (CSR-style)
+        patterns, activity_patterns = np.unique(np.asarray(concurrency_matrix, dtype=bool), axis=0, return_inverse=True)
+        pattern_activities, allowing_patterns = np.nonzero(~patterns.T)
+        allowing_offsets = np.zeros(patterns.shape[1] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pattern_activities, minlength=patterns.shape[1]), out=allowing_offsets[1:])
+        sorted_positions = _get_numba_kernels()["last_completion"](
+            *arguments,
+            np.asarray(activity_patterns, dtype=np.int64).reshape(-1),
+            len(patterns),
+            allowing_patterns.astype(np.int64),
+            allowing_offsets
+        )
+    else:
+        sorted_positions = _get_numba_kernels()["enabling_positions"](
+            *arguments,
+            np.ascontiguousarray(concurrency_matrix, dtype=np.bool_)
+        )
+    # Map the positions in the sorted events to the event log
+    has_enabling = sorted_positions >= 0
+    enabling_positions[order[has_enabling]] = order[sorted_positions[has_enabling]]
+    return enabling_positions
+
+
+def get_previous_end_times_numba(resource_end_times: np.ndarray, end_times: np.ndarray, start_times: Optional[np.ndarray]) -> np.ndarray:
+    """
+    JIT-compiled version of ResourceAvailability._get_previous_end_times (same parameters and result): for each event, the latest end time
+    of the resource previous to its end (and not after its start, if given).
+    """
+    return _get_numba_kernels()["previous_end_times"](
+        resource_end_times,
+        end_times,
+        start_times if start_times is not None else np.full(len(end_times), NAT, dtype=np.int64),
+        start_times is not None
+    )
+
+
+def _enabling_positions_loop(
+        case_codes: np.ndarray,
+        activity_codes: np.ndarray,
+        end_times: np.ndarray,
+        start_times: np.ndarray,
+        consider_start_times: bool,
+        concurrency_matrix: np.ndarray
+) -> np.ndarray:
+    # Events sorted by case and end time: search, for each one, the latest non-concurrent event of its trace ending before it
+    n_events = len(case_codes)
+    enabling_positions = np.full(n_events, -1, dtype=np.int64)
+    trace_start, tie_start = 0, 0
+    for current in range(n_events):
+        if current > 0 and case_codes[current] != case_codes[current - 1]:
+            trace_start, tie_start = current, current
+        elif current > 0 and end_times[current] != end_times[current - 1]:
+            tie_start = current
+        # Events of the trace ending before the current one (and before, or at, its start)
+        limit = tie_start
+        if consider_start_times:
+            limit = min(limit, trace_start + np.searchsorted(end_times[trace_start:tie_start], start_times[current], side="right"))
+        # Latest one with no concurrency
+        activity = activity_codes[current]
+        latest = limit - 1
+        while latest >= trace_start and concurrency_matrix[activity, activity_codes[latest]]:
+            latest -= 1
+        if latest >= trace_start:
+            # First one with the same end time and no concurrency (ties broken by log order)
+            latest_end_time = end_times[latest]
+            other = latest - 1
+            while other >= trace_start and end_times[other] == latest_end_time:
+                if not concurrency_matrix[activity, activity_codes[other]]:
+                    latest = other
+                other -= 1
+            enabling_positions[current] = latest
+    return enabling_positions
+
+
+def _last_completion_loop(
+        case_codes: np.ndarray,
+        activity_codes: np.ndarray,
+        end_times: np.ndarray,
+        start_times: np.ndarray,
+        consider_start_times: bool,
+        activity_patterns: np.ndarray,
+        n_patterns: int,
+        allowing_patterns: np.ndarray,
+        allowing_offsets: np.ndarray
+) -> np.ndarray:
+    # Events sorted by case and end time: sweep each trace in end time order keeping, for each concurrency pattern, the latest event with
+    # an activity not concurrent with it (and the first one with its same end time), answering the events in order of their limit
+    n_events = len(case_codes)
+    enabling_positions = np.full(n_events, -1, dtype=np.int64)
+    latest = np.full(n_patterns, -1, dtype=np.int64)
+    first_tie = np.full(n_patterns, -1, dtype=np.int64)
+    tie_starts = np.zeros(n_events, dtype=np.int64)
+    limits = np.zeros(n_events, dtype=np.int64)
+    trace_start = 0
+    while trace_start < n_events:
+        trace_end = trace_start + 1
+        while trace_end < n_events and case_codes[trace_end] == case_codes[trace_start]:
+            trace_end += 1
+        # Events of the trace ending before each one (and before, or at, its start)
+        for current in range(trace_start, trace_end):
+            if current > trace_start and end_times[current] == end_times[current - 1]:
+                tie_starts[current] = tie_starts[current - 1]
+            else:
+                tie_starts[current] = current
+            limits[current] = tie_starts[current]
+            if consider_start_times:
+                limits[current] = min(
+                    limits[current],
+                    trace_start + np.searchsorted(end_times[trace_start:trace_end], start_times[current], side="right")
+                )
+        queries = trace_start + np.argsort(limits[trace_start:trace_end], kind="mergesort")
+        latest[:] = -1
+        first_tie[:] = -1
+        swept = trace_start
+        for current in queries:
+            # Add the events ending before the limit of the current one to the latest completions
+            while swept < limits[current]:
+                activity = activity_codes[swept]
+                for allowing in range(allowing_offsets[activity], allowing_offsets[activity + 1]):
+                    pattern = allowing_patterns[allowing]
+                    if latest[pattern] < 0 or tie_starts[latest[pattern]] != tie_starts[swept]:
+                        first_tie[pattern] = swept
+                    latest[pattern] = swept
+                swept += 1
+            pattern = activity_patterns[activity_codes[current]]
+            if latest[pattern] >= 0:
+                enabling_positions[current] = first_tie[pattern]
+        trace_start = trace_end
+    return enabling_positions
+
+
+def _previous_end_times_loop(
+        resource_end_times: np.ndarray,
+        end_times: np.ndarray,
+        start_times: np.ndarray,
+        consider_start_times: bool
+) -> np.ndarray:
+    # Binary search, for each event, the latest end time previous to its end (and not after its start, if considered)
+    previous_end_times = np.full(len(end_times), NAT, dtype=np.int64)
+    for current in range(len(end_times)):
+        if end_times[current] == NAT:
+            continue
+        limit = np.searchsorted(resource_end_times, end_times[current], side="left")
+        if consider_start_times:
+            limit = min(limit, np.searchsorted(resource_end_times, start_times[current], side="right"))
+        if limit > 0:
+            previous_end_times[current] = resource_end_times[limit - 1]
+    return previous_end_times
+
+
+def _get_numba_kernels() -> dict:
+    # Compile the kernels the first time they are used
+    global _numba_kernels
+    if _numba_kernels is None:
+        import numba
+        _numba_kernels = {
+            "enabling_positions": numba.njit(cache=False)(_enabling_positions_loop),
+            "last_completion": numba.njit(cache=False)(_last_completion_loop),
+            "previous_end_times": numba.njit(cache=False)(_previous_end_times_loop),
+        }
+    return _numba_kernels
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Callable, Optional, Type
+
+import numpy as np
+import pandas as pd
+
+from start_time_estimator.concurrency_oracle import CountBasedConcurrencyOracle, RelationCounts
+from start_time_estimator.config import Configuration
+from start_time_estimator.utils import to_nanoseconds
+
+# Version of the format of the cached files (increase it when the format, or the way of counting the relations, changes)
+ORACLE_CACHE_VERSION = 2
+
+
+class ConcurrencyOracleCache:
+    def __init__(self, cache_dir: str):
+        """
+        On-disk cache of discovered concurrency oracles. Each entry is a compressed NumPy file (.npz) keyed by a content hash of the
+        columns of the event log used to count the relations and the type of oracle, storing the raw relation counts, and the concurrency
+        relations derived from them with each set of thresholds. Thus, changing the thresholds only re-applies the cut-offs to the stored
+        counts, without counting the relations again. The activity labels are stored as JSON to keep their type, so only string, numeric,
+        boolean, and missing (None or NaN) labels are supported.
+
+        :param cache_dir: directory where to store the cached oracles (created if it does not exist).
+        """
+        self.cache_dir = cache_dir
+
+    def get_concurrency_oracle(
+            self,
+            event_log: pd.DataFrame,
+            oracle_class: Type[CountBasedConcurrencyOracle],
+            config: Configuration,
+            count_relations: Optional[Callable[[], RelationCounts]] = None
+    ) -> CountBasedConcurrencyOracle:
+        """
+        Get the concurrency oracle of type [oracle_class] for [event_log], loading it from the cache if already discovered, or discovering
+        (and storing) it otherwise.
+
+        :param event_log:       event log to discover the concurrency oracle from.
+        :param oracle_class:    class of the concurrency oracle (e.g. HeuristicsConcurrencyOracle).
+        :param config:          configuration of the estimation (log IDs and concurrency thresholds).
+        :param count_relations: function counting the relations between the activities of [event_log] if not cached (e.g. from an
+                                already compiled log, or in parallel). If None, they are counted with [oracle_class]._count_relations.
+
+        :return: the concurrency oracle, with the concurrency relations for the thresholds in [config].
+        """
+        path = self._get_path(get_event_log_hash(event_log, config), oracle_class)
+        entry = self._load(path)
+        thresholds_key = _get_thresholds_key(config)
+        if entry is None:
+            # Not cached: count the relations in the event log
+            counts = count_relations() if count_relations is not None else oracle_class._count_relations(event_log, config)
+            concurrency_oracle = oracle_class.from_counts(counts, config)
+            entry = {"counts": counts, "concurrency": {}}
+        elif thresholds_key not in entry["concurrency"]:
+            # Cached with other thresholds: re-apply the cut-offs to the counts
+            concurrency_oracle = oracle_class.from_counts(entry["counts"], config)
+        else:
+            # Cached with the same thresholds: reuse the concurrency relations
+            return oracle_class.from_counts(entry["counts"], config, concurrency_matrix=entry["concurrency"][thresholds_key])
+        # Store the new concurrency relations (indexed as the activities of the counts)
+        entry["concurrency"][thresholds_key] = concurrency_oracle.concurrency_matrix
+        self._save(path, entry)
+        return concurrency_oracle
+
+    def _get_path(self, log_hash: str, oracle_class: Type[CountBasedConcurrencyOracle]) -> str:
+        return os.path.join(self.cache_dir, "{}-{}.npz".format(oracle_class.__name__, log_hash))
+
+    @staticmethod
+    def _load(path: str) -> Optional[dict]:
+        # Read a cached entry (None if it does not exist, or it was stored with another version of the format)
+        if not os.path.isfile(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != ORACLE_CACHE_VERSION:
+                return None
+            matrices = {name[len("counts:"):]: data[name] for name in data.files if name.startswith("counts:")}
+            concurrency = {name[len("concurrency:"):]: data[name] for name in data.files if name.startswith("concurrency:")}
+            activities = json.loads(str(data["activities"]))
+            return {"counts": RelationCounts(activities, **matrices), "concurrency": concurrency}
+
+    def _save(self, path: str, entry: dict):
+        # Write the entry to a temporary file and move it to its final path, so concurrent readers never see a partial file
+        os.makedirs(self.cache_dir, exist_ok=True)
+        counts = entry["counts"]
+        arrays = {
+            "version": np.array(ORACLE_CACHE_VERSION),
+            "activities": np.array(_serialize_activities(counts.activities)),
+            **{"counts:" + name: matrix for name, matrix in counts.matrices.items()},
+            **{"concurrency:" + key: matrix for key, matrix in entry["concurrency"].items()},
+        }
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(file_descriptor, "wb") as output_file:
+            np.savez_compressed(output_file, **arrays)
+        os.replace(temporary_path, path)
+
+
+def get_event_log_hash(event_log: pd.DataFrame, config: Configuration) -> str:
+    """
+    Compute a hash of the content of the columns of [event_log] used to count the relations between activities (case, activity, start and
+    end times, in the order of the event log).
+
+    :param event_log:   event log to compute the hash of.
+    :param config:      configuration with the IDs of the columns of the event log.
+
+    :return: the hexadecimal digest of the hash.
+    """
+    log_ids = config.log_ids
+    log_hash = hashlib.sha256(str(len(event_log)).encode())
+    for column in [log_ids.case, log_ids.activity]:
+        log_hash.update(pd.util.hash_pandas_object(event_log[column], index=False).to_numpy().tobytes())
+    for column in [log_ids.start_time, log_ids.end_time]:
+        if column in event_log.columns:
+            log_hash.update(column.encode())
+            log_hash.update(to_nanoseconds(event_log[column]).tobytes())
+    return log_hash.hexdigest()
+
+
+def _serialize_activities(activities: list) -> str:
+    # JSON list of the activity labels, keeping their type (a label read as a number must not be loaded back as a string)
+    labels = []
+    for activity in activities:
+        label = activity.item() if isinstance(activity, np.generic) else activity
+        if label is not None and not isinstance(label, (str, bool, int, float)):
+            raise ValueError("Activity label {!r} of type {} not supported by the concurrency oracle cache!".format(
+                activity, type(activity).__name__
+            ))
+        labels += [label]
+    return json.dumps(labels)
+
+
+def _get_thresholds_key(config: Configuration) -> str:
+    thresholds = config.concurrency_thresholds
+    return "df={!r},l2l={!r},l1l={!r}".format(thresholds.df, thresholds.l2l, thresholds.l1l)
+
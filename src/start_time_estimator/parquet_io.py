@@ -0,0 +1,125 @@
+from typing import Optional
+
+import pandas as pd
+from pix_framework.log_ids import EventLogIDs
+
+
+def read_parquet_log(
+        log_path: str,
+        log_ids: EventLogIDs,
+        missing_resource: Optional[str] = "NOT_SET",
+        sort: bool = True,
+        columns: Optional[list] = None
+) -> pd.DataFrame:
+    """
+    Read an event log from a Parquet file given the column IDs in [log_ids], as read_csv_log does with a CSV file, but without parsing the
+    timestamps and reading only the needed columns. The string columns of the case, activity, and resource are read dictionary-encoded (as
+    categorical columns), the timestamps are cast in Arrow to UTC nanoseconds, and the NA resource cells are set to [missing_resource] (if
+    not None). The resulting event log can be given directly to StartTimeEstimator.
+
+    :param log_path:            path to the Parquet log file.
+    :param log_ids:             IDs of the columns of the event log.
+    :param missing_resource:    string to set as NA value for the resource column (not set if None).
+    :param sort:                if true, sort event log by start, end, enabled (if available).
+    :param columns:             additional columns to read (besides the ones in [log_ids]).
+
+    :return: the read event log.
+    """
+    pq = _import_pyarrow_parquet()
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    schema = pq.read_schema(log_path)
+    # Project the columns of the log IDs (and the additional ones) present in the file
+    projection = [column for column in _get_log_columns(log_ids) if column in schema.names]
+    projection += [column for column in (columns or []) if column in schema.names and column not in projection]
+    # Read the string columns of the case, activity, and resource dictionary-encoded
+    read_dictionary = [
+        column for column in [log_ids.case, log_ids.activity, log_ids.resource]
+        if column in projection and (pa.types.is_string(schema.field(column).type) or pa.types.is_large_string(schema.field(column).type))
+    ]
+    table = pq.read_table(log_path, columns=projection, read_dictionary=read_dictionary)
+    # Cast the timestamps to UTC nanoseconds (timestamps with no time zone are considered as UTC, as in read_csv_log)
+    for column in [log_ids.end_time, log_ids.start_time, log_ids.enabled_time, log_ids.available_time, log_ids.estimated_start_time]:
+        if column in table.column_names and pa.types.is_timestamp(table.schema.field(column).type):
+            timestamps = table.column(column)
+            if timestamps.type.tz is None:
+                timestamps = pc.assume_timezone(timestamps.cast(pa.timestamp("ns")), timezone="UTC")
+            timestamps = timestamps.cast(pa.timestamp("ns", tz="UTC"))
+            table = table.set_column(table.column_names.index(column), pa.field(column, timestamps.type), timestamps)
+    event_log = table.to_pandas()
+    # Set case id as object (if it is not categorical)
+    if not isinstance(event_log[log_ids.case].dtype, pd.CategoricalDtype):
+        event_log = event_log.astype({log_ids.case: object})
+    # Fix missing resources (don't do it if [missing_resources] is set to None)
+    if missing_resource:
+        if log_ids.resource not in event_log.columns:
+            event_log[log_ids.resource] = pd.Categorical([missing_resource] * len(event_log))
+        elif isinstance(event_log[log_ids.resource].dtype, pd.CategoricalDtype):
+            resources = event_log[log_ids.resource]
+            if resources.isna().any():
+                if missing_resource not in resources.cat.categories:
+                    resources = resources.cat.add_categories([missing_resource])
+                event_log[log_ids.resource] = resources.fillna(missing_resource)
+        else:
+            event_log[log_ids.resource] = event_log[log_ids.resource].fillna(missing_resource)
+    # Set resource type to string if numeric
+    if log_ids.resource in event_log.columns and not isinstance(event_log[log_ids.resource].dtype, pd.CategoricalDtype):
+        event_log[log_ids.resource] = event_log[log_ids.resource].apply(str)
+    # Convert the timestamps not stored as timestamps (e.g. strings) to pd.Timestamp (setting timezone to UTC)
+    for column in [log_ids.end_time, log_ids.start_time, log_ids.enabled_time]:
+        if column in event_log.columns and not isinstance(event_log[column].dtype, pd.DatetimeTZDtype):
+            event_log[column] = pd.to_datetime(event_log[column], utc=True)
+    # Sort by end time
+    if sort:
+        if log_ids.start_time in event_log.columns and log_ids.enabled_time in event_log.columns:
+            event_log = event_log.sort_values([log_ids.start_time, log_ids.end_time, log_ids.enabled_time])
+        elif log_ids.start_time in event_log.columns:
+            event_log = event_log.sort_values([log_ids.start_time, log_ids.end_time])
+        else:
+            event_log = event_log.sort_values(log_ids.end_time)
+    # Return parsed event log
+    return event_log
+
+
+def write_parquet_log(
+        event_log: pd.DataFrame,
+        output_path: str,
+        columns: Optional[list] = None,
+        row_group_size: Optional[int] = None
+):
+    """
+    Write [event_log] (e.g. the result of StartTimeEstimator.estimate()) to a Parquet file, converting its columns to Arrow directly:
+    timestamps as Arrow timestamps, and categorical columns (e.g. the ones read by read_parquet_log) dictionary-encoded.
+
+    :param event_log:       event log to write.
+    :param output_path:     path to the Parquet file to write.
+    :param columns:         columns of [event_log] to write (e.g. the IDs and the estimated columns), all of them if None.
+    :param row_group_size:  maximum number of events per row group (default of pyarrow if None).
+    """
+    pq = _import_pyarrow_parquet()
+    import pyarrow as pa
+    if columns is not None:
+        event_log = event_log[columns]
+    table = pa.Table.from_pandas(event_log, preserve_index=False)
+    pq.write_table(table, output_path, row_group_size=row_group_size)
+
+
+def _get_log_columns(log_ids: EventLogIDs) -> list:
+    return [
+        log_ids.case, log_ids.activity, log_ids.resource, log_ids.start_time, log_ids.end_time, log_ids.enabled_time,
+        log_ids.enabling_activity, log_ids.available_time, log_ids.estimated_start_time
+    ]
+
+
+def _is_parquet(path: str) -> bool:
+    return str(path).lower().endswith(".parquet")
+
+
+def _import_pyarrow_parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise ImportError(
+            "Reading and writing Parquet event logs requires 'pyarrow', install it with 'pip install start-time-estimator[parquet]'."
+        ) from error
+    return pq
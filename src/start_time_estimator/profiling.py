@@ -0,0 +1,102 @@
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import pandas as pd
+
+
+@dataclass
+class StageProfile:
+    """Measurements of one stage of the estimation.
+
+    Attributes:
+        name            Name of the stage, prefixed by the names of its parent stages (e.g. 'oracle_discovery/count_relations').
+        wall_time       Elapsed wall time (in seconds).
+        peak_memory     Peak of memory allocated during the stage over the memory allocated when it started (in bytes), None if the
+                        memory is not traced.
+        rows            Number of events processed by the stage, None if not applicable.
+        depth           Nesting level of the stage (0 for the top-level stages).
+    """
+    name: str
+    wall_time: float
+    peak_memory: Optional[int]
+    rows: Optional[int]
+    depth: int
+
+
+class Profiler:
+    def __init__(self, enabled: bool = True, trace_memory: bool = True, callback: Optional[Callable[[StageProfile], None]] = None):
+        """
+        Record the wall time, the peak memory, and the number of rows of each stage of the estimation. When disabled, the stages are not
+        measured (entering a stage returns a no-op context).
+
+        :param enabled:         whether to measure the stages or not.
+        :param trace_memory:    whether to trace the peak memory of each stage (with tracemalloc, which slows down the execution).
+        :param callback:        function called with the StageProfile of each stage when it finishes (e.g. to log it).
+        """
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.callback = callback
+        # Profiles of the finished stages (in order of start)
+        self.report = []
+        # Stack of running stages (to compute their names and peak memories)
+        self._running = []
+        self._started_tracing = False
+
+    def stage(self, name: str, rows: Optional[int] = None):
+        """
+        Context to measure a stage of the estimation, nested in the stages currently running.
+
+        :param name:    name of the stage.
+        :param rows:    number of events processed by the stage.
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self._measure(name, rows)
+
+    @contextmanager
+    def _measure(self, name: str, rows: Optional[int]):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        tracing = tracemalloc.is_tracing()
+        parent = self._running[-1] if len(self._running) > 0 else None
+        full_name = name if parent is None else "{}/{}".format(parent["name"], name)
+        if tracing:
+            # Keep the peak of the parent stage before resetting it to measure this one
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent["peak_memory"] = max(parent["peak_memory"], peak_memory)
+            tracemalloc.reset_peak()
+        stage = {"name": full_name, "start_memory": current_memory if tracing else 0, "peak_memory": 0}
+        profile = StageProfile(name=full_name, wall_time=0.0, peak_memory=None, rows=rows, depth=len(self._running))
+        self.report += [profile]
+        self._running += [stage]
+        start_time = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            profile.wall_time = time.perf_counter() - start_time
+            self._running.pop()
+            if tracing and tracemalloc.is_tracing():
+                peak_memory = max(stage["peak_memory"], tracemalloc.get_traced_memory()[1])
+                profile.peak_memory = peak_memory - stage["start_memory"]
+                if parent is not None:
+                    parent["peak_memory"] = max(parent["peak_memory"], peak_memory)
+            if len(self._running) == 0 and self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+            if self.callback is not None:
+                self.callback(profile)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        # Report as a DataFrame with one row per stage
+        return pd.DataFrame(
+            [(profile.name, profile.wall_time, profile.peak_memory, profile.rows, profile.depth) for profile in self.report],
+            columns=["stage", "wall_time", "peak_memory", "rows", "depth"]
+        )
+
+    def clear(self):
+        self.report = []
@@ -1,21 +1,28 @@
 from datetime import datetime
+from typing import Optional, Union
 
+import numpy as np
 import pandas as pd
 from pix_framework.calendar.availability import get_last_available_timestamp
 
+from start_time_estimator.compiled_log import CompiledLog, compile_log
 from start_time_estimator.config import Configuration
+from start_time_estimator.kernels import use_numba, get_previous_end_times_numba
+from start_time_estimator.utils import from_nanoseconds, NAT
 
 
 class ResourceAvailability:
     def __init__(self, performed_events: dict, working_schedules: dict, config: Configuration):
-        # Store dictionary with the resources as key and all its events as value
+        # Store dictionary with the resources as key and the sorted end times (int64 nanoseconds) of all its events as value
         self.performed_events = performed_events
-        # Store dictionary with the resources as key and all its events as value
+        # Store dictionary with the resources as key and their working calendars as value
         self.working_schedules = working_schedules
         # Configuration parameters
         self.config = config
         # Set log IDs to ease access within class
         self.log_ids = config.log_ids
+        # Working intervals of each calendar expanded over a span of days (built on demand, see _get_last_available_times)
+        self._working_intervals = {}
 
     def available_since(self, resource: str, event) -> datetime:
         # Get the end timestamp of the previous activity instance executed by the same resource
@@ -27,63 +34,296 @@ class ResourceAvailability:
             timestamp_previous_event = event[self.log_ids.end_time]
         else:
             # If existing resource, take the latest timestamp previous to [timestamp]
-            resource_events = self.performed_events[resource]
-            timestamp_previous_event = resource_events.where(
-                (resource_events < event[self.log_ids.end_time]) &
-                ((not self.config.consider_start_times) or (resource_events <= event[self.log_ids.start_time]))
-            ).max()
-            if pd.isna(timestamp_previous_event):
-                timestamp_previous_event = pd.NaT
+            end_times = np.array([pd.Timestamp(event[self.log_ids.end_time]).value])
+            start_times = np.array([pd.Timestamp(event[self.log_ids.start_time]).value]) if self.config.consider_start_times else None
+            previous_end_time = self._get_previous_end_times(self.performed_events[resource], end_times, start_times)[0]
+            timestamp_previous_event = pd.NaT if previous_end_time == NAT else pd.Timestamp(previous_end_time, tz="UTC")
             # If there are non-working periods from the latest previous
             # end timestamp, take the end of the last non-working period
             if resource in self.working_schedules:
                 activity_start = event[self.log_ids.start_time] if self.config.consider_start_times else event[self.log_ids.end_time]
-                timestamp_previous_event = get_last_available_timestamp(
-                    start=timestamp_previous_event,
-                    end=activity_start,
-                    schedule=self.working_schedules[resource]
-                )
+                activity_starts = np.array([pd.Timestamp(activity_start).value])
+                last_available_time = self._get_last_available_times(resource, np.array([previous_end_time]), activity_starts)[0]
+                timestamp_previous_event = pd.NaT if last_available_time == NAT else pd.Timestamp(last_available_time, tz="UTC")
         # Return previous timestamp where the resource became available
         return timestamp_previous_event
 
-    def add_resource_availability_times(self, event_log: pd.DataFrame):
+    def add_resource_availability_times(self, event_log: pd.DataFrame, compiled_log: Optional[CompiledLog] = None):
         """
         Add the resource availability time of each activity instance to the received event log. For the first event of each resource, set
         pd.NaT.
 
-        :param event_log: event log to add the resource availability time information to.
+        :param event_log:       event log to add the resource availability time information to.
+        :param compiled_log:    compiled version of [event_log] (compiled from it if None).
+        """
+        compiled_log = compile_log(event_log if compiled_log is None else compiled_log, self.log_ids)
+        end_times = compiled_log.end_times
+        start_times = compiled_log.start_times if self.config.consider_start_times else None
+        resource_availability_times = np.full(compiled_log.n_events, NAT, dtype=np.int64)
+        # Resolve the availability of all the events of each resource at once
+        for resource_code, resource in enumerate(compiled_log.resources):
+            positions = compiled_log.resource_events(resource_code)
+            if resource == self.config.missing_resource:
+                # If the resource is missing leave pd.NaT
+                continue
+            elif resource in self.config.bot_resources:
+                # If the resource has been marked as 'bot resource', use the same timestamp
+                resource_availability_times[positions] = end_times[positions]
+            elif resource in self.performed_events:
+                # If existing resource, take the latest timestamp previous to each event
+                resource_availability_times[positions] = self._get_previous_end_times(
+                    self.performed_events[resource],
+                    end_times[positions],
+                    start_times[positions] if start_times is not None else None
+                )
+                # If there are non-working periods from the latest previous
+                # end timestamp, take the end of the last non-working period
+                if resource in self.working_schedules:
+                    activity_starts = start_times[positions] if start_times is not None else end_times[positions]
+                    resource_availability_times[positions] = self._get_last_available_times(
+                        resource,
+                        resource_availability_times[positions],
+                        activity_starts
+                    )
+        # Set all resource availability times at once
+        event_log[self.log_ids.available_time] = from_nanoseconds(resource_availability_times, event_log.index)
+
+    def add_performed_events(self, event_log: pd.DataFrame):
+        """
+        Add the end times of new events to the index of events performed by each resource.
+
+        :param event_log: event log with the new events.
+        """
+        for resource, end_times in _get_performed_events(event_log, self.config).items():
+            resource_end_times = self.performed_events.get(resource, np.array([], dtype=np.int64))
+            self.performed_events[resource] = np.insert(resource_end_times, np.searchsorted(resource_end_times, end_times), end_times)
+
+    def _get_last_available_times(self, resource: str, previous_end_times: np.ndarray, activity_starts: np.ndarray) -> np.ndarray:
+        """
+        Get, for each event of [resource], the end of the last non-working period (w.r.t. the resource calendar) between the previous end
+        time and the start of the activity, as get_last_available_timestamp does. The working intervals of the calendar are expanded once
+        over the span of days of the events, and all the events are solved with a binary search over them.
+
+        :param resource:            resource with a working calendar.
+        :param previous_end_times:  end of the previous activity instance of the resource (int64 nanoseconds, NaT if none).
+        :param activity_starts:     start of each activity instance (int64 nanoseconds, NaT if missing).
+
+        :return: the timestamp since which the resource is available for each event (int64 nanoseconds).
+        """
+        schedule = self.working_schedules[resource]
+        last_available_times = np.full(len(activity_starts), NAT, dtype=np.int64)
+        with_start = activity_starts != NAT
+        if not with_start.any():
+            return last_available_times
+        # Expand the working intervals of the calendar over the span of the events (if not already done for the same intervals, so a
+        # calendar edited in place is expanded again)
+        first_day = min(activity_starts[with_start].min(), _get_min(previous_end_times[with_start])) // _DAY - 8
+        last_day = activity_starts[with_start].max() // _DAY
+        calendar_key = _get_calendar_key(schedule)
+        cached = self._working_intervals.get(calendar_key)
+        if cached is None or cached.first_day > first_day or cached.last_day < last_day:
+            if cached is not None:
+                first_day, last_day = min(first_day, cached.first_day), max(last_day, cached.last_day)
+            self._working_intervals[calendar_key] = _WorkingIntervals(schedule, first_day, last_day)
+        working_intervals = self._working_intervals[calendar_key]
+        # Search the last available time of all the events at once (falling back to the iterative search for the corner cases)
+        last_available_times[with_start], fallback = working_intervals.get_last_available_times(
+            previous_end_times[with_start],
+            activity_starts[with_start]
+        )
+        for position in np.flatnonzero(with_start)[fallback]:
+            last_available_times[position] = get_last_available_timestamp(
+                start=pd.NaT if previous_end_times[position] == NAT else pd.Timestamp(previous_end_times[position], tz="UTC"),
+                end=pd.Timestamp(activity_starts[position], tz="UTC"),
+                schedule=schedule
+            ).value
+        return last_available_times
+
+    def _get_previous_end_times(
+            self,
+            resource_end_times: np.ndarray,
+            end_times: np.ndarray,
+            start_times: Optional[np.ndarray]
+    ) -> np.ndarray:
+        # Binary search, for each event, the latest end time previous to its end (and not after its start, if given)
+        if use_numba(self.config):
+            return get_previous_end_times_numba(resource_end_times, end_times, start_times)
+        limits = np.searchsorted(resource_end_times, end_times, side="left")
+        if start_times is not None:
+            limits = np.minimum(limits, np.searchsorted(resource_end_times, start_times, side="right"))
+        previous_end_times = np.full(len(limits), NAT, dtype=np.int64)
+        found = (limits > 0) & (end_times != NAT)
+        previous_end_times[found] = resource_end_times[limits[found] - 1]
+        return previous_end_times
+
+
+# Duration of a day, of the maximum gap between working intervals considered as continuous, and of a microsecond (in nanoseconds)
+_DAY = 24 * 60 * 60 * 1_000_000_000
+_GAP = 2 * 1_000_000_000
+_MICROSECOND = 1_000
+# Sentinel values of the day crossings: continue with the previous interval, and out of the expanded span
+_LINKED = np.iinfo(np.int64).max
+_UNKNOWN = np.iinfo(np.int64).min + 1
+
+
+def _get_min(values: np.ndarray) -> int:
+    # Minimum of the non-NaT values (maximum int64 value if none)
+    values = values[values != NAT]
+    return values.min() if len(values) > 0 else np.iinfo(np.int64).max
+
+
+class _WorkingIntervals:
+    def __init__(self, schedule, first_day: int, last_day: int):
         """
-        # For each trace in the log, estimate the enabled time of its events
-        indexes = []
-        resource_availability_times = []
-        for (case_id, trace) in event_log.groupby(self.log_ids.case):
-            # Get the resource availability times
-            for index, event in trace.iterrows():
-                indexes += [index]
-                resource_availability_time = self.available_since(event[self.log_ids.resource], event)
-                resource_availability_times += [resource_availability_time]
-        # Set all enabled times at once
-        event_log.loc[indexes, self.log_ids.available_time] = resource_availability_times
-        event_log[self.log_ids.available_time] = pd.to_datetime(event_log[self.log_ids.available_time], utc=True)
+        Working intervals of a weekly calendar (RCalendar) expanded over the days from [first_day] to [last_day] (days since epoch), with
+        the timestamp since which each interval is continuously available (chaining the previous intervals and days separated by gaps of
+        up to 2 seconds, as get_last_available_timestamp does).
+        """
+        self.first_day, self.last_day = first_day, last_day
+        # Times of the day (in nanoseconds) of the working intervals of each weekday
+        weekday_intervals = {}
+        self.supported = True
+        for weekday in range(7):
+            intervals = [
+                (_time_of_day(interval.start), _time_of_day(interval.end)) for interval in schedule.work_intervals.get(weekday, [])
+            ]
+            weekday_intervals[weekday] = intervals
+            # The intervals must be sorted and disjoint, and not start at the last microsecond of the day
+            for interval_start, interval_end in intervals:
+                self.supported &= interval_start <= interval_end and interval_start < _DAY - _MICROSECOND
+            for (_, previous_end), (next_start, _) in zip(intervals, intervals[1:]):
+                self.supported &= previous_end < next_start
+        # Expand the intervals over the days (1970-01-01 was a Thursday)
+        days = np.arange(first_day, last_day + 1, dtype=np.int64)
+        weekdays = (days + 3) % 7
+        counts = np.array([len(weekday_intervals[weekday]) for weekday in range(7)], dtype=np.int64)[weekdays]
+        self.days = np.repeat(days, counts)
+        times_of_day = np.array(
+            [times for weekday in weekdays for interval in weekday_intervals[weekday] for times in interval], dtype=np.int64
+        ).reshape(-1, 2)
+        self.starts = self.days * _DAY + times_of_day[:, 0] if len(self.days) > 0 else np.array([], dtype=np.int64)
+        self.ends = self.days * _DAY + times_of_day[:, 1] if len(self.days) > 0 else np.array([], dtype=np.int64)
+        # Timestamp since which the resource is continuously available when reaching the start of each interval
+        self.available_since = self._get_available_since()
+
+    def _get_available_since(self) -> np.ndarray:
+        n_intervals = len(self.starts)
+        if n_intervals == 0:
+            return np.array([], dtype=np.int64)
+        midnights = self.days * _DAY
+        is_first_of_day = np.r_[True, self.days[1:] != self.days[:-1]]
+        # Previous interval continuous with the current one in the same day
+        linked = np.r_[False, (self.starts[1:] - self.ends[:-1] <= _GAP)] & ~is_first_of_day
+        # First interval of the day starting at midnight: continue from the last instant of the previous day
+        crosses_day = is_first_of_day & (self.starts - midnights <= _GAP)
+        crossings = self._get_day_crossings(self.days, np.arange(-1, n_intervals - 1))
+        linked |= crosses_day & (crossings == _LINKED)
+        own_values = np.where(crosses_day & (crossings != _LINKED), crossings, self.starts)
+        # Propagate the value of the first interval of each chain of linked intervals
+        heads = np.maximum.accumulate(np.where(linked, -1, np.arange(n_intervals)))
+        return own_values[heads]
+
+    def _get_day_crossings(self, days: np.ndarray, previous_intervals: np.ndarray) -> np.ndarray:
+        # Result of moving from the start of [days] to the last instant of the previous day, given the last interval before it:
+        # continue with it (_LINKED), available since midnight, since the last instant of an empty previous day, or _UNKNOWN
+        last_instants = days * _DAY - _MICROSECOND
+        safe_intervals = np.maximum(previous_intervals, 0)
+        if len(self.starts) > 0:
+            previous_ends = self.ends[safe_intervals]
+            previous_is_last_day = (previous_intervals >= 0) & (self.days[safe_intervals] == days - 1)
+        else:
+            previous_ends = np.zeros(len(days), dtype=np.int64)
+            previous_is_last_day = np.zeros(len(days), dtype=bool)
+        return np.where(
+            previous_is_last_day,
+            np.where(last_instants - previous_ends <= _GAP, _LINKED, days * _DAY),
+            np.where(days - 1 >= self.first_day, last_instants, _UNKNOWN)
+        )
+
+    def get_last_available_times(self, previous_end_times: np.ndarray, activity_starts: np.ndarray) -> (np.ndarray, np.ndarray):
+        """
+        Get the end of the last non-working period between each previous end time (NaT if none) and the start of each activity.
+
+        :return: a tuple with the last available time of each event, and a boolean mask with the events that are not supported by the
+                 expanded intervals (to compute them iteratively).
+        """
+        days = activity_starts // _DAY
+        times_of_day = activity_starts - days * _DAY
+        # Last interval starting before (or at) the start of each activity
+        intervals = np.searchsorted(self.starts, activity_starts, side="right") - 1
+        safe_intervals = np.maximum(intervals, 0)
+        in_day = (intervals >= 0) & (self.days[safe_intervals] == days) if len(self.starts) > 0 else np.zeros(len(days), dtype=bool)
+        available_since = self.available_since[safe_intervals] if len(self.starts) > 0 else np.zeros(len(days), dtype=np.int64)
+        ends = self.ends[safe_intervals] if len(self.starts) > 0 else np.zeros(len(days), dtype=np.int64)
+        # Within a working interval (or up to 2 seconds after it): available since the start of its chain of intervals
+        last_available_times = np.where(in_day & (activity_starts - ends <= _GAP), available_since, activity_starts)
+        # Close to midnight with no interval before in the day: move to the previous day
+        crosses_day = ~in_day & (times_of_day <= _GAP)
+        crossings = self._get_day_crossings(days, intervals)
+        last_available_times = np.where(crosses_day, np.where(crossings == _LINKED, available_since, crossings), last_available_times)
+        # Never before the previous end time
+        has_previous = previous_end_times != NAT
+        last_available_times = np.where(has_previous, np.maximum(last_available_times, previous_end_times), last_available_times)
+        # Corner cases: not supported calendar, timestamps with nanoseconds or in the last microsecond of the day, or unknown availability
+        fallback = (
+                (not self.supported) |
+                (activity_starts % _MICROSECOND != 0) |
+                (times_of_day >= _DAY - _MICROSECOND) |
+                (has_previous & (previous_end_times - (previous_end_times // _DAY) * _DAY >= _DAY - _MICROSECOND)) |
+                (last_available_times == _UNKNOWN) |
+                (days - 1 < self.first_day) | (days > self.last_day)
+        )
+        return last_available_times, fallback
+
+
+def _time_of_day(timestamp) -> int:
+    # Time of the day of a timestamp in nanoseconds
+    return ((timestamp.hour * 60 + timestamp.minute) * 60 + timestamp.second) * 1_000_000_000 + timestamp.microsecond * _MICROSECOND
+
+
+def get_working_schedules_key(working_schedules: dict) -> frozenset:
+    """
+    Get a key of the content of [working_schedules] (resources as key and their working calendars as value): the working intervals of
+    the calendar of each resource. Dicts with the same calendars get the same key, and editing a calendar in place changes it.
+
+    :param working_schedules: dictionary with the resources as key and their working calendars (RCalendar) as value.
+
+    :return: a hashable key of the working intervals of the calendar of each resource.
+    """
+    return frozenset((resource, _get_calendar_key(schedule)) for resource, schedule in working_schedules.items())
+
+
+def _get_calendar_key(schedule) -> tuple:
+    # Start and end of the working intervals of each weekday of a calendar (RCalendar)
+    return tuple(
+        (weekday, tuple((interval.start, interval.end) for interval in intervals))
+        for weekday, intervals in sorted(schedule.work_intervals.items())
+    )
+
+
+def _get_performed_events(event_log: Union[pd.DataFrame, CompiledLog], config: Configuration) -> dict:
+    # Create a dictionary with the resources as key and the sorted end times of all its events as value
+    compiled_log = compile_log(event_log, config.log_ids)
+    performed_events = {}
+    for resource_code, resource in enumerate(compiled_log.resources):
+        resource = str(resource)
+        if resource not in config.bot_resources:
+            resource_end_times = compiled_log.end_times[compiled_log.resource_events(resource_code)]
+            performed_events[resource] = np.sort(resource_end_times[resource_end_times != NAT])
+    return performed_events
 
 
 class SimpleResourceAvailability(ResourceAvailability):
-    def __init__(self, event_log: pd.DataFrame, config: Configuration):
+    def __init__(self, event_log: Union[pd.DataFrame, CompiledLog], config: Configuration):
         # Create a dictionary with the resources as key and all its end events as value
-        resources = {str(i) for i in event_log[config.log_ids.resource].unique()}
-        resources_calendar = {}
-        for resource in (resources - config.bot_resources):
-            resources_calendar[resource] = event_log[event_log[config.log_ids.resource] == resource][config.log_ids.end_time]
+        resources_calendar = _get_performed_events(event_log, config)
         # Super
         super(SimpleResourceAvailability, self).__init__(resources_calendar, {}, config)
 
 
 class CalendarResourceAvailability(ResourceAvailability):
-    def __init__(self, event_log: pd.DataFrame, config: Configuration):
+    def __init__(self, event_log: Union[pd.DataFrame, CompiledLog], config: Configuration):
         # Create a dictionary with the resources as key and all its end events as value
-        resources = {str(i) for i in event_log[config.log_ids.resource].unique()}
-        resources_calendar = {}
-        for resource in (resources - config.bot_resources):
-            resources_calendar[resource] = event_log[event_log[config.log_ids.resource] == resource][config.log_ids.end_time]
+        resources_calendar = _get_performed_events(event_log, config)
         # Super
         super(CalendarResourceAvailability, self).__init__(resources_calendar, config.working_schedules, config)
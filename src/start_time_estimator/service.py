@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import pandas as pd
+from pix_framework.input import read_csv_log
+
+from start_time_estimator.config import ConcurrencyOracleType, ReEstimationMethod, ResourceAvailabilityType, Configuration
+from start_time_estimator.estimator import StartTimeEstimator
+from start_time_estimator.utils import to_nanoseconds, get_durations, NAT
+
+
+class _RegisteredLog:
+    def __init__(self, event_log: pd.DataFrame, config: Configuration):
+        """
+        Warm state of a registered event log: the concurrency oracle and resource index discovered from it, and the statistic durations of
+        each activity (to detect outliers and re-estimate the non-estimated events) of its full estimation.
+
+        :param event_log:   registered event log.
+        :param config:      configuration of the estimation.
+        """
+        self.event_log = event_log
+        self.config = config
+        self.log_ids = config.log_ids
+        estimator = StartTimeEstimator(event_log, config)
+        self.concurrency_oracle = estimator.concurrency_oracle
+        self.resource_availability = estimator.resource_availability
+        # Statistic durations of the full estimation (as the chunked estimation does with the ones of the whole log)
+        times = self._get_times(event_log)
+        estimator._add_resource_availability_and_enabled_times(times)
+        estimator._add_initial_estimated_start_times(times)
+        self.outlier_statistic_durations = None
+        if not math.isnan(config.outlier_threshold):
+            self.outlier_statistic_durations = _get_statistic_durations(
+                estimator, times, config.outlier_statistic, lambda durations: estimator._apply_statistic(pd.Series(durations))
+            )
+            estimator._re_estimate_durations_over_threshold(times, self.outlier_statistic_durations)
+        self.re_estimation_durations = None
+        if config.re_estimation_method != ReEstimationMethod.SET_INSTANT:
+            self.re_estimation_durations = _get_statistic_durations(
+                estimator, times, config.re_estimation_method, estimator._get_activity_duration
+            )
+
+    def estimate(self, events: pd.DataFrame) -> pd.DataFrame:
+        # Estimate the start times of [events] with the warm oracle, resource index, and statistic durations
+        estimator = StartTimeEstimator(events, self.config, self.concurrency_oracle, self.resource_availability)
+        times = self._get_times(events)
+        estimator._add_resource_availability_and_enabled_times(times)
+        estimator._add_initial_estimated_start_times(times)
+        estimator._fix_estimated_start_times(times, self.outlier_statistic_durations, self.re_estimation_durations)
+        # Attach the computed times to a copy of the events
+        estimated_events = events.copy()
+        for column in [self.log_ids.available_time, self.log_ids.enabled_time, self.log_ids.estimated_start_time]:
+            if column not in estimated_events.columns:
+                estimated_events[column] = times[column].array
+        return estimated_events
+
+    def _get_times(self, event_log: pd.DataFrame) -> pd.DataFrame:
+        # Only the columns needed to estimate the start times (the rest are not copied)
+        columns = [
+            column for column in [self.log_ids.case, self.log_ids.activity, self.log_ids.resource, self.log_ids.start_time,
+                                  self.log_ids.end_time, self.log_ids.available_time, self.log_ids.enabled_time]
+            if column in event_log.columns
+        ]
+        return event_log[columns].reset_index(drop=True)
+
+
+class _Request:
+    def __init__(self, log_id: str, events: pd.DataFrame, future: asyncio.Future):
+        self.log_id = log_id
+        self.events = events
+        self.future = future
+
+
+class EstimationService:
+    def __init__(self, n_workers: int = 1, max_batch_size: int = 64, batch_window: float = 0.005):
+        """
+        Asynchronous service to estimate the start times of small sets of cases against registered event logs. Each registered log keeps
+        its concurrency oracle, resource index, and statistic durations warm, so a request only computes the times of its own events. The
+        requests are queued, and the ones arriving within [batch_window] seconds are estimated together (micro-batching) in a pool of
+        [n_workers] threads.
+
+        :param n_workers:       number of threads estimating the batches of requests.
+        :param max_batch_size:  maximum number of requests estimated together.
+        :param batch_window:    time (in seconds) to wait for more requests after the first one of a batch.
+        """
+        self.n_workers = n_workers
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        # Warm state of each registered event log
+        self._logs = {}
+        self._queue = None
+        self._executor = None
+        self._dispatcher = None
+        # Running estimations of batches of requests
+        self._batch_tasks = set()
+
+    async def __aenter__(self) -> 'EstimationService':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    async def start(self):
+        # Start the worker pool and the task dispatching the batches of requests
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.n_workers)
+        self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def stop(self):
+        # Stop dispatching requests (cancelling the pending ones) and shut down the worker pool
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            # The requests queued after the dispatcher stopped
+            self._cancel_requests([])
+            # Let the running batches finish
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+            self._executor.shutdown(wait=True)
+            self._dispatcher, self._executor = None, None
+
+    async def register_log(self, log_id: str, event_log: pd.DataFrame, config: Configuration):
+        """
+        Register an event log, discovering its concurrency oracle, resource index, and statistic durations (in the worker pool).
+
+        :param log_id:      identifier of the event log in the requests.
+        :param event_log:   event log of the process.
+        :param config:      configuration of the estimation.
+        """
+        registered_log = await asyncio.get_running_loop().run_in_executor(self._executor, _RegisteredLog, event_log, config)
+        self._logs[log_id] = registered_log
+
+    async def estimate(self, log_id: str, events: pd.DataFrame) -> pd.DataFrame:
+        """
+        Estimate the start times of [events] (all the events of a set of cases, e.g. new cases of the process) against the registered log
+        [log_id]: the enabled times are computed within their cases, and the resource availability times with the resource index of the
+        registered log.
+
+        :param log_id:  identifier of the registered event log.
+        :param events:  events to estimate the start times of.
+
+        :return: a copy of [events] with the estimated start time, the resource availability time, and the enablement time.
+        """
+        if log_id not in self._logs:
+            raise ValueError("Event log '{}' not registered!".format(log_id))
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Request(log_id, events, future))
+        return await future
+
+    async def estimate_cases(self, log_id: str, cases: list) -> pd.DataFrame:
+        """
+        Estimate the start times of the events of [cases] in the registered log [log_id]. The result is the same as the one of the full
+        estimation of the registered log for these events.
+
+        :param log_id:  identifier of the registered event log.
+        :param cases:   identifiers of the cases to estimate.
+
+        :return: the events of [cases] with the estimated start time, the resource availability time, and the enablement time.
+        """
+        if log_id not in self._logs:
+            raise ValueError("Event log '{}' not registered!".format(log_id))
+        registered_log = self._logs[log_id]
+        events = registered_log.event_log[registered_log.event_log[registered_log.log_ids.case].isin(cases)]
+        return await self.estimate(log_id, events)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        requests = []
+        try:
+            while True:
+                # Wait for a request, and collect the ones arriving within the batch window
+                requests = [await self._queue.get()]
+                deadline = loop.time() + self.batch_window
+                while len(requests) < self.max_batch_size:
+                    try:
+                        requests += [await asyncio.wait_for(self._queue.get(), max(deadline - loop.time(), 0))]
+                    except asyncio.TimeoutError:
+                        break
+                # Estimate each batch in the worker pool, without waiting for it to dispatch the next requests
+                for batch in self._get_batches(requests):
+                    batch_task = loop.create_task(self._estimate_batch(batch))
+                    self._batch_tasks.add(batch_task)
+                    batch_task.add_done_callback(self._batch_tasks.discard)
+                requests = []
+        except asyncio.CancelledError:
+            # Cancel the requests of the batch being collected, and the ones still queued
+            self._cancel_requests(requests)
+            raise
+
+    def _cancel_requests(self, requests: list):
+        # Cancel the futures of [requests] and of the requests still in the queue, so no caller waits for them forever
+        while not self._queue.empty():
+            requests.append(self._queue.get_nowait())
+        for request in requests:
+            if not request.future.done():
+                request.future.cancel()
+
+    def _get_batches(self, requests: list) -> list:
+        # Group the requests by event log, with no case in more than one request of the same batch
+        batches = []
+        for request in requests:
+            cases = set(request.events[self._logs[request.log_id].log_ids.case].unique())
+            for batch_log_id, batch_cases, batch_requests in batches:
+                if batch_log_id == request.log_id and batch_cases.isdisjoint(cases):
+                    batch_cases.update(cases)
+                    batch_requests.append(request)
+                    break
+            else:
+                batches += [(request.log_id, cases, [request])]
+        return [batch_requests for _, _, batch_requests in batches]
+
+    async def _estimate_batch(self, requests: list):
+        registered_log = self._logs[requests[0].log_id]
+        try:
+            events = pd.concat([request.events for request in requests])
+            estimated_events = await asyncio.get_running_loop().run_in_executor(self._executor, registered_log.estimate, events)
+        except Exception as error:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(error)
+            return
+        # Split the estimated events among the requests (in the order they were concatenated)
+        start = 0
+        for request in requests:
+            if not request.future.done():
+                request.future.set_result(estimated_events.iloc[start:start + len(request.events)])
+            start += len(request.events)
+
+
+def _get_statistic_durations(estimator: StartTimeEstimator, times: pd.DataFrame, statistic, apply_statistic) -> dict:
+    # Statistic of the estimated durations of each activity, as a dict activity -> pd.Timedelta
+    log_ids = estimator.log_ids
+    estimated_start_times = to_nanoseconds(times[log_ids.estimated_start_time])
+    estimated = estimated_start_times != NAT
+    # Events with missing end time have a missing (NaT) duration, handled by the statistic as in the full estimation
+    durations = get_durations(to_nanoseconds(times[log_ids.end_time]), estimated_start_times)[estimated]
+    activity_codes, activities = pd.factorize(times[log_ids.activity].to_numpy()[estimated])
+    activity_statistics = estimator._get_activity_statistics(
+        activity_codes, durations, len(activities), statistic, apply_statistic
+    )
+    return {
+        activity: pd.Timedelta(activity_statistic)
+        for activity, activity_statistic in zip(activities, activity_statistics) if activity_statistic != NAT
+    }
+
+
+async def _handle_connection(service: EstimationService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    # JSON lines protocol: each request {"log_id": ..., "cases": [...]} is answered with {"events": [...]} (or {"error": ...})
+    while True:
+        line = await reader.readline()
+        if len(line) == 0:
+            break
+        try:
+            request = json.loads(line)
+            estimated_events = await service.estimate_cases(request["log_id"], request["cases"])
+            response = {"events": json.loads(estimated_events.to_json(orient="records", date_format="iso"))}
+        except Exception as error:
+            response = {"error": str(error)}
+        writer.write((json.dumps(response) + "\n").encode())
+        await writer.drain()
+    writer.close()
+
+
+async def serve(
+        logs: dict,
+        config: Configuration,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        n_workers: int = 1,
+        batch_window: float = 0.005
+):
+    """
+    Register the event logs in [logs] (identifier -> path to a CSV, or Parquet, event log) and serve estimation requests over TCP, one JSON
+    request per line: {"log_id": ..., "cases": [...]}, answered with {"events": [...]} with the estimated events of the cases.
+    """
+    async with EstimationService(n_workers=n_workers, batch_window=batch_window) as service:
+        for log_id, log_path in logs.items():
+            if str(log_path).lower().endswith(".parquet"):
+                from start_time_estimator.parquet_io import read_parquet_log
+                event_log = read_parquet_log(log_path, config.log_ids, config.missing_resource)
+            else:
+                event_log = read_csv_log(log_path, config.log_ids, config.missing_resource)
+            await service.register_log(log_id, event_log, config)
+        server = await asyncio.start_server(lambda reader, writer: _handle_connection(service, reader, writer), host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(args: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Serve start time estimation requests against registered event logs.")
+    parser.add_argument("--log", action="append", required=True, metavar="LOG_ID=PATH", help="event log to register (repeatable)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-window", type=float, default=0.005, help="seconds to wait to batch concurrent requests")
+    parser.add_argument("--concurrency-oracle", default="HEURISTICS", choices=[value.name for value in ConcurrencyOracleType])
+    parser.add_argument("--resource-availability", default="SIMPLE", choices=[value.name for value in ResourceAvailabilityType])
+    parsed_args = parser.parse_args(args)
+    config = Configuration(
+        concurrency_oracle_type=ConcurrencyOracleType[parsed_args.concurrency_oracle],
+        resource_availability_type=ResourceAvailabilityType[parsed_args.resource_availability]
+    )
+    logs = dict(log.split("=", 1) for log in parsed_args.log)
+    asyncio.run(serve(logs, config, parsed_args.host, parsed_args.port, parsed_args.workers, parsed_args.batch_window))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,12 @@
 import itertools
+import os
+
+import numpy as np
+import pandas as pd
+
+# Int64 values of NaT and of a timestamp later than any other (to compute minimums)
+NAT = np.iinfo(np.int64).min
+NAT_MAX = np.iinfo(np.int64).max
 
 
 def zip_with_next(iterable):
@@ -6,3 +14,41 @@ def zip_with_next(iterable):
     a, b = itertools.tee(iterable)
     next(b, None)
     return zip(a, b)
+
+
+def to_nanoseconds(timestamps: pd.Series) -> np.ndarray:
+    # Timestamps as int64 nanoseconds since epoch in UTC (NaT as the minimum int64 value)
+    return pd.to_datetime(timestamps, utc=True).dt.tz_localize(None).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def from_nanoseconds(values: np.ndarray, index: pd.Index) -> pd.Series:
+    # Series of UTC timestamps from int64 nanoseconds since epoch (minimum int64 value as NaT)
+    return pd.Series(np.asarray(values, dtype=np.int64).view("datetime64[ns]"), index=index).dt.tz_localize("UTC")
+
+
+def get_durations(end_times: np.ndarray, start_times: np.ndarray) -> np.ndarray:
+    # Durations as int64 nanoseconds (NaT if any of the timestamps is missing)
+    return np.where((end_times != NAT) & (start_times != NAT), end_times - start_times, NAT)
+
+
+def get_n_workers(n_jobs: int) -> int:
+    # Number of worker processes to use (-1 for all the available CPUs)
+    if n_jobs < 0:
+        return os.cpu_count() or 1
+    return max(n_jobs, 1)
+
+
+def sort_by_case_and_end_time(case_codes: np.ndarray, end_times: np.ndarray) -> np.ndarray:
+    # Positions of the events with case (code >= 0) and end time sorted by case and end time, keeping the log order between ties
+    candidates = np.flatnonzero((case_codes >= 0) & (end_times != NAT))
+    return candidates[np.lexsort((end_times[candidates], case_codes[candidates]))]
+
+
+def split_by_cases(case_codes: np.ndarray, n_partitions: int) -> list:
+    # Split the positions of the events into (at most) [n_partitions] groups of similar size, with all the events of a case in the same one
+    order = np.argsort(case_codes, kind="stable")
+    sorted_cases = case_codes[order]
+    case_starts = np.append(np.flatnonzero(np.r_[True, sorted_cases[1:] != sorted_cases[:-1]]), len(order))
+    targets = np.arange(1, n_partitions) * len(order) / n_partitions
+    cuts = np.unique(case_starts[np.searchsorted(case_starts, targets)])
+    return [partition for partition in np.split(order, cuts) if len(partition) > 0]
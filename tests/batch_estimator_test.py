@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from start_time_estimator.batch_estimator import BatchStartTimeEstimator
+from start_time_estimator.config import Configuration, ConcurrencyOracleType, ConcurrencyThresholds, ReEstimationMethod, \
+    ResourceAvailabilityType
+from start_time_estimator.estimator import StartTimeEstimator
+from pix_framework.input import read_csv_log
+
+
+def _get_configs() -> list:
+    # Sweep over the oracles, thresholds, and re-estimation settings
+    configs = []
+    for concurrency_oracle_type in ConcurrencyOracleType:
+        for df_threshold in [0.5, 0.9]:
+            for re_estimation_method, outlier_threshold in [(ReEstimationMethod.MEDIAN, float('nan')), (ReEstimationMethod.MODE, 1.5)]:
+                configs += [Configuration(
+                    concurrency_oracle_type=concurrency_oracle_type,
+                    resource_availability_type=ResourceAvailabilityType.SIMPLE,
+                    concurrency_thresholds=ConcurrencyThresholds(df=df_threshold),
+                    re_estimation_method=re_estimation_method,
+                    outlier_threshold=outlier_threshold
+                )]
+    return configs
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+@pytest.mark.parametrize("log_name", ["test_event_log_1.csv", "test_event_log_3.csv"])
+def test_batch_estimation(log_name, n_jobs):
+    configs = _get_configs()
+    event_log = read_csv_log(f'./tests/assets/{log_name}', configs[0].log_ids, configs[0].missing_resource)
+    batch_estimator = BatchStartTimeEstimator(event_log, configs, n_jobs=n_jobs)
+    # The counts are computed once for the DF, Alpha, and Heuristics oracles, and once for the Overlapping ones
+    assert set(batch_estimator._counts) == {"df", "overlapping"}
+    estimations = batch_estimator.estimate()
+    # The estimation with each configuration is the same as the one of StartTimeEstimator
+    assert len(estimations) == len(configs)
+    for config, estimation in zip(_get_configs(), estimations):
+        expected = StartTimeEstimator(event_log.copy(), config).estimate()
+        pd.testing.assert_frame_equal(estimation, expected)
+
+
+def test_batch_estimation_different_log_ids():
+    configs = _get_configs()[:2]
+    configs[1].log_ids = configs[1].log_ids.__class__(case="other_case")
+    event_log = read_csv_log('./tests/assets/test_event_log_1.csv', configs[0].log_ids, configs[0].missing_resource)
+    with pytest.raises(ValueError):
+        BatchStartTimeEstimator(event_log, configs)
@@ -0,0 +1,135 @@
+import pandas as pd
+import pytest
+
+from start_time_estimator.chunked_estimator import ChunkedStartTimeEstimator
+from start_time_estimator.config import ConcurrencyOracleType, Configuration, ReEstimationMethod, ResourceAvailabilityType, OutlierStatistic
+from start_time_estimator.estimator import StartTimeEstimator
+from pix_framework.input import read_csv_log
+
+
+def _assert_same_estimation(extended_event_log: pd.DataFrame, chunked_event_log: pd.DataFrame, config: Configuration):
+    # The chunked estimation writes the events grouped by partition, so compare them sorted
+    columns = [config.log_ids.case, config.log_ids.activity, config.log_ids.start_time, config.log_ids.end_time]
+    time_columns = [config.log_ids.available_time, config.log_ids.enabled_time, config.log_ids.estimated_start_time]
+    for column in [config.log_ids.start_time, config.log_ids.end_time] + time_columns:
+        chunked_event_log[column] = pd.to_datetime(chunked_event_log[column], utc=True, format="ISO8601")
+    extended_event_log = extended_event_log.sort_values(columns).reset_index(drop=True)
+    chunked_event_log = chunked_event_log.sort_values(columns).reset_index(drop=True)
+    for column in time_columns:
+        pd.testing.assert_series_equal(extended_event_log[column], chunked_event_log[column], check_dtype=False)
+
+
+@pytest.mark.parametrize("log_name, concurrency_oracle_type, chunk_size", [
+    ("test_event_log_1.csv", ConcurrencyOracleType.HEURISTICS, 7),
+    ("test_event_log_3.csv", ConcurrencyOracleType.OVERLAPPING, 1000),
+])
+def test_chunked_estimation_csv(tmp_path, log_name, concurrency_oracle_type, chunk_size):
+    config = Configuration(
+        re_estimation_method=ReEstimationMethod.MODE,
+        concurrency_oracle_type=concurrency_oracle_type,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE,
+        outlier_statistic=OutlierStatistic.MEDIAN,
+        outlier_threshold=1.5
+    )
+    # Estimate start times in memory (in the order of the file)
+    event_log = read_csv_log(f'./tests/assets/{log_name}', config.log_ids, config.missing_resource, sort=False)
+    extended_event_log = StartTimeEstimator(event_log, config).estimate()
+    # Estimate start times reading and processing the log in chunks
+    output_path = tmp_path / "estimated.csv"
+    ChunkedStartTimeEstimator(f'./tests/assets/{log_name}', config, chunk_size=chunk_size).estimate(output_path)
+    chunked_event_log = pd.read_csv(output_path)
+    # The result is the same
+    assert len(chunked_event_log) == len(extended_event_log)
+    _assert_same_estimation(extended_event_log, chunked_event_log, config)
+
+
+def test_chunked_estimation_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    config = Configuration(
+        re_estimation_method=ReEstimationMethod.MEDIAN,
+        concurrency_oracle_type=ConcurrencyOracleType.ALPHA,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE
+    )
+    event_log = read_csv_log('./tests/assets/test_event_log_1.csv', config.log_ids, config.missing_resource, sort=False)
+    extended_event_log = StartTimeEstimator(event_log, config).estimate()
+    # Estimate start times from a Parquet file, writing the result to another Parquet file
+    input_path, output_path = tmp_path / "event_log.parquet", tmp_path / "estimated.parquet"
+    pd.read_csv('./tests/assets/test_event_log_1.csv').to_parquet(input_path)
+    ChunkedStartTimeEstimator(str(input_path), config, chunk_size=10).estimate(str(output_path))
+    chunked_event_log = pd.read_parquet(output_path)
+    # The result is the same
+    assert len(chunked_event_log) == len(extended_event_log)
+    _assert_same_estimation(extended_event_log, chunked_event_log, config)
+
+
+@pytest.mark.parametrize("concurrency_oracle_type", [
+    ConcurrencyOracleType.ALPHA, ConcurrencyOracleType.HEURISTICS, ConcurrencyOracleType.OVERLAPPING
+])
+def test_chunked_estimation_interleaved_cases(tmp_path, concurrency_oracle_type):
+    config = Configuration(
+        re_estimation_method=ReEstimationMethod.MEDIAN,
+        concurrency_oracle_type=concurrency_oracle_type,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE
+    )
+    # Event log sorted by end time, so the events of each case are spread over many chunks
+    input_path, output_path = tmp_path / "event_log.csv", tmp_path / "estimated.csv"
+    pd.read_csv('./tests/assets/test_event_log_3.csv').sort_values(config.log_ids.end_time, kind="stable").to_csv(input_path, index=False)
+    event_log = read_csv_log(str(input_path), config.log_ids, config.missing_resource, sort=False)
+    estimator = StartTimeEstimator(event_log, config)
+    extended_event_log = estimator.estimate()
+    # Estimate start times reading and processing the log in chunks
+    chunked_estimator = ChunkedStartTimeEstimator(str(input_path), config, chunk_size=500)
+    chunked_estimator.estimate(output_path)
+    chunked_event_log = pd.read_csv(output_path)
+    # The concurrency relations and the result are the same
+    assert chunked_estimator.concurrency_oracle.concurrency == estimator.concurrency_oracle.concurrency
+    assert len(chunked_event_log) == len(extended_event_log)
+    _assert_same_estimation(extended_event_log, chunked_event_log, config)
+
+
+@pytest.mark.parametrize("outlier_statistic, re_estimation_method", [
+    (OutlierStatistic.MODE, ReEstimationMethod.MEAN),
+    (OutlierStatistic.MEAN, ReEstimationMethod.MEDIAN),
+    (OutlierStatistic.MEDIAN, ReEstimationMethod.MODE),
+])
+def test_chunked_estimation_statistics(tmp_path, outlier_statistic, re_estimation_method):
+    config = Configuration(
+        re_estimation_method=re_estimation_method,
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE,
+        outlier_statistic=outlier_statistic,
+        outlier_threshold=1.2
+    )
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource, sort=False)
+    extended_event_log = StartTimeEstimator(event_log, config).estimate()
+    # The statistics of each activity are computed from the histograms of durations of the partitions
+    output_path = tmp_path / "estimated.csv"
+    ChunkedStartTimeEstimator('./tests/assets/test_event_log_3.csv', config, chunk_size=1000).estimate(output_path)
+    _assert_same_estimation(extended_event_log, pd.read_csv(output_path), config)
+
+
+@pytest.mark.parametrize("outlier_statistic, re_estimation_method", [
+    (OutlierStatistic.MEAN, ReEstimationMethod.MEDIAN),
+    (OutlierStatistic.MEDIAN, ReEstimationMethod.MEAN),
+    (OutlierStatistic.MODE, ReEstimationMethod.MODE),
+])
+def test_chunked_estimation_missing_end_times(tmp_path, outlier_statistic, re_estimation_method):
+    config = Configuration(
+        re_estimation_method=re_estimation_method,
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE,
+        outlier_statistic=outlier_statistic,
+        outlier_threshold=1.5
+    )
+    # Event log with some missing end times (their durations are not part of the statistics)
+    input_path, output_path = tmp_path / "event_log.csv", tmp_path / "estimated.csv"
+    raw_event_log = pd.read_csv('./tests/assets/test_event_log_3.csv')
+    raw_event_log.loc[raw_event_log.index[5::97], config.log_ids.end_time] = None
+    raw_event_log.to_csv(input_path, index=False)
+    event_log = read_csv_log(str(input_path), config.log_ids, config.missing_resource, sort=False)
+    extended_event_log = StartTimeEstimator(event_log, config).estimate()
+    # Estimate start times reading and processing the log in chunks
+    ChunkedStartTimeEstimator(str(input_path), config, chunk_size=500).estimate(output_path)
+    chunked_event_log = pd.read_csv(output_path)
+    assert len(chunked_event_log) == len(extended_event_log)
+    _assert_same_estimation(extended_event_log, chunked_event_log, config)
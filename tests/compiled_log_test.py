@@ -0,0 +1,72 @@
+import numpy as np
+
+from start_time_estimator.compiled_log import CompiledLog, compile_log
+from start_time_estimator.concurrency_oracle import HeuristicsConcurrencyOracle, OverlappingConcurrencyOracle
+from start_time_estimator.config import Configuration
+from start_time_estimator.resource_availability import SimpleResourceAvailability
+from start_time_estimator.utils import to_nanoseconds
+from pix_framework.input import read_csv_log
+
+
+def test_compiled_log():
+    config = Configuration()
+    event_log = read_csv_log('./tests/assets/test_event_log_1.csv', config.log_ids, config.missing_resource)
+    compiled_log = CompiledLog(event_log, config.log_ids)
+    # Codes and timestamps of each event
+    assert compiled_log.n_events == len(event_log)
+    assert compiled_log.case_codes.dtype == np.int32 and compiled_log.activity_codes.dtype == np.int32
+    assert (compiled_log.cases[compiled_log.case_codes] == event_log[config.log_ids.case]).all()
+    assert (compiled_log.activities[compiled_log.activity_codes] == event_log[config.log_ids.activity]).all()
+    assert (compiled_log.resources[compiled_log.resource_codes] == event_log[config.log_ids.resource]).all()
+    assert (compiled_log.end_times == to_nanoseconds(event_log[config.log_ids.end_time])).all()
+    assert (compiled_log.start_times == to_nanoseconds(event_log[config.log_ids.start_time])).all()
+    # Events of each case and resource, in log order
+    for case_code, case in enumerate(compiled_log.cases):
+        assert (compiled_log.case_events(case_code) == np.flatnonzero(event_log[config.log_ids.case] == case)).all()
+    for resource_code, resource in enumerate(compiled_log.resources):
+        assert (compiled_log.resource_events(resource_code) == np.flatnonzero(event_log[config.log_ids.resource] == resource)).all()
+    for activity_code, activity in enumerate(compiled_log.activities):
+        assert (compiled_log.activity_events(activity_code) == np.flatnonzero(event_log[config.log_ids.activity] == activity)).all()
+    # Events sorted by case and end time (stable), computed once
+    expected_order = np.lexsort((compiled_log.end_times, compiled_log.case_codes))
+    assert (compiled_log.case_end_order == expected_order).all()
+    assert compiled_log.case_end_order is compiled_log.case_end_order
+    # Already compiled logs are not compiled again
+    assert compile_log(compiled_log, config.log_ids) is compiled_log
+
+
+def test_components_from_compiled_log():
+    config = Configuration()
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    compiled_log = CompiledLog(event_log, config.log_ids)
+    # The concurrency oracles and resource availability are the same when built from the compiled log
+    for oracle_class in [HeuristicsConcurrencyOracle, OverlappingConcurrencyOracle]:
+        assert oracle_class(compiled_log, config).concurrency == oracle_class(event_log, config).concurrency
+    resource_availability = SimpleResourceAvailability(compiled_log, config)
+    expected = SimpleResourceAvailability(event_log, config).performed_events
+    assert resource_availability.performed_events.keys() == expected.keys()
+    for resource in expected:
+        assert (resource_availability.performed_events[resource] == expected[resource]).all()
+    # And the times computed with the compiled log are the same as with the event log
+    with_compiled_log, without_compiled_log = event_log.copy(), event_log.copy()
+    resource_availability.add_resource_availability_times(with_compiled_log, compiled_log)
+    resource_availability.add_resource_availability_times(without_compiled_log)
+    concurrency_oracle = HeuristicsConcurrencyOracle(compiled_log, config)
+    concurrency_oracle.add_enabled_times(with_compiled_log, include_enabling_activity=True, compiled_log=compiled_log)
+    concurrency_oracle.add_enabled_times(without_compiled_log, include_enabling_activity=True)
+    assert with_compiled_log.equals(without_compiled_log)
+
+
+def test_take_events_of_compiled_log():
+    config = Configuration()
+    event_log = read_csv_log('./tests/assets/test_event_log_1.csv', config.log_ids, config.missing_resource)
+    compiled_log = CompiledLog(event_log, config.log_ids)
+    positions = np.array([7, 2, 3, 11, 0])
+    taken = compiled_log.take(positions)
+    # The selected events in log order, with the same labels (and codes)
+    assert taken.n_events == len(positions)
+    assert (taken.case_codes == compiled_log.case_codes[np.sort(positions)]).all()
+    assert (taken.end_times == compiled_log.end_times[np.sort(positions)]).all()
+    assert taken.activities is compiled_log.activities
+    for case_code in range(len(taken.cases)):
+        assert (np.sort(positions)[taken.case_events(case_code)] == np.intersect1d(compiled_log.case_events(case_code), positions)).all()
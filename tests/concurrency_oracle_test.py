@@ -1,9 +1,12 @@
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 
+from start_time_estimator.compiled_log import CompiledLog
 from start_time_estimator.concurrency_oracle import AlphaConcurrencyOracle, HeuristicsConcurrencyOracle, \
-    DirectlyFollowsConcurrencyOracle, DeactivatedConcurrencyOracle, OverlappingConcurrencyOracle, _get_overlapping_matrix
+    DirectlyFollowsConcurrencyOracle, DeactivatedConcurrencyOracle, OverlappingConcurrencyOracle, _get_overlapping_matrix, \
+    _get_overlapping_counts
 from start_time_estimator.config import Configuration, ConcurrencyThresholds
 from pix_framework.input import read_csv_log
 
@@ -233,3 +236,92 @@ def test__get_overlapping_matrix():
         'E': {'C': 1, 'D': 1},
         'F': dict()
     }
+
+
+def test__get_overlapping_counts_in_batches():
+    config = Configuration()
+    event_log = read_csv_log('./tests/assets/test_event_log_6.csv', config.log_ids, config.missing_resource)
+    activities, overlapping_count = _get_overlapping_counts(event_log, config)
+    # Checking the candidate pairs of events in small batches gives the same counts
+    batch_activities, batch_overlapping_count = _get_overlapping_counts(event_log, config, max_pairs=2)
+    assert list(activities) == list(batch_activities)
+    assert (overlapping_count == batch_overlapping_count).all()
+    # The counts correspond to the overlapping relations
+    assert overlapping_count[list(activities).index('C'), list(activities).index('D')] == 4
+    assert overlapping_count[list(activities).index('E'), list(activities).index('C')] == 1
+
+
+def test_update_traces_heuristics_concurrency_oracle():
+    config = Configuration()
+    event_log = read_csv_log('./tests/assets/test_event_log_3_noise.csv', config.log_ids, config.missing_resource)
+    concurrency_oracle = HeuristicsConcurrencyOracle(event_log, config)
+    # Discover the concurrency with a part of the traces, and update it with the rest
+    cases = event_log[config.log_ids.case].unique()
+    first_traces = event_log[event_log[config.log_ids.case].isin(cases[:5])]
+    updated_concurrency_oracle = HeuristicsConcurrencyOracle(first_traces, config)
+    updated_concurrency_oracle.update_traces(first_traces.iloc[0:0], event_log[event_log[config.log_ids.case].isin(cases[5:])])
+    # The concurrency is the same as discovering it from all the traces at once
+    assert updated_concurrency_oracle.concurrency == concurrency_oracle.concurrency
+    for name, matrix in concurrency_oracle.counts.matrices.items():
+        assert (updated_concurrency_oracle.counts.reindex(concurrency_oracle.counts.activities).matrices[name] == matrix).all()
+
+
+def test_concurrency_matrix():
+    config = Configuration()
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    concurrency_oracle = HeuristicsConcurrencyOracle(event_log, config)
+    # The concurrency is stored as a boolean matrix indexed as the activities, with the dict of sets as view
+    activities = concurrency_oracle.activities
+    assert concurrency_oracle.concurrency_matrix.shape == (len(activities), len(activities))
+    for code, activity in enumerate(activities):
+        concurrent_activities = {activities[other] for other in np.flatnonzero(concurrency_oracle.concurrency_matrix[code])}
+        assert concurrency_oracle.concurrency[activity] == concurrent_activities
+    # Vectorized lookup (not concurrent with unknown activities)
+    trace_activities = ['A', 'B', 'C', 'D', 'E', 'unknown']
+    assert list(concurrency_oracle.is_concurrent('C', trace_activities)) == [False, False, False, True, False, False]
+    assert not concurrency_oracle.is_concurrent('unknown', trace_activities).any()
+    # Setting the concurrency as a dict of sets updates the matrix
+    concurrency_oracle.concurrency = {'A': {'B'}, 'B': {'A'}, 'C': set()}
+    assert concurrency_oracle.activities == ['A', 'B', 'C']
+    assert (concurrency_oracle.concurrency_matrix == np.array([[False, True, False], [True, False, False], [False] * 3])).all()
+    assert concurrency_oracle.concurrency == {'A': {'B'}, 'B': {'A'}, 'C': set()}
+
+
+def test_enabling_activity_instance_cached_by_variant():
+    config = Configuration()
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    concurrency_oracle = HeuristicsConcurrencyOracle(event_log, config)
+    traces = [trace for _, trace in event_log.groupby(config.log_ids.case)]
+    # The enabling activity instance of each event is the same as searching it in the trace
+    for trace in traces[:20]:
+        for _, event in trace.iterrows():
+            previous_end_times = trace[
+                (trace[config.log_ids.end_time] < event[config.log_ids.end_time]) &
+                (~trace[config.log_ids.activity].isin(concurrency_oracle.concurrency[event[config.log_ids.activity]]))
+                ][config.log_ids.end_time]
+            enabling_activity_instance = concurrency_oracle.enabling_activity_instance(trace, event)
+            if len(previous_end_times) > 0:
+                assert enabling_activity_instance.name == previous_end_times.idxmax()
+            else:
+                assert enabling_activity_instance is None
+    # Traces of the same variant share the cached enabling structure
+    assert len(concurrency_oracle._variant_cache) < 20
+    # The cache keeps only the most recently used variants
+    concurrency_oracle.variant_cache_size = 2
+    for trace in traces:
+        concurrency_oracle.enabled_since(trace, trace.iloc[-1])
+    assert len(concurrency_oracle._variant_cache) == 2
+
+
+def test_count_relations_in_parallel():
+    config = Configuration()
+    event_log = read_csv_log('./tests/assets/test_event_log_3_noise.csv', config.log_ids, config.missing_resource)
+    compiled_log = CompiledLog(event_log, config.log_ids)
+    for oracle_class in [AlphaConcurrencyOracle, HeuristicsConcurrencyOracle, OverlappingConcurrencyOracle]:
+        counts = oracle_class._count_relations(compiled_log, config)
+        # Summing the counts of partitions of the cases counted in worker processes gives the same counts
+        parallel_counts = oracle_class.count_relations_in_parallel(compiled_log, config, n_workers=3)
+        assert parallel_counts.activities == counts.activities
+        for name, matrix in counts.matrices.items():
+            assert (parallel_counts.matrices[name] == matrix).all()
+        assert oracle_class.from_counts(parallel_counts, config).concurrency == oracle_class(event_log, config).concurrency
@@ -1,7 +1,12 @@
+import gc
+import weakref
 from datetime import timedelta
 
+import numpy as np
 import pandas as pd
+from pix_framework.calendar.resource_calendar import RCalendar, Interval
 
+from start_time_estimator.concurrency_oracle import HeuristicsConcurrencyOracle
 from start_time_estimator.config import ConcurrencyOracleType, Configuration, ReEstimationMethod, ResourceAvailabilityType, OutlierStatistic
 from start_time_estimator.estimator import StartTimeEstimator
 from pix_framework.input import read_csv_log
@@ -177,6 +182,23 @@ def test_replace_recorded_start_times_with_estimation():
     assert config.log_ids.estimated_start_time not in extended_event_log.columns
 
 
+def test_estimate_start_times_inplace():
+    config = Configuration(
+        re_estimation_method=ReEstimationMethod.MODE,
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE
+    )
+    event_log = read_csv_log('./tests/assets/test_event_log_1.csv', config.log_ids, config.missing_resource)
+    columns = list(event_log.columns)
+    # Estimating on a copy does not modify the event log
+    extended_event_log = StartTimeEstimator(event_log, config).estimate()
+    assert list(event_log.columns) == columns
+    # Estimating in place adds the same columns to the event log itself
+    inplace_extended_event_log = StartTimeEstimator(event_log, config).estimate(inplace=True)
+    assert inplace_extended_event_log is event_log
+    pd.testing.assert_frame_equal(inplace_extended_event_log, extended_event_log)
+
+
 def test_set_instant_non_estimated_start_times():
     config = Configuration(
         re_estimation_method=ReEstimationMethod.SET_INSTANT,
@@ -309,3 +331,203 @@ def test_get_activity_duration():
     assert start_time_estimator._get_activity_duration(durationsA) == timedelta(2)
     assert start_time_estimator._get_activity_duration(durationsB) == timedelta(2)
     assert start_time_estimator._get_activity_duration(durationsC) == timedelta(2)
+
+
+def test_get_activity_statistics():
+    durations = {
+        'A': [timedelta(2), timedelta(9), timedelta(4), timedelta(6), timedelta(7), timedelta(2)],
+        'B': [timedelta(8), timedelta(4), timedelta(2), timedelta(4), timedelta(2), timedelta(seconds=1)],
+        'C': [timedelta(3), timedelta(seconds=3), timedelta(2)],
+    }
+    # Interleave the durations of the activities
+    activities = np.array([activity for activity in durations for _ in durations[activity]])
+    values = np.array([duration for activity in durations for duration in durations[activity]], dtype="timedelta64[ns]")
+    order = np.random.default_rng(0).permutation(len(activities))
+    activity_codes, activity_labels = pd.factorize(activities[order])
+    for re_estimation_method in [ReEstimationMethod.MEAN, ReEstimationMethod.MEDIAN, ReEstimationMethod.MODE]:
+        config = Configuration(re_estimation_method=re_estimation_method)
+        start_time_estimator = StartTimeEstimator(pd.DataFrame(columns=list(config.log_ids.__dict__.values())), config)
+        statistics = start_time_estimator._get_activity_statistics(
+            activity_codes, values[order].view(np.int64), len(activity_labels), re_estimation_method,
+            start_time_estimator._get_activity_duration
+        )
+        # The statistic of each activity is the same as computing it individually (in the same order)
+        for code, activity in enumerate(activity_labels):
+            expected = start_time_estimator._get_activity_duration(values[order][activity_codes == code])
+            assert statistics[code] == pd.Timedelta(expected).value
+
+
+def test_estimate_start_times_in_parallel():
+    for log_name, concurrency_oracle_type in [
+        ('test_event_log_1.csv', ConcurrencyOracleType.DF),
+        ('test_event_log_1.csv', ConcurrencyOracleType.HEURISTICS),
+        ('test_event_log_3.csv', ConcurrencyOracleType.OVERLAPPING)
+    ]:
+        config = Configuration(
+            re_estimation_method=ReEstimationMethod.MEDIAN,
+            concurrency_oracle_type=concurrency_oracle_type,
+            resource_availability_type=ResourceAvailabilityType.SIMPLE
+        )
+        event_log = read_csv_log(f'./tests/assets/{log_name}', config.log_ids, config.missing_resource)
+        # Estimate start times in the current process
+        extended_event_log = StartTimeEstimator(event_log, config).estimate()
+        # Estimate start times splitting the cases among processes
+        config.n_jobs = 2
+        parallel_extended_event_log = StartTimeEstimator(event_log, config).estimate()
+        # The result is the same
+        pd.testing.assert_frame_equal(extended_event_log, parallel_extended_event_log)
+
+
+def test_update_estimation_with_new_events():
+    config = Configuration(
+        re_estimation_method=ReEstimationMethod.MEDIAN,
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE
+    )
+    event_log = read_csv_log('./tests/assets/test_event_log_1.csv', config.log_ids, config.missing_resource)
+    event_log = event_log.sort_values(config.log_ids.end_time)
+    # Estimate start times of the whole event log at once
+    extended_event_log = StartTimeEstimator(event_log, config).estimate()
+    # Estimate start times with the first events, and update it with the rest in two batches
+    start_time_estimator = StartTimeEstimator(event_log.iloc[:10], config)
+    first_update = start_time_estimator.update(event_log.iloc[10:20])
+    second_update = start_time_estimator.update(event_log.iloc[20:])
+    # The updates return the new events and the previous ones that changed
+    assert set(event_log.index[10:20]).issubset(first_update.index)
+    assert set(event_log.index[20:]).issubset(second_update.index)
+    assert len(second_update) < len(event_log)
+    # The result is the same as estimating the whole event log at once
+    for column in [config.log_ids.available_time, config.log_ids.enabled_time, config.log_ids.estimated_start_time]:
+        pd.testing.assert_series_equal(second_update[column], extended_event_log.loc[second_update.index, column])
+        pd.testing.assert_series_equal(
+            start_time_estimator._incremental_times[column],
+            extended_event_log[column].reset_index(drop=True)
+        )
+
+
+def test_update_estimation_work_bounded_by_batch():
+    config = Configuration(
+        re_estimation_method=ReEstimationMethod.MEDIAN,
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE,
+        outlier_threshold=2.0,
+        profile=True
+    )
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    event_log = event_log.sort_values(config.log_ids.end_time)
+    start_time_estimator = StartTimeEstimator(event_log.iloc[:7000], config)
+    start_time_estimator.update(event_log.iloc[7000:7900])
+    # Update with a small batch
+    start_time_estimator.profiler.clear()
+    new_events = event_log.iloc[7900:7950]
+    updated_events = start_time_estimator.update(new_events)
+    # The stages only process the events of the modified traces (and, for the availability, the new events, as they end the last)
+    modified_traces = event_log[event_log[config.log_ids.case].isin(new_events[config.log_ids.case].unique())]
+    stage_rows = start_time_estimator.profiler.to_dataframe().set_index('stage')['rows']
+    assert stage_rows['update/resource_availability'] == len(new_events)
+    assert stage_rows['update/enabled_times'] <= len(modified_traces)
+    assert stage_rows['update/final_estimation'] <= len(modified_traces)
+    assert len(modified_traces) < len(event_log) / 10
+    # The event log is neither concatenated nor compiled again
+    assert len(start_time_estimator._event_log_batches) == 3
+    assert start_time_estimator._compiled_log is None
+    # And the result is the same as estimating the whole event log at once
+    extended_event_log = StartTimeEstimator(event_log.iloc[:7950], config).estimate()
+    for column in [config.log_ids.available_time, config.log_ids.enabled_time, config.log_ids.estimated_start_time]:
+        pd.testing.assert_series_equal(updated_events[column], extended_event_log.loc[updated_events.index, column])
+
+
+def test_fit_and_estimate_other_event_logs():
+    config = Configuration(
+        re_estimation_method=ReEstimationMethod.MEDIAN,
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE
+    )
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    reference_event_log = event_log.copy()
+    reference = weakref.ref(reference_event_log)
+    # Discover the concurrency oracle from the reference event log
+    fitted_estimator = StartTimeEstimator.fit(reference_event_log, config)
+    concurrency = fitted_estimator.concurrency_oracle.concurrency
+    # The fitted estimator keeps no reference to the reference event log
+    del reference_event_log
+    gc.collect()
+    assert reference() is None
+    # Estimate other event logs with the fitted concurrency oracle and their own resource availability
+    cases = event_log[config.log_ids.case].unique()
+    for extract_cases in [cases[:10], cases[10:30]]:
+        extract = event_log[event_log[config.log_ids.case].isin(extract_cases)]
+        extended_extract = fitted_estimator.estimate(extract)
+        estimator = StartTimeEstimator(extract, config, concurrency_oracle=HeuristicsConcurrencyOracle(event_log, config))
+        pd.testing.assert_frame_equal(extended_extract, estimator.estimate())
+        assert fitted_estimator.concurrency_oracle.concurrency == concurrency
+
+
+def test_repeated_estimations_reuse_times():
+    config = Configuration(
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE,
+        profile=True
+    )
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    estimator = StartTimeEstimator(event_log, config)
+    estimator.estimate()
+    # Change only the settings of the final estimation stages
+    for re_estimation_method, outlier_threshold in [(ReEstimationMethod.MEDIAN, 2.0), (ReEstimationMethod.MEAN, 1.5)]:
+        estimator.config.re_estimation_method = re_estimation_method
+        estimator.config.outlier_threshold = outlier_threshold
+        estimator.profiler.clear()
+        extended_event_log = estimator.estimate(replace_recorded_start_times=True)
+        # The resource availability and enabled times are not computed again
+        stages = set(estimator.profiler.to_dataframe()['stage'])
+        assert 'estimate/resource_availability' not in stages and 'estimate/enabled_times' not in stages
+        assert 'estimate/outlier_re_estimation' in stages
+        # And the result is the same as with a new estimator
+        new_config = Configuration(
+            concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+            resource_availability_type=ResourceAvailabilityType.SIMPLE,
+            re_estimation_method=re_estimation_method,
+            outlier_threshold=outlier_threshold
+        )
+        expected = StartTimeEstimator(event_log, new_config).estimate(replace_recorded_start_times=True)
+        pd.testing.assert_frame_equal(extended_event_log, expected)
+    # Changing the start times consideration computes them again
+    estimator.config.consider_start_times = True
+    estimator.profiler.clear()
+    estimator.estimate()
+    stages = set(estimator.profiler.to_dataframe()['stage'])
+    assert 'estimate/resource_availability' in stages and 'estimate/enabled_times' in stages
+
+
+def test_repeated_estimations_with_calendar_edited_in_place():
+    working_calendar = RCalendar("test")
+    working_calendar.add_calendar_item("MONDAY", "SUNDAY", "08:00:00", "20:00:00")
+    config = Configuration(
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.WITH_CALENDAR,
+        working_schedules={'Marcus': working_calendar, 'Dominic': working_calendar, 'Anya': working_calendar},
+        profile=True
+    )
+    event_log = read_csv_log('./tests/assets/test_event_log_1.csv', config.log_ids, config.missing_resource)
+    estimator = StartTimeEstimator(event_log, config)
+    previous_event_log = estimator.estimate()
+    estimator.update(event_log.iloc[:0])
+    # Edit the calendar in place (working only from 10:00 to 20:00)
+    for weekday, intervals in working_calendar.work_intervals.items():
+        intervals[0] = Interval(intervals[0].start.replace(hour=10), intervals[0].end)
+    estimator.profiler.clear()
+    extended_event_log = estimator.estimate()
+    # The resource availability times are computed again, with the edited calendar
+    assert 'estimate/resource_availability' in set(estimator.profiler.to_dataframe()['stage'])
+    edited_config = Configuration(
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.WITH_CALENDAR,
+        working_schedules={resource: working_calendar for resource in ['Marcus', 'Dominic', 'Anya']}
+    )
+    expected = StartTimeEstimator(event_log, edited_config).estimate()
+    pd.testing.assert_frame_equal(extended_event_log, expected)
+    assert (extended_event_log[config.log_ids.available_time] != previous_event_log[config.log_ids.available_time]).any()
+    # And so are the ones of the incremental estimation
+    updated_events = estimator.update(event_log.iloc[:0])
+    pd.testing.assert_frame_equal(updated_events, expected.loc[updated_events.index])
+    assert len(updated_events) == len(event_log)
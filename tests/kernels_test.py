@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from start_time_estimator import kernels
+from start_time_estimator.concurrency_oracle import _compute_enabling_positions_numpy
+from start_time_estimator.config import Configuration, ConcurrencyOracleType, KernelBackend, ResourceAvailabilityType
+from start_time_estimator.estimator import StartTimeEstimator
+from pix_framework.input import read_csv_log
+
+
+@pytest.mark.parametrize("concurrency_oracle_type", [ConcurrencyOracleType.HEURISTICS, ConcurrencyOracleType.OVERLAPPING])
+@pytest.mark.parametrize("consider_start_times", [False, True])
+@pytest.mark.parametrize("log_name", ["test_event_log_1.csv", "test_event_log_3.csv"])
+def test_numba_kernels_same_as_numpy(log_name, concurrency_oracle_type, consider_start_times):
+    pytest.importorskip("numba")
+    estimations = []
+    for kernel_backend in [KernelBackend.NUMPY, KernelBackend.NUMBA]:
+        config = Configuration(
+            concurrency_oracle_type=concurrency_oracle_type,
+            resource_availability_type=ResourceAvailabilityType.SIMPLE,
+            consider_start_times=consider_start_times,
+            kernel_backend=kernel_backend
+        )
+        event_log = read_csv_log(f'./tests/assets/{log_name}', config.log_ids, config.missing_resource)
+        estimator = StartTimeEstimator(event_log, config)
+        extended_event_log = estimator.estimate()
+        estimator.concurrency_oracle.add_enabled_times(extended_event_log, include_enabling_activity=True)
+        estimations += [extended_event_log]
+    # Both backends give the same result
+    pd.testing.assert_frame_equal(estimations[0], estimations[1])
+
+
+@pytest.mark.parametrize("consider_start_times", [False, True])
+def test_last_completion_kernel_same_as_numpy(consider_start_times):
+    pytest.importorskip("numba")
+    # Long traces (with ties in the end times, and events starting before the end of previous ones) of a log with concurrent activities
+    rng = np.random.default_rng(7)
+    n_events = 3000
+    case_codes = rng.integers(-1, 3, size=n_events)
+    activity_codes = rng.integers(0, 6, size=n_events)
+    end_times = rng.integers(0, 1000, size=n_events).astype(np.int64)
+    start_times = end_times - rng.integers(-5, 20, size=n_events)
+    concurrency_matrix = rng.random((6, 6)) < 0.4
+    arguments = (case_codes, activity_codes, end_times, start_times if consider_start_times else None, concurrency_matrix)
+    # Both the backward search and the last-completion table give the same enabling positions as the NumPy kernel
+    expected = _compute_enabling_positions_numpy(*arguments)
+    np.testing.assert_array_equal(kernels.compute_enabling_positions_numba(*arguments), expected)
+    np.testing.assert_array_equal(kernels.compute_enabling_positions_numba(*arguments, long_trace_threshold=100), expected)
+
+
+def test_kernel_backend_selection(monkeypatch):
+    # The NumPy backend never uses the compiled kernels
+    assert not kernels.use_numba(Configuration(kernel_backend=KernelBackend.NUMPY))
+    # Without Numba, the automatic selection falls back to NumPy, and the Numba backend fails
+    monkeypatch.setattr(kernels, "is_numba_available", lambda: False)
+    assert not kernels.use_numba(Configuration(kernel_backend=KernelBackend.AUTO))
+    with pytest.raises(ImportError):
+        kernels.use_numba(Configuration(kernel_backend=KernelBackend.NUMBA))
+    # With Numba, the automatic selection uses the compiled kernels
+    monkeypatch.setattr(kernels, "is_numba_available", lambda: True)
+    assert kernels.use_numba(Configuration(kernel_backend=KernelBackend.AUTO))
+    assert kernels.use_numba(Configuration(kernel_backend=KernelBackend.NUMBA))
@@ -0,0 +1,101 @@
+import os
+
+import pandas as pd
+import pytest
+
+from start_time_estimator.concurrency_oracle import HeuristicsConcurrencyOracle, OverlappingConcurrencyOracle
+from start_time_estimator.config import Configuration, ConcurrencyThresholds, ConcurrencyOracleType
+from start_time_estimator.estimator import StartTimeEstimator
+from start_time_estimator.oracle_cache import ConcurrencyOracleCache, get_event_log_hash
+from pix_framework.input import read_csv_log
+
+
+def _fail_counting(event_log, config):
+    raise AssertionError("The relations should not be counted again")
+
+
+def test_oracle_cache_reuses_discovered_oracle(tmp_path, monkeypatch):
+    config = Configuration(concurrency_thresholds=ConcurrencyThresholds(df=0.75))
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    cache = ConcurrencyOracleCache(str(tmp_path))
+    # The first time the oracle is discovered and stored
+    concurrency_oracle = cache.get_concurrency_oracle(event_log, HeuristicsConcurrencyOracle, config)
+    assert concurrency_oracle.concurrency == HeuristicsConcurrencyOracle(event_log, config).concurrency
+    assert len(os.listdir(tmp_path)) == 1
+    # The next times it is loaded from the cache, without counting the relations
+    monkeypatch.setattr(HeuristicsConcurrencyOracle, "_count_relations", staticmethod(_fail_counting))
+    cached_oracle = cache.get_concurrency_oracle(event_log, HeuristicsConcurrencyOracle, config)
+    assert cached_oracle.concurrency == concurrency_oracle.concurrency
+    for name, matrix in concurrency_oracle.counts.matrices.items():
+        assert (cached_oracle.counts.matrices[name] == matrix).all()
+    # Changing the thresholds re-applies the cut-offs to the cached counts
+    other_config = Configuration(concurrency_thresholds=ConcurrencyThresholds(df=0.3, l2l=0.5))
+    cached_oracle = cache.get_concurrency_oracle(event_log, HeuristicsConcurrencyOracle, other_config)
+    assert cached_oracle.concurrency == HeuristicsConcurrencyOracle.from_counts(concurrency_oracle.counts, other_config).concurrency
+    assert cached_oracle.concurrency != concurrency_oracle.concurrency
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_oracle_cache_key():
+    config = Configuration()
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    log_hash = get_event_log_hash(event_log, config)
+    # The hash only depends on the content of the columns used to count the relations
+    other_event_log = event_log.copy()
+    other_event_log[config.log_ids.resource] = "Other resource"
+    assert get_event_log_hash(other_event_log, config) == log_hash
+    other_event_log.loc[3, config.log_ids.activity] = "Other activity"
+    assert get_event_log_hash(other_event_log, config) != log_hash
+    other_event_log = event_log.copy()
+    other_event_log.loc[3, config.log_ids.end_time] += pd.Timedelta(seconds=1)
+    assert get_event_log_hash(other_event_log, config) != log_hash
+
+
+@pytest.mark.parametrize("concurrency_oracle_type", [ConcurrencyOracleType.HEURISTICS, ConcurrencyOracleType.OVERLAPPING])
+def test_estimation_with_oracle_cache(tmp_path, concurrency_oracle_type):
+    config = Configuration(concurrency_oracle_type=concurrency_oracle_type)
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    expected = StartTimeEstimator(event_log, config).estimate()
+    # The estimation is the same when discovering the oracle and when loading it from the cache
+    cached_config = Configuration(concurrency_oracle_type=concurrency_oracle_type, oracle_cache_dir=str(tmp_path))
+    for _ in range(2):
+        estimator = StartTimeEstimator(event_log, cached_config)
+        assert isinstance(estimator.concurrency_oracle, (HeuristicsConcurrencyOracle, OverlappingConcurrencyOracle))
+        pd.testing.assert_frame_equal(estimator.estimate(), expected)
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_oracle_cache_numeric_activity_labels(tmp_path):
+    config = Configuration()
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    # Numeric activity labels (and one string label) are loaded from the cache with their type
+    codes, activities = pd.factorize(event_log[config.log_ids.activity])
+    labels = ["A"] + list(range(1, len(activities) - 1)) + [2.5]
+    event_log[config.log_ids.activity] = pd.Series([labels[code] for code in codes], index=event_log.index, dtype=object)
+    cache = ConcurrencyOracleCache(str(tmp_path))
+    concurrency_oracle = cache.get_concurrency_oracle(event_log, HeuristicsConcurrencyOracle, config)
+    cached_oracle = cache.get_concurrency_oracle(event_log, HeuristicsConcurrencyOracle, config)
+    assert cached_oracle.counts.activities == concurrency_oracle.counts.activities
+    assert [type(activity) for activity in cached_oracle.counts.activities] == [
+        type(activity) for activity in concurrency_oracle.counts.activities
+    ]
+    assert cached_oracle.concurrency == concurrency_oracle.concurrency
+    # Labels of other types are not stored
+    event_log[config.log_ids.activity] = event_log[config.log_ids.activity].map(lambda activity: (activity,))
+    with pytest.raises(ValueError):
+        cache.get_concurrency_oracle(event_log, HeuristicsConcurrencyOracle, config)
+
+
+def test_estimation_with_oracle_cache_counts_compiled_log(tmp_path):
+    config = Configuration(concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS, oracle_cache_dir=str(tmp_path), n_jobs=2, profile=True)
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    # Not cached: the relations are counted (in parallel) from the log compiled once for the whole estimation
+    estimator = StartTimeEstimator(event_log, config)
+    estimator.estimate()
+    stages = list(estimator.profiler.to_dataframe()['stage'])
+    assert 'oracle_discovery/count_relations' in stages
+    assert len([stage for stage in stages if stage.endswith('compile_log')]) == 1
+    # Cached: the relations are not counted again
+    cached_estimator = StartTimeEstimator(event_log, config)
+    assert 'oracle_discovery/count_relations' not in list(cached_estimator.profiler.to_dataframe()['stage'])
+    assert cached_estimator.concurrency_oracle.concurrency == estimator.concurrency_oracle.concurrency
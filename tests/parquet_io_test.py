@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from start_time_estimator.config import Configuration, ConcurrencyOracleType, ResourceAvailabilityType
+from start_time_estimator.estimator import StartTimeEstimator
+from start_time_estimator.parquet_io import read_parquet_log, write_parquet_log
+from pix_framework.input import read_csv_log
+
+
+def test_read_parquet_log(tmp_path):
+    pytest.importorskip("pyarrow")
+    config = Configuration()
+    log_path = tmp_path / "event_log.parquet"
+    raw_event_log = pd.read_csv('./tests/assets/test_event_log_1.csv')
+    raw_event_log["extra"] = 1
+    raw_event_log[config.log_ids.end_time] = pd.to_datetime(raw_event_log[config.log_ids.end_time], utc=True).dt.tz_localize(None)
+    raw_event_log.to_parquet(log_path)
+    event_log = read_parquet_log(log_path, config.log_ids, config.missing_resource)
+    # Only the columns of the log IDs are read, with the strings dictionary-encoded and the timestamps in UTC
+    assert "extra" not in event_log.columns
+    assert isinstance(event_log[config.log_ids.activity].dtype, pd.CategoricalDtype)
+    assert event_log[config.log_ids.end_time].dtype == "datetime64[ns, UTC]"
+    assert event_log[config.log_ids.start_time].dtype == "datetime64[ns, UTC]"
+    # And the values are the same as with read_csv_log
+    expected = read_csv_log('./tests/assets/test_event_log_1.csv', config.log_ids, config.missing_resource)
+    for column in expected.columns:
+        assert (event_log[column].astype(object) == expected[column].astype(object)).all()
+    # Additional columns can be requested
+    assert "extra" in read_parquet_log(log_path, config.log_ids, config.missing_resource, columns=["extra"]).columns
+
+
+def test_estimate_parquet_log(tmp_path):
+    pytest.importorskip("pyarrow")
+    config = Configuration(
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE
+    )
+    input_path, output_path = tmp_path / "event_log.parquet", tmp_path / "estimated.parquet"
+    pd.read_csv('./tests/assets/test_event_log_3.csv').to_parquet(input_path)
+    # Estimate the log read from Parquet, and write the estimated columns in row groups
+    event_log = read_parquet_log(input_path, config.log_ids, config.missing_resource)
+    extended_event_log = StartTimeEstimator(event_log, config).estimate()
+    columns = [config.log_ids.case, config.log_ids.activity, config.log_ids.estimated_start_time]
+    write_parquet_log(extended_event_log, output_path, columns=columns, row_group_size=10)
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(output_path)
+    assert parquet_file.metadata.num_row_groups == -(-len(event_log) // 10)
+    assert parquet_file.schema_arrow.names == columns
+    # Same estimation as with the log read from CSV
+    csv_event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    expected = StartTimeEstimator(csv_event_log, config).estimate()
+    estimated = pd.read_parquet(output_path)
+    assert (estimated[config.log_ids.case].astype(object).to_numpy() == expected[config.log_ids.case].to_numpy()).all()
+    assert (estimated[config.log_ids.estimated_start_time].to_numpy() == expected[config.log_ids.estimated_start_time].to_numpy()).all()
@@ -0,0 +1,59 @@
+from start_time_estimator.config import Configuration, ConcurrencyOracleType, ResourceAvailabilityType
+from start_time_estimator.estimator import StartTimeEstimator
+from start_time_estimator.profiling import Profiler
+from pix_framework.input import read_csv_log
+
+
+def test_profiler_nested_stages():
+    finished = []
+    profiler = Profiler(callback=lambda profile: finished.append(profile.name))
+    with profiler.stage("parent", rows=10):
+        with profiler.stage("child", rows=5):
+            data = [0] * 100000
+    # Stages in order of start, with their parents as prefix
+    assert [profile.name for profile in profiler.report] == ["parent", "parent/child"]
+    assert [profile.depth for profile in profiler.report] == [0, 1]
+    assert [profile.rows for profile in profiler.report] == [10, 5]
+    # The peak memory of the child is included in the peak of the parent
+    assert profiler.report[1].peak_memory >= len(data) * 8
+    assert profiler.report[0].peak_memory >= profiler.report[1].peak_memory
+    assert profiler.report[0].wall_time >= profiler.report[1].wall_time
+    # Callback called when each stage finishes
+    assert finished == ["parent/child", "parent"]
+    assert list(profiler.to_dataframe()["stage"]) == ["parent", "parent/child"]
+
+
+def test_estimation_profile():
+    config = Configuration(
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE,
+        outlier_threshold=2.0,
+        profile=True
+    )
+    event_log = read_csv_log('./tests/assets/test_event_log_1.csv', config.log_ids, config.missing_resource)
+    estimator = StartTimeEstimator(event_log, config)
+    estimator.estimate()
+    stages = [profile.name for profile in estimator.profiler.report]
+    assert stages == [
+        "oracle_discovery",
+        "oracle_discovery/compile_log",
+        "oracle_discovery/count_relations",
+        "oracle_discovery/derive_concurrency",
+        "resource_index",
+        "estimate",
+        "estimate/resource_availability",
+        "estimate/enabled_times",
+        "estimate/initial_estimation",
+        "estimate/outlier_re_estimation",
+        "estimate/non_estimated_re_estimation",
+    ]
+    assert all(profile.wall_time >= 0 for profile in estimator.profiler.report)
+    assert estimator.profiler.report[0].rows == len(event_log)
+
+
+def test_estimation_profile_disabled():
+    config = Configuration(resource_availability_type=ResourceAvailabilityType.SIMPLE)
+    event_log = read_csv_log('./tests/assets/test_event_log_1.csv', config.log_ids, config.missing_resource)
+    estimator = StartTimeEstimator(event_log, config)
+    estimator.estimate()
+    assert estimator.profiler.report == []
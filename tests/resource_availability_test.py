@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
 
 from start_time_estimator.config import Configuration
 from start_time_estimator.resource_availability import SimpleResourceAvailability, CalendarResourceAvailability
+from pix_framework.calendar.availability import get_last_available_timestamp
 from pix_framework.calendar.resource_calendar import RCalendar, Interval
 from pix_framework.input import read_csv_log
 
@@ -113,3 +115,54 @@ def test_calendar_resource_availability_bot_resources():
     artificial_event = {config.log_ids.end_time: pd.Timestamp("2022-01-03 09:00:00+00:00")}
     assert resource_availability.available_since('Marcus', artificial_event) == pd.Timestamp("2022-01-03 08:00:00+00:00")
     assert resource_availability.available_since('Marcus', first_trace.iloc[0]) == pd.Timestamp("2022-01-03 08:00:00+00:00")
+
+
+def test_add_resource_availability_times():
+    config = Configuration(bot_resources={'Dominic'})
+    event_log = read_csv_log('./tests/assets/test_event_log_1.csv', config.log_ids, config.missing_resource)
+    resource_availability = SimpleResourceAvailability(event_log, config)
+    resource_availability.add_resource_availability_times(event_log)
+    # The availability of each event is the same as when individually computed
+    for index, event in event_log.iterrows():
+        available_since = resource_availability.available_since(event[config.log_ids.resource], event)
+        if pd.isna(available_since):
+            assert pd.isna(event[config.log_ids.available_time])
+        else:
+            assert event[config.log_ids.available_time] == available_since
+    # The availability of a bot resource is the same timestamp as its end
+    dominic_events = event_log[event_log[config.log_ids.resource] == 'Dominic']
+    assert (dominic_events[config.log_ids.available_time] == dominic_events[config.log_ids.end_time]).all()
+
+
+def test_add_resource_availability_times_with_calendar():
+    working_calendar = RCalendar("test")
+    # Working every day from 00:00 to 01:00, and from 08:00 to 23:59:59 with a break of 1 second and another one of 1 hour
+    working_calendar.add_calendar_item("MONDAY", "SUNDAY", "00:00:00", "01:00:00")
+    working_calendar.add_calendar_item("MONDAY", "SUNDAY", "08:00:00", "11:00:00")
+    working_calendar.add_calendar_item("MONDAY", "SUNDAY", "11:00:01", "14:00:00")
+    working_calendar.add_calendar_item("MONDAY", "SUNDAY", "15:00:00", "23:59:59")
+    # Non-working on Sundays in the afternoon
+    working_calendar.work_intervals[6] = working_calendar.work_intervals[6][:2]
+    config = Configuration(working_schedules={'Marcus': working_calendar, 'Dominic': working_calendar, 'Anya': working_calendar})
+    event_log = read_csv_log('./tests/assets/test_event_log_1.csv', config.log_ids, config.missing_resource)
+    # Move the events across all the days of the week and times of the day
+    event_log[config.log_ids.end_time] += pd.to_timedelta(np.arange(len(event_log)) * 7, unit="h")
+    resource_availability = CalendarResourceAvailability(event_log, config)
+    resource_availability.add_resource_availability_times(event_log)
+    # The availability of each event is the same as when individually computed
+    for index, event in event_log.iterrows():
+        available_since = resource_availability.available_since(event[config.log_ids.resource], event)
+        if pd.isna(available_since):
+            assert pd.isna(event[config.log_ids.available_time])
+        else:
+            assert event[config.log_ids.available_time] == available_since
+    # And it is the end of the last non-working period w.r.t. the calendar
+    previous_end_times = SimpleResourceAvailability(event_log, config)
+    for index, event in event_log.iterrows():
+        if event[config.log_ids.resource] in config.working_schedules:
+            expected = get_last_available_timestamp(
+                start=previous_end_times.available_since(event[config.log_ids.resource], event),
+                end=event[config.log_ids.end_time],
+                schedule=working_calendar
+            )
+            assert event[config.log_ids.available_time] == expected
@@ -0,0 +1,96 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from start_time_estimator.config import Configuration, ConcurrencyOracleType, ReEstimationMethod, ResourceAvailabilityType, OutlierStatistic
+from start_time_estimator.estimator import StartTimeEstimator
+from start_time_estimator.service import EstimationService
+from pix_framework.input import read_csv_log
+
+
+@pytest.mark.parametrize("outlier_threshold", [float('nan'), 1.5])
+def test_estimate_cases(outlier_threshold):
+    config = Configuration(
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE,
+        re_estimation_method=ReEstimationMethod.MODE,
+        outlier_threshold=outlier_threshold
+    )
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    expected = StartTimeEstimator(event_log.copy(), config).estimate()
+    cases = list(event_log[config.log_ids.case].unique())
+
+    async def estimate_concurrently():
+        async with EstimationService(n_workers=2, batch_window=0.05) as service:
+            await service.register_log("log", event_log, config)
+            # Concurrent requests (two of them with the same case, which are not batched together)
+            requests = [cases[:3], cases[3:4], cases[4:10], cases[3:5]]
+            return requests, await asyncio.gather(*[service.estimate_cases("log", request) for request in requests])
+
+    requests, results = asyncio.run(estimate_concurrently())
+    # Each request gets the events of its cases, estimated as in the full estimation of the registered log
+    for request, result in zip(requests, results):
+        expected_events = expected[expected[config.log_ids.case].isin(request)]
+        pd.testing.assert_frame_equal(result, expected_events)
+
+
+@pytest.mark.parametrize("outlier_statistic, re_estimation_method", [
+    (OutlierStatistic.MEAN, ReEstimationMethod.MEDIAN),
+    (OutlierStatistic.MEDIAN, ReEstimationMethod.MEAN),
+    (OutlierStatistic.MODE, ReEstimationMethod.MODE),
+])
+def test_estimate_cases_missing_end_times(outlier_statistic, re_estimation_method):
+    config = Configuration(
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE,
+        re_estimation_method=re_estimation_method,
+        outlier_statistic=outlier_statistic,
+        outlier_threshold=1.5
+    )
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    event_log.loc[event_log.index[5::97], config.log_ids.end_time] = pd.NaT
+    expected = StartTimeEstimator(event_log.copy(), config).estimate()
+    cases = list(event_log[config.log_ids.case].unique())
+
+    async def estimate():
+        async with EstimationService() as service:
+            await service.register_log("log", event_log, config)
+            return await service.estimate_cases("log", cases[:10])
+
+    # The missing durations (events with missing end time) are handled by the statistics as in the full estimation
+    pd.testing.assert_frame_equal(asyncio.run(estimate()), expected[expected[config.log_ids.case].isin(cases[:10])])
+
+
+def test_estimate_unregistered_log():
+    async def estimate():
+        async with EstimationService() as service:
+            await service.estimate_cases("unknown", ["trace-01"])
+
+    with pytest.raises(ValueError):
+        asyncio.run(estimate())
+
+
+def test_stop_while_collecting_batch():
+    config = Configuration(
+        concurrency_oracle_type=ConcurrencyOracleType.HEURISTICS,
+        resource_availability_type=ResourceAvailabilityType.SIMPLE
+    )
+    event_log = read_csv_log('./tests/assets/test_event_log_3.csv', config.log_ids, config.missing_resource)
+    cases = list(event_log[config.log_ids.case].unique())
+
+    async def stop_while_collecting():
+        service = EstimationService(batch_window=60)
+        await service.start()
+        await service.register_log("log", event_log, config)
+        # Two requests already taken from the queue by the dispatcher (waiting for the batch window to end)
+        requests = [asyncio.create_task(service.estimate_cases("log", cases[:1])),
+                    asyncio.create_task(service.estimate_cases("log", cases[1:2]))]
+        await asyncio.sleep(0.05)
+        assert service._queue.empty() and not any(task.done() for task in requests)
+        await service.stop()
+        # The requests are cancelled instead of waiting forever
+        return await asyncio.wait_for(asyncio.gather(*requests, return_exceptions=True), 1)
+
+    results = asyncio.run(stop_while_collecting())
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)